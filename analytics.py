@@ -0,0 +1,170 @@
+# analytics.py
+# Columnar DuckDB snapshot of the four base tables for the Trend Analysis tabs,
+# so their GROUP BY joins scan a local copy instead of the transactional DB.
+#   FOOD_ANALYTICS=duckdb streamlit run foods_management_app.py
+#   python analytics.py snapshot trends.duckdb     write a snapshot file for offline analysis
+# The snapshot is rebuilt after SNAPSHOT_TTL seconds, or sooner once this
+# process has written to one of the tables.
+import argparse
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+import backend
+import db
+import profiler
+
+try:
+    import duckdb
+except ImportError:  # the analytics engine is optional
+    duckdb = None
+
+ANALYTICS_ENV = "FOOD_ANALYTICS"
+SNAPSHOT_TTL = 300         # seconds before a snapshot is rebuilt regardless of writes
+SNAPSHOT_MIN_AGE = 10      # after a local write, rebuild at most this often
+SNAPSHOT_CHUNK_ROWS = 100_000
+
+BASE_TABLES = ["providers", "receivers", "food_listings", "claims"]
+# columns whose types do not survive every driver (SQLite returns ISO text)
+DATE_COLUMNS = {"food_listings": ["Expiry_Date"]}
+DATETIME_COLUMNS = {"claims": ["Timestamp"]}
+
+_PARAM_RE = re.compile(r"(?<![:\w]):(\w+)")
+
+
+def available():
+    return duckdb is not None
+
+
+def enabled():
+    return available() and os.environ.get(ANALYTICS_ENV, "").lower() == "duckdb"
+
+
+# ---------------------------
+# SNAPSHOT
+# ---------------------------
+def _typed(table, chunk):
+    for col in DATE_COLUMNS.get(table, []):
+        chunk[col] = pd.to_datetime(chunk[col], errors="coerce").dt.date
+    for col in DATETIME_COLUMNS.get(table, []):
+        chunk[col] = pd.to_datetime(chunk[col], errors="coerce")
+    return chunk
+
+
+def build_snapshot(engine=None, path=":memory:", chunksize=SNAPSHOT_CHUNK_ROWS):
+    """Copy the base tables into a new DuckDB database chunk by chunk and return the connection."""
+    if duckdb is None:
+        raise RuntimeError("The analytics snapshot needs duckdb (pip install duckdb).")
+    engine = engine or db.engine
+    con = duckdb.connect(path)
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for table in BASE_TABLES:
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+            created = False
+            for chunk in pd.read_sql(text(f"SELECT * FROM {table}"), conn, chunksize=chunksize):
+                chunk = _typed(table, chunk)
+                con.register("chunk_df", chunk)
+                con.execute(f"INSERT INTO {table} SELECT * FROM chunk_df" if created
+                            else f"CREATE TABLE {table} AS SELECT * FROM chunk_df")
+                con.unregister("chunk_df")
+                created = True
+            if not created:
+                # empty table: keep the columns so queries still bind
+                cols = pd.read_sql(text(f"SELECT * FROM {table} WHERE 1=0"), conn)
+                con.register("chunk_df", cols)
+                con.execute(f"CREATE TABLE {table} AS SELECT * FROM chunk_df")
+                con.unregister("chunk_df")
+    return con
+
+
+class Snapshot:
+    def __init__(self, con, version):
+        self.con = con
+        self.version = version
+        self.built_at = time.monotonic()
+
+    @property
+    def age(self):
+        return time.monotonic() - self.built_at
+
+    def stale(self):
+        if self.age > SNAPSHOT_TTL:
+            return True
+        return self.age > SNAPSHOT_MIN_AGE and db.cache.version(BASE_TABLES) != self.version
+
+
+_snapshot = None
+_build_lock = threading.Lock()
+
+
+def current():
+    """The live snapshot, rebuilt first if it is missing or stale (one builder at a time)."""
+    global _snapshot
+    snap = _snapshot
+    if snap is not None and not snap.stale():
+        return snap
+    with _build_lock:
+        if _snapshot is None or _snapshot.stale():
+            version = db.cache.version(BASE_TABLES)
+            start = time.perf_counter()
+            con = build_snapshot()
+            profiler.record("snapshot", "duckdb", (time.perf_counter() - start) * 1000, status="ok")
+            # readers holding the previous snapshot keep using it until they finish
+            _snapshot = Snapshot(con, version)
+        return _snapshot
+
+
+# ---------------------------
+# READ PATH
+# ---------------------------
+def to_duckdb(sql):
+    """Rewrite SQLAlchemy-style :name parameters as DuckDB $name."""
+    return _PARAM_RE.sub(r"$\1", sql)
+
+
+def read_df(sql, params=None, ttl=0, name=None):
+    """Same contract as db.read_df, answered from the snapshot (ttl is ignored: the snapshot is the cache)."""
+    name = name or profiler.query_name(sql)
+    params = backend.bind(sql, params)
+    start = time.perf_counter()
+    try:
+        cur = current().con.cursor()   # one cursor per call; DuckDB cursors are thread-local connections
+        try:
+            df = (cur.execute(to_duckdb(sql), params) if params else cur.execute(sql)).df()
+        finally:
+            cur.close()
+    except Exception as e:
+        profiler.record("query", name, (time.perf_counter() - start) * 1000,
+                        status="error", error=str(e), engine="duckdb")
+        raise
+    profiler.record("query", name, (time.perf_counter() - start) * 1000, rows=len(df),
+                    bytes=profiler.frame_bytes(df), cached=False, status="ok", engine="duckdb")
+    return df
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DuckDB analytics snapshot of the food management DB.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    snap = sub.add_parser("snapshot", help="write the base tables to a DuckDB file")
+    snap.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.path != ":memory:" and os.path.exists(args.path):
+        os.remove(args.path)
+    start = time.perf_counter()
+    con = build_snapshot(path=args.path)
+    for table in BASE_TABLES:
+        print(f"  {table}: {con.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]} rows")
+    con.close()
+    print(f"Snapshot written to {args.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
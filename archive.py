@@ -0,0 +1,202 @@
+# archive.py
+# History tables for expired listings. A listing that expired more than
+# ARCHIVE_AFTER_DAYS ago and has no Pending claim is moved, together with its
+# claims, from food_listings / claims into food_listings_archive /
+# claims_archive, both month-partitioned on Archive_Month: the YYYYMM of the
+# listing's Expiry_Date, and of each claim's own Timestamp (so time-window
+# reads of claim history prune to the months they cover).
+# The live tables then only hold listings someone can still act on, and the
+# unwindowed Trend Analysis tabs describe those; a time window reads the
+# archive tables as well (windowed_queries_grouped in queries.py).
+# Each batch is one short transaction; maintenance.py schedules the sweep.
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+import db
+import partitions
+
+ARCHIVE_AFTER_DAYS = 30     # grace period after expiry before a listing is archived
+BATCH_ROWS = 500            # listings moved per transaction
+BATCH_PAUSE = 0.05          # seconds between batches, so app writes get the locks in between
+
+ARCHIVE_TABLES = ["food_listings_archive", "claims_archive"]
+
+CREATE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS food_listings_archive (
+        Archive_Month INT NOT NULL,
+        Food_ID INT NOT NULL,
+        Food_Name VARCHAR(255),
+        Quantity INT,
+        Reserved INT NOT NULL DEFAULT 0,
+        Expiry_Date DATE,
+        Provider_ID INT,
+        Provider_Type VARCHAR(100),
+        Location VARCHAR(255),
+        Food_Type VARCHAR(100),
+        Meal_Type VARCHAR(100),
+        Archived_At DATETIME,
+        PRIMARY KEY (Archive_Month, Food_ID)
+    )""",
+    """CREATE TABLE IF NOT EXISTS claims_archive (
+        Archive_Month INT NOT NULL,
+        Claim_ID INT NOT NULL,
+        Food_ID INT,
+        Receiver_ID INT,
+        Claim_Quantity INT,
+        Status VARCHAR(50),
+        Timestamp DATETIME,
+        PRIMARY KEY (Archive_Month, Claim_ID)
+    )""",
+]
+
+
+def install(conn):
+    """Migration step: create the archive tables and partition the history tables by month."""
+    for ddl in CREATE_TABLES:
+        conn.execute(text(ddl))
+    partitions.partition_by_month("food_listings_archive")(conn)
+    partitions.partition_by_month("claims_archive")(conn)
+
+
+# ---------------------------
+# SWEEP
+# ---------------------------
+# oldest first, in Food_ID order within a day (same lock order as claim_service)
+CANDIDATES_SQL = """
+    SELECT f.Food_ID, f.Expiry_Date FROM food_listings f
+    WHERE f.Expiry_Date < :cutoff
+      AND NOT EXISTS (SELECT 1 FROM claims c WHERE c.Food_ID = f.Food_ID AND c.Status = 'Pending')
+    ORDER BY f.Expiry_Date, f.Food_ID
+    LIMIT :limit
+"""
+
+ARCHIVE_LISTINGS_SQL = """
+    INSERT INTO food_listings_archive (Archive_Month, Food_ID, Food_Name, Quantity, Reserved, Expiry_Date,
+        Provider_ID, Provider_Type, Location, Food_Type, Meal_Type, Archived_At)
+    SELECT :month, Food_ID, Food_Name, Quantity, Reserved, Expiry_Date,
+        Provider_ID, Provider_Type, Location, Food_Type, Meal_Type, :now
+    FROM food_listings WHERE Food_ID IN ({ids})
+"""
+
+ARCHIVE_CLAIMS_SQL = """
+    INSERT INTO claims_archive (Archive_Month, Claim_ID, Food_ID, Receiver_ID, Claim_Quantity, Status, Timestamp)
+    SELECT :month, Claim_ID, Food_ID, Receiver_ID, Claim_Quantity, Status, Timestamp
+    FROM claims WHERE Claim_ID IN ({ids})
+"""
+
+
+def _cutoff(today=None, after_days=ARCHIVE_AFTER_DAYS):
+    return (today or date.today()) - timedelta(days=after_days)
+
+
+def archive_batch(conn, cutoff, limit=BATCH_ROWS, now=None):
+    """Move up to limit archivable listings (and their claims) inside conn's transaction; returns their IDs."""
+    sql = CANDIDATES_SQL
+    if conn.dialect.name == "mysql":
+        sql = sql.rstrip() + " FOR UPDATE"
+    rows = conn.execute(text(sql), {"cutoff": cutoff, "limit": limit}).all()
+    by_month = {}
+    for food_id, expiry in rows:
+        by_month.setdefault(partitions.month_key(expiry), []).append(int(food_id))
+    now = now or datetime.now()
+    for month, food_ids in by_month.items():
+        # ids are ints read back from the database, so inlining them is safe
+        ids = _ids(food_ids)
+        conn.execute(text(ARCHIVE_LISTINGS_SQL.format(ids=ids)), {"month": month, "now": now})
+        claims = conn.execute(text(f"SELECT Claim_ID, Timestamp FROM claims WHERE Food_ID IN ({ids})")).all()
+        for claim_month, claim_ids in _claim_months(claims, month).items():
+            conn.execute(text(ARCHIVE_CLAIMS_SQL.format(ids=_ids(claim_ids))), {"month": claim_month})
+        conn.execute(text(f"DELETE FROM claims WHERE Food_ID IN ({ids})"))
+        conn.execute(text(f"DELETE FROM food_listings WHERE Food_ID IN ({ids})"))
+    return [fid for ids in by_month.values() for fid in ids]
+
+
+def _ids(values):
+    return ", ".join(str(int(i)) for i in values)
+
+
+def _claim_months(claims, default_month):
+    """{YYYYMM of Timestamp: [Claim_ID]}; claims without a timestamp go with their listing's month."""
+    out = {}
+    for claim_id, ts in claims:
+        out.setdefault(partitions.month_key(ts) if ts else default_month, []).append(int(claim_id))
+    return out
+
+
+def claim_months(engine):
+    """YYYYMM keys from the oldest live claim to next month: where archived claims can land."""
+    with engine.connect() as conn:
+        first = conn.execute(text("SELECT MIN(Timestamp) FROM claims")).scalar()
+    if first is None:
+        return []
+    return partitions.month_range(partitions.month_key(first),
+                                  partitions.next_month(partitions.month_key(date.today())))
+
+
+def rekey_claims_archive(engine):
+    """Migration step: move archived claims from their listing's month to their own Timestamp month.
+
+    Runs outside the migration's transaction: the partitions are added first on
+    their own connection (DDL commits implicitly on MySQL), then each batch of
+    moves commits by itself. Only claims still in the wrong month are read, so
+    a rerun after a failure picks up where it stopped.
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT Archive_Month, Claim_ID, Timestamp FROM claims_archive WHERE Timestamp IS NOT NULL")).all()
+    moves = {}
+    for month, claim_id, ts in rows:
+        if partitions.month_key(ts) != month:
+            moves.setdefault((month, partitions.month_key(ts)), []).append(claim_id)
+    if not moves:
+        return
+    with engine.begin() as conn:
+        partitions.ensure_months(conn, "claims_archive", {new for _, new in moves})
+    for (old, new), claim_ids in moves.items():
+        for start in range(0, len(claim_ids), BATCH_ROWS):
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"UPDATE claims_archive SET Archive_Month = :new "
+                    f"WHERE Archive_Month = :old AND Claim_ID IN ({_ids(claim_ids[start:start + BATCH_ROWS])})"
+                ), {"old": old, "new": new})
+
+
+def pending_months(engine, cutoff):
+    """YYYYMM keys of the listings the sweep would archive today."""
+    with engine.connect() as conn:
+        first = conn.execute(text(
+            "SELECT MIN(Expiry_Date) FROM food_listings WHERE Expiry_Date < :cutoff"), {"cutoff": cutoff}).scalar()
+    if first is None:
+        return []
+    return partitions.month_range(partitions.month_key(first), partitions.month_key(cutoff))
+
+
+def sweep(engine=None, today=None, after_days=ARCHIVE_AFTER_DAYS, batch_rows=BATCH_ROWS,
+          max_batches=None, pause=BATCH_PAUSE, should_stop=None):
+    """Archive every eligible listing in batches of batch_rows; returns the number archived."""
+    engine = engine or db.engine
+    cutoff = _cutoff(today, after_days)
+    months = pending_months(engine, cutoff)
+    if not months:
+        return 0
+    with engine.begin() as conn:
+        partitions.ensure_months(conn, "food_listings_archive", months)
+        partitions.ensure_months(conn, "claims_archive", claim_months(engine))
+
+    moved, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        with engine.begin() as conn:
+            food_ids = archive_batch(conn, cutoff, batch_rows)
+        if not food_ids:
+            break
+        moved += len(food_ids)
+        batches += 1
+        # same-process readers (cache, expiry index, analytics snapshot) see the move at once
+        db.cache.invalidate_tables(["food_listings", "claims", *ARCHIVE_TABLES],
+                                   keys={"food_listings": food_ids})
+        if len(food_ids) < batch_rows or (should_stop and should_stop()):
+            break
+        time.sleep(pause)
+    return moved
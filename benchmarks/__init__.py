@@ -0,0 +1,2 @@
+# benchmarks/
+# Headless benchmark suite: python -m benchmarks.run --help
@@ -0,0 +1,165 @@
+# benchmarks/cases.py
+# The workloads timed by run.py, built from the same SQL the dashboard issues
+# (queries.py, sql_filters.py, components.py), so a change there is measured
+# without touching this file. Each case is a callable returning rows processed.
+import analytics
+import backend
+import bulk
+import changefeed
+import column_store
+import db
+import expiry_index
+import export
+import geo
+import matching
+import search_index
+from components import count_sql, keyset_page_sql, like_prefix, sorted_page_sql
+from benchmarks.datagen import CITIES
+from queries import DIRECTORY_SQL, LATEST_SQL, OVERVIEW_TOTALS_SQL, READ_SQL, queries_grouped
+from sql_filters import preview_queries
+
+READ_PAGE_ROWS = 25
+
+# a typical Read search per table: (filters appended to READ_SQL, params, key column)
+CRUD_SEARCHES = {
+    "providers": (" AND City LIKE :city", {"city": "%City 01%"}, "Provider_ID"),
+    "receivers": (" AND Name LIKE :name", {"name": "%NGO%"}, "Receiver_ID"),
+    "food_listings": (" AND f.Food_Type LIKE :ftype AND f.Meal_Type LIKE :mtype",
+                      {"ftype": "%Vegan%", "mtype": "%Lunch%"}, "f.Food_ID"),
+    "claims": (" AND c.Status = :status", {"status": "Pending"}, "c.Claim_ID"),
+}
+
+
+def _read(sql, params=None):
+    return lambda: len(db.read_df(sql, params))
+
+
+def _preview(selections):
+    sqls, params = preview_queries(selections)
+    return lambda: sum(len(db.read_df(sql, params)) for sql in sqls.values())
+
+
+def _crud_search(table):
+    where, params, key_col = CRUD_SEARCHES[table]
+    base = READ_SQL[table] + where
+
+    def run():
+        # first page plus the total count, as paginated_table does on every rerun
+        page = db.read_df(keyset_page_sql(base, key_col, None, READ_PAGE_ROWS + 1), params)
+        db.read_df(count_sql(base), params)
+        return len(page)
+    return run
+
+
+def _bulk_rewrite(rows, dry_run):
+    # the newest listings written back unchanged, so repeated runs leave the data as it was
+    spec = bulk.SPECS["food_listings"]
+    sql = f"SELECT Food_ID, {', '.join(spec.columns)} FROM food_listings ORDER BY Food_ID DESC LIMIT {rows}"
+
+    def run():
+        result = bulk.apply("food_listings", db.read_df(sql), dry_run=dry_run)
+        return result.updated
+    return run
+
+
+def _download_df_button(sql):
+    # the app's in-memory path: whole result as one DataFrame, then to_csv
+    def run():
+        df = db.read_df(sql)
+        df.to_csv(index=False).encode("utf-8")
+        return len(df)
+    return run
+
+
+def _streamed(fmt, sql):
+    exporter, _ = export.EXPORTERS[fmt]
+
+    def run():
+        buf, rows = exporter(sql)
+        buf.close()
+        return rows
+    return run
+
+
+def cases():
+    """Return {"group/name": callable} for every benchmarked workload."""
+    out = {}
+    for group, qdict in queries_grouped.items():
+        for title, sql in qdict.items():
+            out[f"trend/{title}"] = _read(sql)
+
+    if analytics.available():
+        # same queries on the DuckDB snapshot; the first call builds it, outside the timed runs
+        for title, sql in (t for qdict in queries_grouped.values() for t in qdict.items()):
+            out[f"duckdb/{title}"] = lambda sql=sql: len(analytics.read_df(sql))
+
+    # the sidebar filters on City_IDs; "50 km" is the Within slider widening three cities
+    three, ten = geo.INDEX.ids(CITIES[:3]), geo.INDEX.ids(CITIES[:10])
+    out["preview/unfiltered"] = _preview({})
+    out["preview/3 cities"] = _preview({"City": three})
+    out["preview/3 cities + 50 km"] = _preview({"City": geo.INDEX.within(three, 50)})
+    out["preview/city + food + meal"] = _preview(
+        {"City": ten, "Food_Type": ["Vegan"], "Meal_Type": ["Lunch", "Dinner"]})
+
+    # the same two chart aggregates counted from the column store (loaded on the warm-up call)
+    out["store/charts unfiltered"] = lambda: sum(map(len, column_store.preview_counts({}).values()))
+    out["store/charts city + food + meal"] = lambda: sum(map(len, column_store.preview_counts(
+        {"City": ten, "Food_Type": ["Vegan"], "Meal_Type": ["Lunch", "Dinner"]}).values()))
+
+    # Wastage Risk card: the in-memory index (loaded on the warm-up call) against the SQL it replaced
+    near = backend.NEAR_EXPIRY_DAYS
+    out["index/expiry top 5"] = lambda: len(expiry_index.INDEX.top_k(5, within_days=near))
+    out["index/expiry top 5, 3 cities"] = lambda: len(
+        expiry_index.INDEX.top_k(5, cities=three, within_days=near))
+    out["index/expiry top 5, SQL"] = _read(
+        "SELECT Food_Name, Expiry_Date, Quantity - Reserved AS Available FROM food_listings "
+        "WHERE Expiry_Date BETWEEN :today AND :near_expiry_until AND Quantity > Reserved "
+        "ORDER BY Expiry_Date, Available DESC LIMIT 5")
+
+    # change feed: an idle poll (nothing new) and the views it keeps current, against the reads they replace
+    out["feed/poll, no changes"] = lambda: changefeed.FEED.poll(force=True)
+    out["feed/overview counters"] = lambda: len(changefeed.OVERVIEW.frame())
+    out["feed/overview totals, SQL"] = _read(OVERVIEW_TOTALS_SQL)
+    out["feed/latest records"] = lambda: sum(len(v.frame()) for v in changefeed.LATEST.values())
+    out["feed/latest records, SQL"] = lambda: sum(len(db.read_df(sql)) for sql in LATEST_SQL.values())
+
+    # radius lookups: the grid index alone, and claimable listings near one receiver's city
+    out["geo/cities within 50 km"] = lambda: len(geo.INDEX.within(three, 50))
+    out["geo/listings within 50 km"] = lambda: len(geo.listings_near(three[0], 50))
+    out["geo/listings within 150 km"] = lambda: len(geo.listings_near(three[0], 150))
+
+    # matching engine: the three candidate reads, then scoring every same-city pair
+    out["match/load candidates"] = lambda: len(matching.Candidates.load().listings)
+    out["match/score all"] = lambda: len(matching.candidates().suggest(per_listing=3))
+    out["match/score 3 cities"] = lambda: len(matching.candidates().suggest(per_listing=3, cities=CITIES[:3]))
+
+    # name search: the trigram index (built on the warm-up call), typo included, against LIKE '%term%'
+    out["search/providers typo"] = lambda: len(search_index.search("providers", "Grocry Stor 0000421"))
+    out["search/receivers typo"] = lambda: len(search_index.search("receivers", "Comunity Centre"))
+    out["search/receivers LIKE"] = _read(
+        "SELECT Receiver_ID FROM receivers WHERE Name LIKE :name LIMIT 100", {"name": "%Community Center%"})
+
+    for table in CRUD_SEARCHES:
+        out[f"crud/{table} search"] = _crud_search(table)
+    out["crud/food_listings name prefix"] = _read(
+        "SELECT Food_ID, Food_Name FROM food_listings WHERE Food_Name LIKE :prefix ESCAPE '!' "
+        "ORDER BY Food_Name, Food_ID LIMIT 20", {"prefix": like_prefix("Bi")})
+
+    # Contact Directory: one keyset page in Name order, first and deep, all cities and one city
+    city_sql = DIRECTORY_SQL + " AND City_ID = :city_id"
+    out["directory/first page"] = _read(sorted_page_sql(DIRECTORY_SQL, "Name", "Provider_ID", None, 25))
+    out["directory/deep page"] = _read(sorted_page_sql(DIRECTORY_SQL, "Name", "Provider_ID", ("S", 0), 25),
+                                       {"_cursor_sort": "S", "_cursor_key": 0})
+    out["directory/one city page"] = _read(sorted_page_sql(city_sql, "Name", "Provider_ID", None, 25),
+                                           {"city_id": three[0]})
+
+    # bulk edit: vectorised validation alone, then validation plus one executemany transaction
+    out["bulk/validate 5000 listings"] = _bulk_rewrite(5000, dry_run=True)
+    out["bulk/apply 1000 listings"] = _bulk_rewrite(1000, dry_run=False)
+
+    claims_sql = READ_SQL["claims"] + " ORDER BY c.Claim_ID DESC"
+    out["export/download_df_button claims"] = _download_df_button(claims_sql)
+    out["export/csv.gz claims"] = _streamed("csv.gz", claims_sql)
+    if export.PARQUET_AVAILABLE:
+        out["export/parquet claims"] = _streamed("parquet", claims_sql)
+    return out
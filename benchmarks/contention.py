@@ -0,0 +1,134 @@
+# benchmarks/contention.py
+# Hammers claim_service from many threads against a few small listings and
+# checks that nothing is over-claimed. Run from the repository root:
+#   python -m benchmarks.contention                      (throwaway SQLite file)
+#   FOOD_DB_URI=mysql+pymysql://... python -m benchmarks.contention --use-configured-db
+# Exits 1 if any listing ends with more reserved than its quantity, or if the
+# reserved totals do not match the claims that were accepted. A smaller run
+# is part of the test suite (tests/test_reservations.py, python -m pytest).
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+import backend
+import claim_service
+import db
+import migrations
+
+
+def setup(listings, quantity):
+    """Fresh listings (plus one expired) and receivers; returns (food_ids, expired_id, receiver_ids)."""
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO providers (Name, City) VALUES ('Contention Provider', 'Bench')"))
+        pid = conn.execute(text("SELECT MAX(Provider_ID) FROM providers")).scalar()
+        food_ids = []
+        for i in range(listings + 1):
+            expiry = date.today() + (timedelta(days=3) if i < listings else timedelta(days=-1))
+            food_ids.append(conn.execute(text(
+                "INSERT INTO food_listings (Food_Name, Quantity, Expiry_Date, Provider_ID) "
+                "VALUES (:n, :q, :e, :p)"), {"n": f"Contention {i}", "q": quantity, "e": expiry, "p": pid}
+            ).lastrowid)
+        receiver_ids = [conn.execute(text(
+            "INSERT INTO receivers (Name, City) VALUES (:n, 'Bench')"), {"n": f"Receiver {i}"}).lastrowid
+            for i in range(20)]
+    return food_ids[:-1], food_ids[-1], receiver_ids
+
+
+def hammer(food_ids, expired_id, receiver_ids, threads, requests, batch_size, seed):
+    """Each worker issues batches of random claims; returns accepted quantity per Food_ID and counters."""
+    accepted = {fid: 0 for fid in food_ids}
+    stats = {"accepted": 0, "rejected": 0, "expired": 0, "busy": 0}
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        for _ in range(requests // batch_size):
+            batch = [(rng.choice(food_ids + [expired_id]), rng.choice(receiver_ids), rng.randint(1, 3))
+                     for _ in range(batch_size)]
+            try:
+                outcomes = claim_service.claim_batch(batch)
+            except claim_service.ClaimError:
+                with lock:
+                    stats["busy"] += 1
+                continue
+            with lock:
+                for o in outcomes:
+                    if o.ok:
+                        accepted[o.food_id] += o.quantity
+                        stats["accepted"] += 1
+                    else:
+                        stats["expired" if o.food_id == expired_id else "rejected"] += 1
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    return accepted, stats
+
+
+def verify(food_ids, expired_id, quantity, accepted):
+    """Return a list of problems; empty when the reservations are consistent."""
+    problems = []
+    placeholders = ", ".join(str(int(f)) for f in food_ids + [expired_id])
+    with db.engine.connect() as conn:
+        listings = conn.execute(text(
+            f"SELECT Food_ID, Quantity, Reserved FROM food_listings WHERE Food_ID IN ({placeholders})"))
+        claimed = dict(conn.execute(text(
+            f"SELECT Food_ID, SUM(Claim_Quantity) FROM claims WHERE Food_ID IN ({placeholders}) "
+            "AND Status IN ('Pending', 'Completed') GROUP BY Food_ID")).all())
+        for fid, qty, reserved in listings:
+            if reserved > qty:
+                problems.append(f"food {fid}: reserved {reserved} > quantity {qty}")
+            if reserved != (claimed.get(fid) or 0):
+                problems.append(f"food {fid}: reserved {reserved} but claims hold {claimed.get(fid) or 0}")
+            if fid in accepted and reserved != accepted[fid]:
+                problems.append(f"food {fid}: reserved {reserved} but workers saw {accepted[fid]} accepted")
+            if fid == expired_id and reserved:
+                problems.append(f"expired food {fid} was claimed")
+    if sum(accepted.values()) < quantity * len(food_ids) - 2 * len(food_ids):
+        problems.append("listings were left claimable while requests were rejected")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent claim contention check.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="claim requests per thread")
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--listings", type=int, default=4)
+    parser.add_argument("--quantity", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--use-configured-db", action="store_true",
+                        help="run against FOOD_DB_URI instead of a throwaway SQLite file")
+    args = parser.parse_args(argv)
+
+    if not args.use_configured_db:
+        path = os.path.join(tempfile.mkdtemp(), "contention.db")
+        db.engine = backend.make_engine(f"sqlite:///{path}")
+    migrations.upgrade(db.engine)
+
+    food_ids, expired_id, receiver_ids = setup(args.listings, args.quantity)
+    start = time.perf_counter()
+    accepted, stats = hammer(food_ids, expired_id, receiver_ids, args.threads, args.requests,
+                             args.batch_size, args.seed)
+    secs = time.perf_counter() - start
+    total = sum(stats.values())
+    print(f"{args.threads} threads, {total} outcomes in {secs:.1f}s ({total / secs:,.0f} claims/s): {stats}")
+
+    problems = verify(food_ids, expired_id, args.quantity, accepted)
+    for p in problems:
+        print(f"FAIL  {p}")
+    if problems:
+        return 1
+    print(f"OK  {len(food_ids)} listings x {args.quantity}: reserved totals match accepted claims, none oversold.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
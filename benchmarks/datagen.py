@@ -0,0 +1,120 @@
+# benchmarks/datagen.py
+# Synthetic providers / receivers / food_listings / claims at a given scale,
+# generated with NumPy (seeded, so every run sees the same data) and loaded
+# into a local SQLite file through ingest.load_frame.
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import backend
+import geo
+import ingest
+import migrations
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+SEED = 42
+LOAD_CHUNK_ROWS = 50_000
+
+CITIES = [f"City {i:03d}" for i in range(200)]
+PROVIDER_TYPES = ["Restaurant", "Grocery Store", "Supermarket", "Catering Service"]
+RECEIVER_TYPES = ["NGO", "Community Center", "Individual", "Shelter"]
+FOOD_NAMES = ["Bread", "Rice", "Soup", "Salad", "Pasta", "Fruits", "Vegetables", "Chicken",
+              "Fish", "Dairy", "Sandwich", "Biryani", "Curry", "Noodles", "Cake", "Idli"]
+FOOD_TYPES = ["Vegetarian", "Non-Vegetarian", "Vegan"]
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snacks"]
+STATUSES = ["Pending", "Completed", "Cancelled"]
+
+
+def parse_scale(scale):
+    """'10k' / '100k' / '1m' or a plain row count -> number of listings (and claims)."""
+    return SCALES[scale.lower()] if scale.lower() in SCALES else int(scale)
+
+
+def _pick(rng, values, n):
+    return pd.Series(np.asarray(values, dtype=object)[rng.integers(0, len(values), n)])
+
+
+def _people(rng, n, id_col, types):
+    ids = np.arange(1, n + 1)
+    return pd.DataFrame({
+        id_col: ids,
+        "Name": pd.Series(ids).map(lambda i: f"{types[i % len(types)]} {i:07d}"),
+        "Type": _pick(rng, types, n),
+        "City": _pick(rng, CITIES, n),
+        "Contact": pd.Series(rng.integers(6_000_000_000, 9_999_999_999, n)).astype(str),
+    })
+
+
+def generate(rows, seed=SEED, today=None):
+    """Return {table: DataFrame}; rows listings and rows claims, one provider/receiver per 20 listings."""
+    rng = np.random.default_rng(seed)
+    today = today or date.today()
+    people = max(50, rows // 20)
+
+    providers = _people(rng, people, "Provider_ID", PROVIDER_TYPES)
+    providers["Address"] = pd.Series(rng.integers(1, 999, people)).map(lambda n: f"{n} Main Road")
+    receivers = _people(rng, people, "Receiver_ID", RECEIVER_TYPES)
+
+    provider_idx = rng.integers(0, people, rows)
+    food_listings = pd.DataFrame({
+        "Food_ID": np.arange(1, rows + 1),
+        "Food_Name": _pick(rng, FOOD_NAMES, rows),
+        "Quantity": rng.integers(1, 100, rows),
+        # mostly future dates, some already expired, a slice inside the 3-day window
+        "Expiry_Date": [today + timedelta(days=int(d)) for d in rng.integers(-10, 30, rows)],
+        "Provider_ID": providers["Provider_ID"].to_numpy()[provider_idx],
+        "Provider_Type": providers["Type"].to_numpy()[provider_idx],
+        "Location": providers["City"].to_numpy()[provider_idx],
+        "Food_Type": _pick(rng, FOOD_TYPES, rows),
+        "Meal_Type": _pick(rng, MEAL_TYPES, rows),
+    })
+
+    start = datetime.combine(today, datetime.min.time()) - timedelta(days=90)
+    claims = pd.DataFrame({
+        "Claim_ID": np.arange(1, rows + 1),
+        "Food_ID": rng.integers(1, rows + 1, rows),
+        "Receiver_ID": rng.integers(1, people + 1, rows),
+        "Status": _pick(rng, STATUSES, rows),
+        "Timestamp": pd.to_datetime(start) + pd.to_timedelta(rng.integers(0, 90 * 86400, rows), unit="s"),
+    })
+    return {"providers": providers, "receivers": receivers,
+            "food_listings": food_listings, "claims": claims}
+
+
+def gazetteer(seed=SEED):
+    """Coordinates for CITIES, scattered over a ~600 km square, as geo.set_coordinates takes them."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"Name_Key": [geo.name_key(c) for c in CITIES],
+                         "Latitude": 20.0 + rng.uniform(-2.7, 2.7, len(CITIES)),
+                         "Longitude": 78.0 + rng.uniform(-2.9, 2.9, len(CITIES))})
+
+
+def create_schema(engine):
+    # the app's own migrations, so tables, columns and indexes (and query plans) match
+    migrations.upgrade(engine)
+
+
+def build(path, rows, seed=SEED, report=print):
+    """Create (or reuse) a SQLite benchmark database at path and return its engine."""
+    if not os.path.exists(path):
+        # build next to the target and rename, so an interrupted load is never reused
+        partial = path + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        engine = backend.make_engine(f"sqlite:///{partial}")
+        create_schema(engine)
+        for table, df in generate(rows, seed).items():
+            for start in range(0, len(df), LOAD_CHUNK_ROWS):
+                ingest.load_frame(engine, table, df.iloc[start:start + LOAD_CHUNK_ROWS])
+            report(f"  loaded {len(df):>9,} rows into {table}")
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        engine.dispose()
+        os.replace(partial, path)
+    engine = backend.make_engine(f"sqlite:///{path}")
+    # a database kept from an older checkout gets the migrations added since
+    create_schema(engine)
+    with engine.begin() as conn:
+        geo.set_coordinates(conn, gazetteer(seed))
+    return engine
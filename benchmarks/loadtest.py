@@ -0,0 +1,209 @@
+# benchmarks/loadtest.py
+# Multi-process load test: N worker processes, each standing in for one
+# Streamlit server behind a load balancer, render the dashboard's page reads
+# from several session threads against one SQLite copy of synthetic data.
+# Reports page renders per second as workers are added, and how many reads
+# reached the database, with and without the shared cache. Run from the
+# repository root:
+#   python -m benchmarks.loadtest --scale 100k --workers 1,2,4
+#   python -m benchmarks.loadtest --scale 100k --workers 1,2,4 --shared file    (temp directory per run)
+#   python -m benchmarks.loadtest --workers 4 --shared redis://localhost:6379/15 --connections 40
+# Workers are spawned (not forked), so each one builds its engine, pool and
+# caches from the environment exactly as a separate Streamlit process would.
+import argparse
+import multiprocessing as mp
+import os
+import random
+import shutil
+import tempfile
+import time
+from statistics import median
+
+from benchmarks import datagen
+
+DEFAULT_SECONDS = 10.0
+DEFAULT_SESSIONS = 4        # concurrent sessions (threads) per worker
+DEFAULT_WRITE_SHARE = 0.02  # pages that also write one listing
+DEFAULT_TREND_SHARE = 0.2   # pages that open a trend tab (per-session memo, so never cached across sessions)
+SELECTIONS = 40             # distinct sidebar filter combinations the sessions pick from
+
+
+def _selections(seed):
+    rng = random.Random(seed)
+    out = [{}]
+    for _ in range(SELECTIONS - 1):
+        out.append({"City": rng.sample(datagen.CITIES, rng.randint(1, 3)),
+                    "Food_Type": rng.sample(datagen.FOOD_TYPES, rng.randint(0, 1))})
+    return out
+
+
+def _worker(n, seconds, sessions, write_share, trend_share, start_at, out):
+    # runs in a fresh interpreter that inherited run()'s environment, so db builds its engine from it
+    try:
+        out.put(_serve(n, seconds, sessions, write_share, trend_share, start_at))
+    except Exception as e:
+        out.put({"fatal": f"worker {n}: {e}"})
+
+
+def _serve(n, seconds, sessions, write_share, trend_share, start_at):
+    import threading
+
+    import changefeed
+    import column_store
+    import db
+    import geo
+    import rollups
+    from queries import CONTACTS_CARD_SQL, LOOKUP_SQL
+    from scheduler import QueryBatch
+    from sql_filters import preview_queries
+
+    trend = [sql for qdict in rollups.trend_queries(db.engine).values() for sql in qdict.values()]
+    selections = [dict(s, City=geo.INDEX.ids(s["City"])) if "City" in s else s for s in _selections(datagen.SEED)]
+    max_food_id = int(db.read_df("SELECT MAX(Food_ID) AS m FROM food_listings")["m"].iloc[0])
+
+    def page(rng):
+        reads = QueryBatch("page")
+        for name, sql in LOOKUP_SQL.items():
+            reads.add(name, sql, ttl=db.LOOKUP_TTL)
+        reads.add("contacts", CONTACTS_CARD_SQL, ttl=db.METRIC_TTL)
+        reads.run()
+        changefeed.FEED.poll()
+        selection = rng.choice(selections)
+        sqls, params = preview_queries(selection)
+        filtered = QueryBatch("filtered")
+        for name, sql in sqls.items():
+            if name == "preview" or not column_store.enabled():
+                filtered.add(name, sql, params, ttl=db.METRIC_TTL)
+        filtered.run()
+        if column_store.enabled():
+            column_store.preview_counts(selection)
+        if rng.random() < trend_share:
+            db.read_df(rng.choice(trend))
+        if rng.random() < write_share:
+            food_id = rng.randint(1, max_food_id)
+            db.write("UPDATE food_listings SET Quantity = Quantity WHERE Food_ID = :id", {"id": food_id},
+                     keys={"food_listings": [food_id]})
+        failed = [r.error for b in (reads, filtered) for r in b.results.values() if not r.ok]
+        if failed:
+            raise RuntimeError(failed[0])
+
+    page(random.Random(n))      # warm-up: column store, indexes, local cache
+    latencies, errors = [], []
+    lock = threading.Lock()
+    wait = start_at - time.time()
+    if wait > 0:
+        time.sleep(wait)
+    deadline = time.time() + seconds
+
+    def session(i):
+        rng = random.Random(n * 1000 + i)
+        while time.time() < deadline:
+            t0 = time.perf_counter()
+            try:
+                page(rng)
+                ms = (time.perf_counter() - t0) * 1000
+                with lock:
+                    latencies.append(ms)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e).splitlines()[0])
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = db.cache.stats()
+    return {"pages": len(latencies), "latencies": latencies, "errors": errors,
+            "db_reads": stats["misses"], "shared_hits": stats["shared_hits"], "local_hits": stats["hits"],
+            "pool": db.engine.pool.status()}
+
+
+def run(workers, env, seconds, sessions, write_share, trend_share):
+    """Start workers processes with env set, wait for all of them and return their combined counters."""
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    # every worker starts timing at the same moment, after the slowest import and warm-up
+    start_at = time.time() + 5 + 2 * workers
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        procs = [ctx.Process(target=_worker, args=(n, seconds, sessions, write_share, trend_share, start_at, out))
+                 for n in range(workers)]
+        for p in procs:
+            p.start()
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    fatal = [r["fatal"] for r in results if "fatal" in r]
+    if fatal:
+        raise RuntimeError("; ".join(fatal))
+    latencies = sorted(ms for r in results for ms in r["latencies"])
+    pages = len(latencies)
+    return {
+        "workers": workers,
+        "pages": pages,
+        "pages_per_s": pages / seconds,
+        "p50_ms": median(latencies) if latencies else 0.0,
+        "p95_ms": latencies[int(0.95 * (pages - 1))] if latencies else 0.0,
+        "db_reads": sum(r["db_reads"] for r in results),
+        "shared_hits": sum(r["shared_hits"] for r in results),
+        "errors": [e for r in results for e in r["errors"]],
+        "pool": results[0]["pool"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Page throughput as worker processes are added.")
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1m or a listing count")
+    parser.add_argument("--data-dir", default=tempfile.gettempdir(),
+                        help="where the generated SQLite databases are kept between runs")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to try")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS)
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="concurrent sessions per worker")
+    parser.add_argument("--write-share", type=float, default=DEFAULT_WRITE_SHARE)
+    parser.add_argument("--trend-share", type=float, default=DEFAULT_TREND_SHARE)
+    parser.add_argument("--shared", default="",
+                        help="FOOD_SHARED_CACHE for the workers; 'file' uses a fresh temp directory per run")
+    parser.add_argument("--connections", type=int,
+                        help="FOOD_DB_MAX_CONNECTIONS, split across the workers of each run")
+    args = parser.parse_args(argv)
+
+    rows = datagen.parse_scale(args.scale)
+    path = os.path.join(args.data_dir, f"food_bench_{rows}_{datagen.SEED}.db")
+    print(f"Dataset: {rows:,} listings/claims -> {path}")
+    datagen.build(path, rows).dispose()
+
+    print(f"{'workers':>7} {'pages/s':>9} {'scaling':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'db reads':>9} {'shared hits':>12}  pool")
+    single = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        env = {"FOOD_DB_URI": f"sqlite:///{path}", "FOOD_WORKERS": str(workers), "FOOD_SHARED_CACHE": ""}
+        if args.connections:
+            env["FOOD_DB_MAX_CONNECTIONS"] = str(args.connections)
+        cache_dir = None
+        if args.shared == "file":
+            cache_dir = tempfile.mkdtemp(prefix="food_shared_")
+            env["FOOD_SHARED_CACHE"] = f"file:{cache_dir}"
+        elif args.shared:
+            env["FOOD_SHARED_CACHE"] = args.shared
+        try:
+            r = run(workers, env, args.seconds, args.sessions, args.write_share, args.trend_share)
+        finally:
+            if cache_dir:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+        single = single or r["pages_per_s"] / workers
+        print(f"{workers:>7} {r['pages_per_s']:>9.1f} {r['pages_per_s'] / single:>7.2f}x {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['db_reads']:>9,} {r['shared_hits']:>12,}  {r['pool']}")
+        for error in sorted(set(r["errors"]))[:3]:
+            print(f"        error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/run.py
+# Headless benchmark of the dashboard's SQL and pandas workloads on a local
+# SQLite copy of synthetic data. Run from the repository root:
+#   python -m benchmarks.run --scale 10k                    time every case
+#   python -m benchmarks.run --scale 100k --save-baseline   record a baseline
+#   python -m benchmarks.run --scale 100k --only trend/     compare a subset
+# With a baseline for the scale present, the run exits 1 if any case got
+# slower than --tolerance (and by more than --min-ms).
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from statistics import median
+
+import db
+import profiler
+from benchmarks import datagen
+from benchmarks.cases import cases
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25   # 25% slower than baseline is a regression...
+DEFAULT_MIN_MS = 2.0       # ...unless the absolute difference is within timer noise
+
+
+def measure(fn, repeat):
+    """Median / min wall time over repeat runs (after one warm-up) and peak traced memory of one run."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn()
+        times.append(time.perf_counter() - start)
+    # traced separately: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    secs = median(times)
+    return {
+        "median_ms": round(secs * 1000, 3),
+        "min_ms": round(min(times) * 1000, 3),
+        "rows": rows,
+        "rows_per_s": round(rows / secs, 1) if secs else None,
+        "ops_per_s": round(1 / secs, 2) if secs else None,
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "status": "ok",
+    }
+
+
+def run_cases(selected, repeat, report=print):
+    results = {}
+    for name, fn in selected.items():
+        try:
+            results[name] = measure(fn, repeat)
+        except Exception as e:
+            results[name] = {"status": f"error: {str(e).splitlines()[0]}"}
+        r = results[name]
+        if r["status"] == "ok":
+            report(f"  {name:<60} {r['median_ms']:>10.1f} ms  {r['rows_per_s'] or 0:>12,.0f} rows/s"
+                   f"  {r['peak_mb']:>8.1f} MB")
+        else:
+            report(f"  {name:<60} {r['status']}")
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_ms=DEFAULT_MIN_MS):
+    """Return [(case, baseline_ms, now_ms, ratio)] for every case slower than the baseline allows."""
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        now = results.get(name)
+        if not now or now["status"] != "ok" or base.get("status") != "ok":
+            continue
+        before, after = base["median_ms"], now["median_ms"]
+        if after > before * (1 + tolerance) and after - before > min_ms:
+            regressions.append((name, before, after, after / before))
+    return regressions
+
+
+def environment():
+    return {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(), "system": platform.system()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dashboard queries on synthetic data.")
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1m or a listing count")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", default="", help="run cases whose name starts with this prefix")
+    parser.add_argument("--data-dir", default=tempfile.gettempdir(),
+                        help="where the generated SQLite databases are kept between runs")
+    parser.add_argument("--baseline", help="baseline JSON (default benchmarks/baselines/<scale>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--min-ms", type=float, default=DEFAULT_MIN_MS)
+    parser.add_argument("--json", help="also write this run's results to a file")
+    args = parser.parse_args(argv)
+
+    rows = datagen.parse_scale(args.scale)
+    path = os.path.join(args.data_dir, f"food_bench_{rows}_{datagen.SEED}.db")
+    print(f"Dataset: {rows:,} listings/claims -> {path}")
+    db.engine = profiler.install(datagen.build(path, rows))
+
+    selected = {k: v for k, v in cases().items() if k.startswith(args.only)}
+    started = time.perf_counter()
+    results = run_cases(selected, args.repeat)
+    run = {"scale": rows, "repeat": args.repeat, "env": environment(),
+           "seconds": round(time.perf_counter() - started, 1), "results": results}
+    print(f"{len(results)} cases in {run['seconds']}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(run, fh, indent=2)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{args.scale.lower()}.json")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path) or ".", exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as fh:
+            json.dump(run, fh, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print("No baseline to compare against (use --save-baseline).")
+        return 0
+
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    if baseline.get("env") != run["env"]:
+        print(f"Note: baseline was recorded on {baseline.get('env')}")
+    regressions = compare(results, baseline, args.tolerance, args.min_ms)
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION  {name:<60} {before:>9.1f} -> {after:>9.1f} ms  (x{ratio:.2f})")
+    if regressions:
+        return 1
+    print(f"No regressions against {baseline_path} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+# bulk.py
+# Bulk insert / update / delete for the CRUD tables, from an uploaded CSV or an
+# edited st.data_editor grid. Every row is checked in one vectorised pass
+# (required fields, numbers, dates, statuses, keys and foreign keys that must
+# exist); the valid rows are then written in one transaction, one executemany
+# per action, and the rest come back in a per-row error report. Claims go
+# through claim_service.apply_batch, so their quantities stay reserved.
+#   python bulk.py food_listings changes.csv [--dry-run]
+#
+# The optional Action column holds insert / update / delete; without it a row
+# with a key is an update and a row without one an insert. An update writes
+# only the columns present in the input, and a blank cell there stores NULL.
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+import pandas as pd
+from sqlalchemy import text
+
+import claim_service
+import db
+import history
+import profiler
+
+ACTIONS = ("insert", "update", "delete")
+ACTION_COLUMN = "Action"
+MAX_ROWS = 50_000        # rows per call; larger files go through ingest.py
+IN_CHUNK = 1000          # keys per "IN (...)" existence check
+CLAIM_STATUSES = ("Pending", "Completed", "Cancelled")
+
+# key, editable columns, columns an insert needs, integers (> 0 when positive), dates,
+# and foreign keys {column: (table, key)}
+Spec = namedtuple("Spec", "key columns required ints positive dates fks")
+SPECS = {
+    "providers": Spec("Provider_ID", ["Name", "Type", "Address", "City", "Contact"],
+                      ["Name"], [], [], [], {}),
+    "receivers": Spec("Receiver_ID", ["Name", "Type", "City", "Contact"],
+                      ["Name"], [], [], [], {}),
+    "food_listings": Spec("Food_ID", ["Food_Name", "Quantity", "Expiry_Date", "Provider_ID", "Provider_Type",
+                                      "Location", "Food_Type", "Meal_Type"],
+                          ["Food_Name", "Quantity", "Expiry_Date"], ["Quantity", "Provider_ID"], ["Quantity"],
+                          ["Expiry_Date"], {"Provider_ID": ("providers", "Provider_ID")}),
+    "claims": Spec("Claim_ID", ["Food_ID", "Receiver_ID", "Claim_Quantity", "Status", "Timestamp"],
+                   ["Food_ID", "Receiver_ID", "Claim_Quantity"], ["Food_ID", "Receiver_ID", "Claim_Quantity"],
+                   ["Claim_Quantity"], ["Timestamp"],
+                   {"Food_ID": ("food_listings", "Food_ID"), "Receiver_ID": ("receivers", "Receiver_ID")}),
+}
+
+REPORT_COLUMNS = ["Row", "Action", "Key", "Error"]
+
+
+class BulkResult:
+    __slots__ = ("table", "inserted", "updated", "deleted", "errors", "dry_run")
+
+    def __init__(self, table, errors, dry_run=False):
+        self.table = table
+        self.inserted = self.updated = self.deleted = 0
+        self.errors = errors        # DataFrame[REPORT_COLUMNS], one row per problem
+        self.dry_run = dry_run
+
+    @property
+    def ok(self):
+        return self.errors.empty
+
+    def summary(self):
+        verb = "would be" if self.dry_run else "were"
+        return (f"{self.inserted} inserted, {self.updated} updated, {self.deleted} deleted; "
+                f"{self.errors['Row'].nunique() if not self.errors.empty else 0} rows {verb} rejected")
+
+
+# ---------------------------
+# VALIDATION (vectorised)
+# ---------------------------
+def template(table):
+    """Empty frame with the columns a bulk file for table may carry."""
+    spec = SPECS[table]
+    return pd.DataFrame(columns=[ACTION_COLUMN, spec.key, *spec.columns])
+
+
+def changes(table, before, after):
+    """The rows of an edited grid (after) that differ from what it was loaded with (before).
+
+    New rows (no key) become inserts, edited rows updates and removed rows deletes; the
+    result has an Action column and goes straight into apply().
+    """
+    key = SPECS[table].key
+    cols = [c for c in SPECS[table].columns if c in after]
+    kept = after[after[key].notna()].set_index(key)
+    old = before.set_index(key).reindex(kept.index)
+    new_vals, old_vals = kept[cols].astype(object), old[cols].astype(object)
+    same = (new_vals == old_vals) | (new_vals.isna() & old_vals.isna())
+    return pd.concat([
+        after[after[key].isna()].assign(**{ACTION_COLUMN: "insert"}),
+        kept[~same.all(axis=1)].reset_index().assign(**{ACTION_COLUMN: "update"}),
+        before.loc[~before[key].isin(kept.index), [key]].assign(**{ACTION_COLUMN: "delete"}),
+    ], ignore_index=True)[[ACTION_COLUMN, key, *cols]]
+
+
+def _existing(conn, table, key, ids):
+    found = set()
+    ids = sorted({int(i) for i in ids})
+    for start in range(0, len(ids), IN_CHUNK):
+        chunk = ", ".join(str(i) for i in ids[start:start + IN_CHUNK])   # ints, safe to inline
+        found.update(int(k) for k in conn.execute(text(f"SELECT {key} FROM {table} WHERE {key} IN ({chunk})")).scalars())
+    return found
+
+
+def _as_int(s):
+    """Nullable integers; non-numbers and fractions become <NA> (checked against the raw values)."""
+    num = pd.to_numeric(s, errors="coerce")
+    return num.where(num.isna() | (num == num.round())).astype("Int64")
+
+
+def prepare(table, df, conn=None):
+    """Normalise df and check every row; returns (plan, errors).
+
+    plan holds the typed columns plus _row (1-based input row) and _action; errors is a
+    REPORT_COLUMNS frame. A row with any error is left out of the plan.
+    """
+    spec = SPECS[table]
+    if len(df) > MAX_ROWS:
+        raise ValueError(f"{len(df)} rows is more than {MAX_ROWS}; load large files with ingest.py")
+    unknown = [c for c in df.columns if c not in (ACTION_COLUMN, spec.key, *spec.columns)]
+    if unknown:
+        raise ValueError(f"unknown column(s) for {table}: {', '.join(unknown)}")
+
+    plan = df.copy().reset_index(drop=True)
+    plan["_row"] = plan.index + 1
+    key = _as_int(plan[spec.key]) if spec.key in plan else pd.Series(pd.NA, index=plan.index, dtype="Int64")
+    raw_key = plan[spec.key] if spec.key in plan else key
+    plan[spec.key] = key
+    if ACTION_COLUMN in plan:
+        action = plan[ACTION_COLUMN].astype("string").str.strip().str.lower()
+        action = action.fillna("").mask(action.fillna("") == "", pd.NA)
+    else:
+        action = pd.Series(pd.NA, index=plan.index, dtype="string")
+    plan["_action"] = action.fillna(pd.Series("update", index=plan.index).where(key.notna(), "insert"))
+
+    problems = []
+
+    def flag(mask, message):
+        mask = mask.fillna(False).astype(bool)
+        if mask.any():
+            msg = message[mask] if isinstance(message, pd.Series) else message
+            problems.append(pd.DataFrame({"Row": plan.loc[mask, "_row"], "Action": plan.loc[mask, "_action"],
+                                          "Key": key[mask], "Error": msg}))
+
+    act = plan["_action"]
+    inserting, writing = act == "insert", act.isin(["insert", "update"])
+    flag(~act.isin(ACTIONS), "Action must be one of " + ", ".join(ACTIONS))
+    flag(raw_key.notna() & raw_key.astype("string").str.strip().ne("") & key.isna(), f"{spec.key} must be a whole number")
+    flag(act.isin(["update", "delete"]) & key.isna(), f"{spec.key} is needed to {'/'.join(ACTIONS[1:])}")
+    flag(inserting & key.notna(), f"leave {spec.key} empty for an insert (new IDs are assigned)")
+
+    blank = {}
+    for col in spec.columns:
+        if col not in plan:
+            continue
+        raw = plan[col]
+        blank[col] = raw.isna() | raw.astype("string").str.strip().eq("")
+        if col in spec.ints:
+            plan[col] = _as_int(raw)
+            flag(writing & ~blank[col] & plan[col].isna(), f"{col} must be a whole number")
+            if col in spec.positive:
+                flag(writing & (plan[col] <= 0), f"{col} must be positive")
+        elif col in spec.dates:
+            parsed = pd.to_datetime(raw, errors="coerce")
+            plan[col] = parsed.dt.date if col == "Expiry_Date" else parsed
+            flag(writing & ~blank[col] & parsed.isna(), f"{col} is not a date")
+        else:
+            plan[col] = raw.astype("string").str.strip().replace("", pd.NA)
+    for col in spec.required:
+        missing = blank[col] if col in plan else pd.Series(True, index=plan.index)
+        # an insert needs every required column; an update may leave a column out, but not blank it
+        # claim quantities are fixed once reserved, so claims updates never need one
+        fixed = table == "claims" and col == "Claim_Quantity"
+        flag((inserting & missing) | (act.eq("update") & (col in plan) & missing & (not fixed)), f"{col} is required")
+    if table == "claims" and "Status" in plan:
+        plan["Status"] = plan["Status"].str.title()
+        flag(writing & plan["Status"].notna() & ~plan["Status"].isin(CLAIM_STATUSES),
+             "Status must be one of " + ", ".join(CLAIM_STATUSES))
+
+    # keys and foreign keys that must exist: one IN (...) query per referenced table
+    dup = key.notna() & key.duplicated(keep=False)
+    flag(dup, f"{spec.key} appears more than once")
+    close = conn is None
+    conn = conn or db.engine.connect()
+    try:
+        targets = key[act.isin(["update", "delete"]) & key.notna()]
+        have = _existing(conn, table, spec.key, targets)
+        flag(act.isin(["update", "delete"]) & key.notna() & ~key.isin(have),
+             f"{spec.key} " + key.astype("string") + " does not exist")
+        for col, (ref_table, ref_key) in spec.fks.items():
+            if col not in plan:
+                continue
+            refs = plan[col][writing & plan[col].notna()]
+            have = _existing(conn, ref_table, ref_key, refs)
+            flag(writing & plan[col].notna() & ~plan[col].isin(have),
+                 f"{col} " + plan[col].astype("string") + " does not exist")
+    finally:
+        if close:
+            conn.close()
+
+    errors = (pd.concat(problems, ignore_index=True).sort_values(["Row", "Error"], kind="stable")
+              if problems else pd.DataFrame(columns=REPORT_COLUMNS))
+    return plan[~plan["_row"].isin(errors["Row"])], errors.reset_index(drop=True)
+
+
+# ---------------------------
+# WRITES
+# ---------------------------
+def _records(frame, columns):
+    # pd.NA / NaT -> None so the driver sends NULL; numpy ints -> int
+    out = frame[columns].astype(object).where(frame[columns].notna(), None).to_dict("records")
+    for rec in out:
+        for col, value in rec.items():
+            if hasattr(value, "item"):
+                rec[col] = value.item()
+            elif isinstance(value, pd.Timestamp):
+                rec[col] = value.to_pydatetime()
+    return out
+
+
+class _Rollback(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+
+
+def _write(table, plan):
+    """One transaction: executemany DELETE, UPDATE and INSERT; returns (inserted, updated, deleted)."""
+    spec = SPECS[table]
+    cols = [c for c in spec.columns if c in plan]
+    inserts = plan[plan["_action"] == "insert"]
+    updates = plan[plan["_action"] == "update"]
+    deletes = plan[plan["_action"] == "delete"]
+    start = time.perf_counter()
+    status = "error"
+    try:
+        with profiler.named(f"bulk/{table}"), db.engine.begin() as conn:
+            _statements(conn, table, cols, inserts, updates, deletes)
+        status = "ok"
+    finally:
+        profiler.record("write", f"bulk/{table}", (time.perf_counter() - start) * 1000, status=status,
+                        rows=len(plan) if status == "ok" else 0)
+    # executemany gives no new IDs, so an insert makes index subscribers reload instead of patching
+    touched = [int(k) for k in pd.concat([updates[spec.key], deletes[spec.key]])]
+    db.cache.invalidate_tables([table], keys=None if len(inserts) else {table: touched})
+    return len(inserts), len(updates), len(deletes)
+
+
+def _statements(conn, table, cols, inserts, updates, deletes):
+    """Run the DELETE, UPDATE and INSERT executemanys inside conn's transaction."""
+    spec = SPECS[table]
+    if len(deletes):
+        conn.execute(text(f"DELETE FROM {table} WHERE {spec.key} = :k"),
+                     [{"k": int(k)} for k in deletes[spec.key]])
+    if len(updates) and cols:
+        sets = ", ".join(f"{c} = :{c}" for c in cols)
+        conn.execute(text(f"UPDATE {table} SET {sets} WHERE {spec.key} = :{spec.key}"),
+                     _records(updates, [spec.key, *cols]))
+    if len(inserts):
+        conn.execute(text(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)})"),
+                     _records(inserts, cols))
+    if table == "food_listings" and "Quantity" in cols and len(updates):
+        # a listing cannot drop below what its active claims hold (claim_service reserves it)
+        short = claim_service.oversold(conn, updates[spec.key])
+        if short:
+            bad = updates[updates[spec.key].isin(list(short))]
+            raise _Rollback(pd.DataFrame({
+                "Row": bad["_row"], "Action": "update", "Key": bad[spec.key],
+                "Error": [f"Quantity is below the {short[int(k)]} already claimed" for k in bad[spec.key]]}))
+
+
+def _write_claims(plan):
+    """claim_service.apply_batch over the plan; returns (inserted, updated, deleted, errors)."""
+    key = "Claim_ID"
+    plan = plan.reindex(columns=[*plan.columns, *(c for c in SPECS["claims"].columns if c not in plan)])
+    deletes = plan[plan["_action"] == "delete"]
+    updates = plan[plan["_action"] == "update"]
+    inserts = plan[plan["_action"] == "insert"]
+    # claim_service.update rewrites the whole row: columns the input left out keep their values
+    ids = ", ".join(str(int(k)) for k in pd.concat([updates[key], deletes[key]])) or "NULL"
+    stored = db.read_df(f"SELECT Claim_ID, Food_ID, Receiver_ID, Claim_Quantity, Status, Timestamp "
+                        f"FROM claims WHERE Claim_ID IN ({ids})", name="bulk/claims_current")
+    current = stored.set_index(key).reindex(updates[key].astype("int64"))
+    rejected = {}
+    given = pd.to_numeric(updates["Claim_Quantity"]).to_numpy(dtype="float64", na_value=float("nan"))
+    moved = ~pd.isna(given) & (given != pd.to_numeric(current["Claim_Quantity"]).to_numpy(dtype="float64"))
+    rejected = {row: "Claim_Quantity cannot change; cancel the claim and make a new one"
+                for row in updates["_row"][moved]}
+    updates, current = updates[~moved], current[~moved]
+    updates = updates.copy()
+    for col in ["Food_ID", "Receiver_ID", "Status", "Timestamp"]:
+        values = current[col].to_numpy()
+        updates[col] = updates[col].where(updates[col].notna(), values)
+    # a listing or receiver deletion leaves NULL behind, which the row has to replace
+    orphaned = updates["Food_ID"].isna() | updates["Receiver_ID"].isna()
+    rejected.update({row: "Food_ID and Receiver_ID are required (the stored ones were deleted)"
+                     for row in updates["_row"][orphaned]})
+    updates = updates[~orphaned]
+    timestamp = pd.Timestamp.now().to_pydatetime()
+
+    def ts(value):
+        return timestamp if pd.isna(value) else pd.Timestamp(value).to_pydatetime()
+
+    errors = claim_service.apply_batch(
+        inserts=[(r, int(f), int(rc), int(q), s if pd.notna(s) else "Pending", ts(t)) for r, f, rc, q, s, t in zip(
+            inserts["_row"], inserts["Food_ID"], inserts["Receiver_ID"], inserts["Claim_Quantity"],
+            inserts["Status"], inserts["Timestamp"])],
+        updates=[(r, int(c), int(f), int(rc), s, ts(t)) for r, c, f, rc, s, t in zip(
+            updates["_row"], updates[key], updates["Food_ID"], updates["Receiver_ID"], updates["Status"],
+            updates["Timestamp"])],
+        deletes=[(r, int(c)) for r, c in zip(deletes["_row"], deletes[key])],
+    )
+    # claims of any date may have moved: the claims_daily days they left and landed on are stale
+    # (a claim without a Timestamp gets now, which the chart counts live)
+    stamps = pd.concat([pd.to_datetime(frame["Timestamp"]) for frame in (stored, inserts, updates)])
+    if stamps.notna().any():
+        with db.engine.begin() as conn:
+            history.mark_stale(conn, stamps.min().to_pydatetime(), stamps.max().to_pydatetime())
+        db.cache.invalidate_tables(["claims_daily"])
+    errors.update(rejected)
+    report = pd.DataFrame({"Row": list(errors), "Error": list(errors.values())})
+    report = report.merge(plan[["_row", "_action", key]].rename(columns={"_row": "Row", "_action": "Action",
+                                                                          key: "Key"}), on="Row")
+    counts = [int((~frame["_row"].isin(errors)).sum()) for frame in (inserts, updates, deletes)]
+    return (*counts, report[REPORT_COLUMNS])
+
+
+def apply(table, df, dry_run=False):
+    """Validate df and write its valid rows in one transaction; returns a BulkResult.
+
+    With dry_run nothing is written and the counts are what would have been applied; how much
+    of a listing is left to claim is only known when the claims are actually reserved.
+    """
+    plan, errors = prepare(table, df)
+    result = BulkResult(table, errors, dry_run)
+    if dry_run or plan.empty:
+        if dry_run:
+            result.inserted, result.updated, result.deleted = (int((plan["_action"] == a).sum()) for a in ACTIONS)
+        return result
+    if table == "claims":
+        result.inserted, result.updated, result.deleted, rejected = _write_claims(plan)
+        result.errors = pd.concat([errors, rejected], ignore_index=True) if not rejected.empty else errors
+    else:
+        try:
+            result.inserted, result.updated, result.deleted = _write(table, plan)
+        except _Rollback as e:
+            # nothing was written; report why, and the other rows as not applied
+            held = plan[~plan["_row"].isin(e.errors["Row"])]
+            result.errors = pd.concat([errors, e.errors, pd.DataFrame({
+                "Row": held["_row"], "Action": held["_action"], "Key": held[SPECS[table].key],
+                "Error": "not applied: another row in the batch was rejected"})], ignore_index=True)
+    result.errors = result.errors.sort_values("Row", kind="stable").reset_index(drop=True)
+    return result
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk insert / update / delete rows from a CSV.")
+    parser.add_argument("table", choices=list(SPECS))
+    parser.add_argument("csv")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    args = parser.parse_args(argv)
+
+    result = apply(args.table, pd.read_csv(args.csv), dry_run=args.dry_run)
+    if not result.errors.empty:
+        with pd.option_context("display.width", 200, "display.max_rows", None, "display.max_colwidth", 80):
+            print(result.errors.to_string(index=False))
+    print(result.summary())
+    return 0 if result.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
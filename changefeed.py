@@ -0,0 +1,451 @@
+# changefeed.py
+# Change log of the four base tables, so readers fetch "what changed since
+# seq N" instead of re-reading whole tables. Triggers (MySQL and SQLite) append
+# one change_log row per inserted / updated / deleted row, whoever wrote it:
+# execute_query, claim_service, the archive sweep, ingest.py or another process.
+# Seq is monotonic; FEED polls past its cursor and hands the changes to its
+# subscribers: the query cache (writes from other processes invalidate it too),
+# the overview counters and the Latest Records grid, which patch themselves from
+# the changed rows alone.
+#   python changefeed.py since N [--table t]     list changes after seq N
+#   python changefeed.py status
+import argparse
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+import db
+import profiler
+from queries import LATEST_SQL, OVERVIEW_TOTALS_SQL
+from rollups import trigger_ddl
+
+POLL_INTERVAL = 2.0     # seconds; FEED.poll() calls closer together than this are free
+POLL_ROWS = 5000        # change rows read per round trip
+RESET_AFTER = 20000     # a view more changes behind than this reloads instead of patching
+GAP_TIMEOUT = 10.0      # seconds a missing Seq is waited for at most (a transaction still in flight)
+RETAIN_HOURS = 24       # change rows older than this are pruned by maintenance.py
+PRUNE_BATCH = 5000
+
+CHANGE_LOG_SQL = """
+CREATE TABLE IF NOT EXISTS change_log (
+    Seq BIGINT PRIMARY KEY AUTO_INCREMENT,
+    Table_Name VARCHAR(64) NOT NULL,
+    Row_ID INT NOT NULL,
+    Op CHAR(1) NOT NULL,
+    Quantity_Delta INT NOT NULL DEFAULT 0,
+    Changed_At DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# table -> primary key; Op is 'I', 'U' or 'D'
+TABLES = {
+    "providers": "Provider_ID",
+    "receivers": "Receiver_ID",
+    "food_listings": "Food_ID",
+    "claims": "Claim_ID",
+}
+
+# child rows an FK action changes when a parent row is deleted: MySQL fires no
+# triggers for them, so the parent's BEFORE DELETE trigger logs them instead
+# (SQLite does fire them and gets no such trigger)
+# (parent -> [(child table, child FK column, Op)])
+FK_ACTIONS = {
+    "providers": [("food_listings", "Provider_ID", "U")],
+    "food_listings": [("claims", "Food_ID", "D")],
+    "receivers": [("claims", "Receiver_ID", "U")],
+}
+
+Change = namedtuple("Change", "seq table row_id op quantity_delta")
+
+
+# ---------------------------
+# TRIGGERS
+# ---------------------------
+def _log(table, row, op, quantity_delta="0"):
+    return (f"INSERT INTO change_log (Table_Name, Row_ID, Op, Quantity_Delta) "
+            f"VALUES ('{table}', {row}.{TABLES[table]}, '{op}', {quantity_delta});")
+
+
+def _quantity(r):
+    return f"COALESCE({r}.Quantity, 0)"
+
+
+def _triggers(dialect="mysql"):
+    """(name, timing, event, table, body) for every logged table, in rollups.TRIGGERS form."""
+    out = []
+    for table in TABLES:
+        listing = table == "food_listings"
+        out += [
+            (f"trg_{table}_log_ai", "AFTER", "INSERT", table,
+             [_log(table, "NEW", "I", _quantity("NEW") if listing else "0")]),
+            (f"trg_{table}_log_au", "AFTER", "UPDATE", table,
+             [_log(table, "NEW", "U", f"{_quantity('NEW')} - {_quantity('OLD')}" if listing else "0")]),
+            (f"trg_{table}_log_ad", "AFTER", "DELETE", table,
+             [_log(table, "OLD", "D", f"-{_quantity('OLD')}" if listing else "0")]),
+        ]
+        children = [
+            f"INSERT INTO change_log (Table_Name, Row_ID, Op) "
+            f"SELECT '{child}', {TABLES[child]}, '{op}' FROM {child} WHERE {fk} = OLD.{TABLES[table]};"
+            for child, fk, op in (FK_ACTIONS.get(table, []) if dialect == "mysql" else [])
+        ]
+        if children:
+            out.append((f"trg_{table}_log_bd", "BEFORE", "DELETE", table, children))
+    return out
+
+
+def install_triggers(conn):
+    """Migration step: attach the change_log triggers (after CHANGE_LOG_SQL)."""
+    for name, timing, event, table, body in _triggers(conn.dialect.name):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text(trigger_ddl(name, timing, event, table, body)))
+
+
+# ---------------------------
+# READING CHANGES
+# ---------------------------
+def bounds(conn):
+    """(oldest, newest) Seq still in change_log; (None, None) when it is empty."""
+    return tuple(conn.execute(text("SELECT MIN(Seq), MAX(Seq) FROM change_log")).one())
+
+
+def changes_since(seq, tables=None, limit=POLL_ROWS, conn=None):
+    """Up to limit Change rows with Seq > seq, oldest first, optionally only for tables."""
+    sql = "SELECT Seq, Table_Name, Row_ID, Op, Quantity_Delta FROM change_log WHERE Seq > :seq"
+    params = {"seq": seq, "limit": limit}
+    if tables:
+        names = [f"t{i}" for i in range(len(tables))]
+        sql += f" AND Table_Name IN ({', '.join(':' + n for n in names)})"
+        params.update(zip(names, tables))
+    sql += " ORDER BY Seq LIMIT :limit"
+    if conn is None:
+        with db.engine.connect() as conn:
+            rows = conn.execute(text(sql), params).all()
+    else:
+        rows = conn.execute(text(sql), params).all()
+    return [Change(*row) for row in rows]
+
+
+def prune(engine=None, retain_hours=RETAIN_HOURS, should_stop=None):
+    """Delete change rows older than retain_hours in batches; the newest row always stays."""
+    engine = engine or db.engine
+    cutoff = datetime.now() - timedelta(hours=retain_hours)
+    with engine.connect() as conn:
+        newest = bounds(conn)[1]
+    if newest is None:
+        return 0
+    deleted = 0
+    # keeping the newest row stops SQLite (and MySQL < 8 on restart) from handing out used Seqs again
+    while not (should_stop and should_stop()):
+        with engine.begin() as conn:
+            upto = conn.execute(text(
+                "SELECT MAX(Seq) FROM (SELECT Seq FROM change_log WHERE Seq < :newest AND Changed_At < :cutoff "
+                "ORDER BY Seq LIMIT :n) b"), {"newest": newest, "cutoff": cutoff, "n": PRUNE_BATCH}).scalar()
+            if upto is None:
+                break
+            deleted += conn.execute(text("DELETE FROM change_log WHERE Seq <= :upto"), {"upto": upto}).rowcount
+    return deleted
+
+
+# ---------------------------
+# FEED (one cursor per process)
+# ---------------------------
+class Feed:
+    """Polls change_log past its cursor and calls every subscriber with the new changes.
+
+    A subscriber gets fn(changes), or fn(None) when it has to reload from scratch: the
+    first poll, a cursor the pruning overtook, or no change_log at all (it then reloads
+    on every poll, which is how the page behaved without the feed).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._listeners = []
+        self.cursor = None      # every Seq <= cursor has been delivered
+        self._seen = set()      # delivered Seqs above the cursor
+        self._holes = {}        # missing Seq -> (monotonic, server time) of the poll that noticed it
+        self._trx_visible = True    # MySQL: INNODB_TRX readable (needs the PROCESS privilege)
+        self._polled_at = 0.0
+        self._delivering = False
+        self.available = True
+        self.polls = 0
+        self.delivered = 0
+        self.resets = 0
+
+    def subscribe(self, fn):
+        with self._lock:
+            if fn not in self._listeners:
+                self._listeners.append(fn)
+
+    def _notify(self, changes):
+        self._delivering = True
+        try:
+            for fn in list(self._listeners):
+                fn(changes)
+        finally:
+            self._delivering = False
+
+    def on_write(self, tables, keys):
+        """Cache subscriber: a write in this process makes the next poll due at once."""
+        if not self._delivering and tables & set(TABLES):
+            self._polled_at = 0.0
+
+    def _reset(self, newest):
+        self.cursor = newest or 0
+        self._seen.clear()
+        self._holes.clear()
+        self.resets += 1
+        self._notify(None)
+
+    def _advance(self, now, lost):
+        # Seqs are handed out at insert but become visible at commit, so a gap may be
+        # a transaction still in flight, or one that rolled back (on InnoDB its Seq is
+        # never reused); lost(seq) says no open transaction can still own it, and after
+        # GAP_TIMEOUT the gap is skipped regardless
+        top = max(self._seen, default=self.cursor)
+        for seq in range(self.cursor + 1, top):
+            if seq not in self._seen:
+                self._holes.setdefault(seq, (now, None))
+        while self.cursor < top:
+            nxt = self.cursor + 1
+            if nxt in self._seen:
+                self._seen.discard(nxt)
+            elif not lost(nxt) and now - self._holes.get(nxt, (now,))[0] < GAP_TIMEOUT:
+                break
+            self._holes.pop(nxt, None)
+            self.cursor = nxt
+
+    def _open_before(self, conn):
+        """Before a read: (True, start of the oldest other open transaction or None) on MySQL,
+        (False, None) when that cannot be told."""
+        if conn.dialect.name != "mysql" or not self._trx_visible or not self._holes:
+            return False, None
+        try:
+            return True, conn.execute(text(
+                "SELECT MIN(trx_started) FROM information_schema.INNODB_TRX "
+                "WHERE trx_mysql_thread_id <> CONNECTION_ID()")).scalar()
+        except Exception:
+            self._trx_visible = False
+            return False, None
+
+    def _lost_rule(self, dialect, open_before):
+        """lost(seq) for _advance, from what was known before this poll's read."""
+        if dialect == "sqlite":
+            # one writer at a time: once a later Seq is visible, the missing one's writer has finished
+            return lambda seq: True
+        known, oldest = open_before
+        if not known:
+            return lambda seq: False
+
+        def lost(seq):
+            # noticed by an earlier poll (stamped after its read), and every transaction that
+            # could have held the Seq then has finished before this poll read again
+            noticed = self._holes.get(seq, (None, None))[1]
+            return noticed is not None and (oldest is None or oldest > noticed)
+        return lost
+
+    def _stamp_holes(self, conn):
+        # the server clock after the read, comparable with INNODB_TRX.trx_started
+        if conn.dialect.name == "mysql" and any(at is None for _, at in self._holes.values()):
+            server_now = conn.execute(text("SELECT NOW()")).scalar()
+            self._holes = {seq: (t, at or server_now) for seq, (t, at) in self._holes.items()}
+
+    def poll(self, force=False):
+        """Deliver the changes committed since the last poll; returns how many were delivered."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._polled_at < POLL_INTERVAL:
+                return 0
+            self._polled_at = now
+            self.polls += 1
+            try:
+                with db.engine.connect() as conn:
+                    oldest, newest = bounds(conn)
+                    self.available = True
+                    if self.cursor is None or (oldest is not None and oldest > self.cursor + 1):
+                        self._reset(newest)
+                        return 0
+                    if newest is None or newest <= self.cursor:
+                        return 0
+                    lost = self._lost_rule(conn.dialect.name, self._open_before(conn))
+                    fresh = []
+                    after = self.cursor
+                    while True:
+                        rows = changes_since(after, conn=conn)
+                        fresh += [c for c in rows if c.seq not in self._seen]
+                        if len(rows) < POLL_ROWS or len(fresh) > RESET_AFTER:
+                            break
+                        after = rows[-1].seq
+                    if len(fresh) <= RESET_AFTER:
+                        self._seen.update(c.seq for c in fresh)
+                        self._advance(now, lost)
+                        self._stamp_holes(conn)
+            except Exception:
+                # no change_log yet (migration 7 pending): subscribers reload every time
+                self.available = False
+                self.cursor = None
+                self._notify(None)
+                return 0
+            if len(fresh) > RESET_AFTER:
+                self._reset(newest)
+                return 0
+            if fresh:
+                self.delivered += len(fresh)
+                self._notify(fresh)
+            return len(fresh)
+
+    def stats(self):
+        with self._lock:
+            return {"cursor": self.cursor, "available": self.available, "polls": self.polls,
+                    "delivered": self.delivered, "resets": self.resets, "waiting": len(self._holes)}
+
+
+def _keys(changes, table):
+    return sorted({c.row_id for c in changes if c.table == table})
+
+
+def invalidate_cache(changes):
+    """Feed subscriber: writes seen in change_log (any process) drop cached reads and patch the indexes."""
+    if changes is None:
+        return
+    tables = {c.table for c in changes}
+    db.cache.invalidate_tables(tables, keys={t: _keys(changes, t) for t in tables})
+
+
+# ---------------------------
+# DELTA-MAINTAINED VIEWS
+# ---------------------------
+class LatestRows:
+    """The newest n rows of a table (a LATEST_SQL entry), patched from the changed rows alone."""
+
+    def __init__(self, table, sql, n=10):
+        self.table = table
+        self.key = TABLES[table]
+        self.sql = sql
+        self.n = n
+        self._lock = threading.RLock()
+        self._df = None
+        self.loads = 0
+        self.patches = 0
+
+    def on_change(self, changes):
+        with self._lock:
+            if changes is None:
+                self._df = None
+                return
+            ids = _keys(changes, self.table)
+            if not ids or self._df is None:
+                return
+            try:
+                self._patch(ids)
+            except Exception:
+                self._df = None
+
+    def _patch(self, ids):
+        fresh = db.read_df(f"SELECT * FROM {self.table} WHERE {self.key} IN ({', '.join(map(str, ids))})",
+                           name=f"feed/latest_{self.table}")
+        kept = self._df[~self._df[self.key].isin(ids)]
+        df = pd.concat([kept, fresh], ignore_index=True) if not fresh.empty else kept
+        df = df.sort_values(self.key, ascending=False).head(self.n).reset_index(drop=True)
+        if len(df) < min(self.n, len(self._df)):
+            self._df = None   # a shown row was deleted: the row that moves up is not in hand
+        else:
+            self._df = df
+            self.patches += 1
+
+    def frame(self):
+        with self._lock:
+            if self._df is None:
+                self._df = db.read_df(self.sql, name=f"feed/latest_{self.table}")
+                self.loads += 1
+            return self._df
+
+
+class Counters:
+    """The overview totals (OVERVIEW_TOTALS_SQL), kept current by adding the deltas in the change rows."""
+
+    COUNTED = {"providers": "providers_count", "receivers": "receivers_count"}
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._row = None
+        self._counted = set()   # Seqs the loaded totals already include
+        self.loads = 0
+        self.patches = 0
+
+    def on_change(self, changes):
+        with self._lock:
+            if changes is None or self._row is None:
+                self._row = None
+                return
+            row = dict(self._row)
+            for c in changes:
+                if c.seq in self._counted:
+                    self._counted.discard(c.seq)
+                elif c.table in self.COUNTED:
+                    row[self.COUNTED[c.table]] += {"I": 1, "D": -1}.get(c.op, 0)
+                elif c.table == "food_listings":
+                    row["total_quantity"] += c.quantity_delta
+            self._row = row
+            self.patches += 1
+
+    def frame(self):
+        """One-row DataFrame with the OVERVIEW_TOTALS_SQL columns."""
+        with self._lock:
+            if self._row is None:
+                self._load(FEED.cursor if FEED.available else None)
+            return pd.DataFrame([self._row])
+
+    def _load(self, cursor):
+        # totals and the changes past the feed's cursor are read in one transaction (one
+        # snapshot on MySQL), so a change the totals include is not added again on delivery
+        start = time.perf_counter()
+        with profiler.named("feed/overview_totals"), db.engine.connect() as conn:
+            row = conn.execute(text(OVERVIEW_TOTALS_SQL)).mappings().one()
+            counted = set() if cursor is None else set(conn.execute(
+                text("SELECT Seq FROM change_log WHERE Seq > :seq"), {"seq": cursor}).scalars())
+        profiler.record("query", "feed/overview_totals", (time.perf_counter() - start) * 1000, rows=1, status="ok")
+        self._row = {k: int(v or 0) for k, v in row.items()}
+        self._counted = counted
+        self.loads += 1
+
+
+FEED = Feed()
+FEED.subscribe(invalidate_cache)
+db.cache.subscribe(FEED.on_write)
+
+LATEST = {name: LatestRows(table, LATEST_SQL[name])
+          for name, table in zip(LATEST_SQL, ["providers", "receivers", "food_listings", "claims"])}
+OVERVIEW = Counters()
+for _view in [*LATEST.values(), OVERVIEW]:
+    FEED.subscribe(_view.on_change)
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read the change feed.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    since = sub.add_parser("since", help="list changes after a sequence number")
+    since.add_argument("seq", type=int)
+    since.add_argument("--table", action="append", choices=list(TABLES))
+    since.add_argument("--limit", type=int, default=100)
+    sub.add_parser("status", help="oldest and newest sequence numbers")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        with db.engine.connect() as conn:
+            oldest, newest = bounds(conn)
+        print(f"change_log: Seq {oldest} .. {newest}")
+    else:
+        changes = changes_since(args.seq, args.table, args.limit)
+        with pd.option_context("display.width", 200, "display.max_rows", None):
+            print(pd.DataFrame(changes, columns=Change._fields).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+# claim_service.py
+# Claim workflow with quantity reservation. food_listings.Reserved holds the
+# quantity taken by active (Pending / Completed) claims, so the amount still
+# available is Quantity - Reserved. Every change runs in one transaction:
+# lock the listing rows (SELECT ... FOR UPDATE on MySQL), decide, apply, and
+# re-check Reserved <= Quantity before commit. A lost race rolls back and retries.
+#   python claim_service.py batch claims.csv     (columns Food_ID, Receiver_ID, Claim_Quantity)
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import db
+
+ACTIVE_STATUSES = ("Pending", "Completed")
+MAX_ATTEMPTS = 5
+IN_CHUNK = 1000        # keys per literal "IN (...)" in oversold / recount_reserved
+RETRY_BACKOFF = 0.02   # seconds, doubled (with jitter) per attempt
+
+CLAIM_TABLES = ["claims", "food_listings"]
+
+
+class ClaimError(Exception):
+    """A claim request that cannot be honoured (unknown, expired or not enough left)."""
+
+
+class _Conflict(Exception):
+    # validation failed after writing: another transaction got there first
+    pass
+
+
+class ClaimOutcome:
+    __slots__ = ("food_id", "receiver_id", "quantity", "status", "timestamp", "claim_id", "error")
+
+    def __init__(self, food_id, receiver_id, quantity, status="Pending", timestamp=None):
+        self.food_id = int(food_id)
+        self.receiver_id = int(receiver_id)
+        self.quantity = int(quantity)
+        self.status = status
+        self.timestamp = timestamp
+        self.claim_id = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+# ---------------------------
+# TRANSACTION HELPERS
+# ---------------------------
+def _in_list(prefix, values):
+    names = [f"{prefix}_{i}" for i in range(len(values))]
+    return ", ".join(f":{n}" for n in names), dict(zip(names, values))
+
+
+def _lock_listings(conn, food_ids):
+    """{Food_ID: (available, expiry_date)} for food_ids, row-locked until commit where supported."""
+    placeholders, params = _in_list("fid", sorted(food_ids))
+    sql = (f"SELECT Food_ID, Quantity - Reserved AS Available, Expiry_Date FROM food_listings "
+           f"WHERE Food_ID IN ({placeholders}) ORDER BY Food_ID")
+    if conn.dialect.name == "mysql":
+        sql += " FOR UPDATE"   # ordered locking so concurrent batches cannot deadlock each other
+    return {int(r.Food_ID): (int(r.Available or 0), r.Expiry_Date)
+            for r in conn.execute(text(sql), params)}
+
+
+def _adjust_reserved(conn, deltas):
+    """Add {Food_ID: delta} to Reserved with one UPDATE ... CASE, then verify nothing is oversold."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    conn.info.get("claim_touched", set()).update(deltas)
+    whens, params = [], {}
+    for i, (fid, delta) in enumerate(deltas.items()):
+        whens.append(f"WHEN :w_{i} THEN :d_{i}")
+        params.update({f"w_{i}": fid, f"d_{i}": delta})
+    placeholders, in_params = _in_list("fid", list(deltas))
+    conn.execute(text(
+        f"UPDATE food_listings SET Reserved = Reserved + CASE Food_ID {' '.join(whens)} ELSE 0 END "
+        f"WHERE Food_ID IN ({placeholders})"
+    ), {**params, **in_params})
+    oversold = conn.execute(text(
+        f"SELECT COUNT(*) FROM food_listings WHERE Food_ID IN ({placeholders}) "
+        "AND (Reserved > Quantity OR Reserved < 0)"
+    ), in_params).scalar()
+    if oversold:
+        raise _Conflict()
+
+
+def _id_chunks(food_ids):
+    ids = sorted({int(i) for i in food_ids})
+    for i in range(0, len(ids), IN_CHUNK):
+        yield ", ".join(map(str, ids[i:i + IN_CHUNK]))
+
+
+def oversold(conn, food_ids):
+    """{Food_ID: Reserved} of the listings in food_ids whose Quantity is below what their claims hold.
+
+    Writers that change Quantity outside this module (bulk.py, ingest.py) run it before commit.
+    """
+    short = {}
+    for ids in _id_chunks(food_ids):
+        short.update({int(r.Food_ID): int(r.Reserved) for r in conn.execute(text(
+            f"SELECT Food_ID, Reserved FROM food_listings WHERE Food_ID IN ({ids}) AND Quantity < Reserved"))})
+    return short
+
+
+def recount_reserved(conn, food_ids):
+    """Set Reserved of food_ids to the quantity their active claims hold.
+
+    For writers that insert or rewrite claims rows directly (ingest.py); follow with oversold().
+    """
+    statuses = ", ".join(f"'{s}'" for s in ACTIVE_STATUSES)
+    for ids in _id_chunks(food_ids):
+        conn.execute(text(
+            "UPDATE food_listings SET Reserved = (SELECT COALESCE(SUM(c.Claim_Quantity), 0) FROM claims c "
+            f"WHERE c.Food_ID = food_listings.Food_ID AND c.Status IN ({statuses})) "
+            f"WHERE Food_ID IN ({ids})"))
+
+
+def _expired(expiry, today):
+    if expiry is None:
+        return False
+    if isinstance(expiry, str):
+        expiry = date.fromisoformat(expiry[:10])
+    if isinstance(expiry, datetime):
+        expiry = expiry.date()
+    return expiry < today
+
+
+def _retryable(e):
+    if isinstance(e, _Conflict):
+        return True
+    code = e.orig.args[0] if getattr(e.orig, "args", None) else None
+    # MySQL lock wait timeout / deadlock, SQLite busy writer
+    return code in (1205, 1213) or "locked" in str(e.orig).lower()
+
+
+def _transact(work):
+    """Run work(conn) in a transaction, retrying lock timeouts, deadlocks and lost races."""
+    for attempt in range(MAX_ATTEMPTS):
+        touched = set()
+        try:
+            with db.engine.begin() as conn:
+                conn.info["claim_touched"] = touched
+                try:
+                    result = work(conn)
+                finally:
+                    conn.info.pop("claim_touched", None)
+            db.cache.invalidate_tables(CLAIM_TABLES, keys={"food_listings": sorted(touched)})
+            return result
+        except (_Conflict, OperationalError) as e:
+            if not _retryable(e):
+                raise
+            if attempt == MAX_ATTEMPTS - 1:
+                raise ClaimError("the listing is busy, please try again") from e
+            time.sleep(RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+
+
+# ---------------------------
+# CLAIMS
+# ---------------------------
+def claim_batch(requests, status="Pending", timestamp=None, today=None):
+    """Reserve and insert many claims in one transaction; returns a ClaimOutcome per request.
+
+    requests are (food_id, receiver_id, quantity) tuples, served in order; a request that
+    cannot be met is rejected with outcome.error and does not affect the others. The batch
+    costs three statements whatever its size: lock, one UPDATE ... CASE, one multi-row INSERT.
+    """
+    if status not in ACTIVE_STATUSES:
+        raise ValueError(f"new claims must be one of {ACTIVE_STATUSES}")
+    timestamp = timestamp or datetime.now()
+    today = today or date.today()
+
+    def work(conn):
+        outcomes = [ClaimOutcome(*r, status=status, timestamp=timestamp) for r in requests]
+        _insert_claims(conn, outcomes, today)
+        return outcomes
+
+    return _transact(work)
+
+
+def _insert_claims(conn, outcomes, today):
+    """Reserve and insert outcomes inside conn's transaction, setting o.error on the ones that cannot be met."""
+    if not outcomes:
+        return
+    listings = _lock_listings(conn, {o.food_id for o in outcomes})
+    left = {fid: avail for fid, (avail, _) in listings.items()}
+    deltas = {}
+    for o in outcomes:
+        if o.status not in ACTIVE_STATUSES:
+            o.error = f"new claims must be one of {', '.join(ACTIVE_STATUSES)}"
+        elif o.quantity <= 0:
+            o.error = "quantity must be positive"
+        elif o.food_id not in listings:
+            o.error = f"food {o.food_id} does not exist"
+        elif _expired(listings[o.food_id][1], today):
+            o.error = f"food {o.food_id} expired on {listings[o.food_id][1]}"
+        elif left[o.food_id] < o.quantity:
+            o.error = f"only {left[o.food_id]} left of food {o.food_id}"
+        else:
+            left[o.food_id] -= o.quantity
+            deltas[o.food_id] = deltas.get(o.food_id, 0) + o.quantity
+    _adjust_reserved(conn, deltas)
+
+    accepted = [o for o in outcomes if o.ok]
+    rows = [{"fid": o.food_id, "rid": o.receiver_id, "qty": o.quantity, "status": o.status,
+             "ts": o.timestamp or datetime.now()} for o in accepted]
+    insert = text("INSERT INTO claims (Food_ID, Receiver_ID, Claim_Quantity, Status, Timestamp) "
+                  "VALUES (:fid, :rid, :qty, :status, :ts)")
+    if len(rows) == 1:
+        accepted[0].claim_id = conn.execute(insert, rows[0]).lastrowid
+    elif rows:
+        conn.execute(insert, rows)
+
+
+def claim(food_id, receiver_id, quantity, status="Pending", timestamp=None):
+    """Reserve quantity of one listing and return the new Claim_ID; raises ClaimError when rejected."""
+    outcome = claim_batch([(food_id, receiver_id, quantity)], status, timestamp)[0]
+    if not outcome.ok:
+        raise ClaimError(outcome.error)
+    return outcome.claim_id
+
+
+def _lock_claim(conn, claim_id):
+    sql = "SELECT Claim_ID, Food_ID, Claim_Quantity, Status FROM claims WHERE Claim_ID = :cid"
+    if conn.dialect.name == "mysql":
+        sql += " FOR UPDATE"
+    row = conn.execute(text(sql), {"cid": int(claim_id)}).first()
+    if row is None:
+        raise ClaimError(f"claim {claim_id} does not exist")
+    return row
+
+
+def _held(row):
+    # quantity this claim currently holds in food_listings.Reserved
+    return int(row.Claim_Quantity or 0) if row.Status in ACTIVE_STATUSES else 0
+
+
+def complete(claim_id):
+    """Mark a Pending claim Completed; False if it was not Pending (already done or cancelled)."""
+    def work(conn):
+        result = conn.execute(text(
+            "UPDATE claims SET Status = 'Completed' WHERE Claim_ID = :cid AND Status = 'Pending'"
+        ), {"cid": int(claim_id)})
+        return result.rowcount == 1
+    return _transact(work)
+
+
+def cancel(claim_id):
+    """Cancel an active claim and give its quantity back; False if it was already cancelled."""
+    def work(conn):
+        row = _lock_claim(conn, claim_id)
+        if row.Status not in ACTIVE_STATUSES:
+            return False
+        conn.execute(text("UPDATE claims SET Status = 'Cancelled' WHERE Claim_ID = :cid"), {"cid": row.Claim_ID})
+        _adjust_reserved(conn, {row.Food_ID: -_held(row)})
+        return True
+    return _transact(work)
+
+
+def delete(claim_id):
+    """Delete a claim, releasing whatever it reserved."""
+    return _transact(lambda conn: _delete_claim(conn, claim_id))
+
+
+def _delete_claim(conn, claim_id):
+    row = _lock_claim(conn, claim_id)
+    conn.execute(text("DELETE FROM claims WHERE Claim_ID = :cid"), {"cid": row.Claim_ID})
+    if row.Food_ID is not None:
+        _adjust_reserved(conn, {row.Food_ID: -_held(row)})
+    return True
+
+
+def update(claim_id, food_id, receiver_id, status, timestamp, today=None):
+    """Edit a claim, moving its reservation when the listing or status changes."""
+    today = today or date.today()
+    return _transact(lambda conn: _update_claim(conn, claim_id, food_id, receiver_id, status, timestamp, today))
+
+
+def _update_claim(conn, claim_id, food_id, receiver_id, status, timestamp, today):
+    # every check runs before the first write, so a ClaimError leaves the transaction untouched
+    row = _lock_claim(conn, claim_id)
+    qty = int(row.Claim_Quantity or 0)
+    new_held = qty if status in ACTIVE_STATUSES else 0
+    deltas = {}
+    if row.Food_ID is not None:
+        deltas[row.Food_ID] = -_held(row)
+    deltas[int(food_id)] = deltas.get(int(food_id), 0) + new_held
+    growing = {fid for fid, d in deltas.items() if d > 0}
+    if growing:
+        listings = _lock_listings(conn, growing)
+        for fid in growing:
+            if fid not in listings:
+                raise ClaimError(f"food {fid} does not exist")
+            if _expired(listings[fid][1], today):
+                raise ClaimError(f"food {fid} expired on {listings[fid][1]}")
+            if listings[fid][0] < deltas[fid]:
+                raise ClaimError(f"only {listings[fid][0]} left of food {fid}")
+    conn.execute(text(
+        "UPDATE claims SET Food_ID = :fid, Receiver_ID = :rid, Status = :status, Timestamp = :ts "
+        "WHERE Claim_ID = :cid"
+    ), {"fid": int(food_id), "rid": int(receiver_id), "status": status, "ts": timestamp, "cid": row.Claim_ID})
+    _adjust_reserved(conn, deltas)
+    return True
+
+
+# ---------------------------
+# LISTINGS
+# ---------------------------
+LISTING_COLUMNS = ("Food_Name", "Quantity", "Expiry_Date", "Provider_Type", "Location", "Food_Type", "Meal_Type")
+
+
+def update_listing(food_id, values):
+    """Edit a listing's columns ({column: value}); rejected when Quantity would drop below what is claimed."""
+    unknown = set(values) - set(LISTING_COLUMNS)
+    if unknown:
+        raise ValueError(f"not listing columns: {', '.join(sorted(unknown))}")
+
+    def work(conn):
+        fid = int(food_id)
+        if fid not in _lock_listings(conn, {fid}):
+            raise ClaimError(f"food {fid} does not exist")
+        sets = ", ".join(f"{c} = :{c}" for c in values)
+        conn.execute(text(f"UPDATE food_listings SET {sets} WHERE Food_ID = :fid"), {**values, "fid": fid})
+        conn.info["claim_touched"].add(fid)
+        short = oversold(conn, [fid])
+        if short:
+            raise ClaimError(f"Quantity is below the {short[fid]} already claimed")
+        return True
+    return _transact(work)
+
+
+def apply_batch(inserts=(), updates=(), deletes=(), today=None):
+    """Delete, update and insert many claims in one transaction; returns {position: error} for rejected rows.
+
+    deletes are (position, claim_id), updates (position, claim_id, food_id, receiver_id, status, timestamp)
+    and inserts (position, food_id, receiver_id, quantity, status, timestamp); position is the caller's
+    row number. Deletes and updates go first, so quantity they release can be claimed by the inserts.
+    A rejected row changes nothing; the others are still applied.
+    """
+    today = today or date.today()
+
+    def work(conn):
+        errors = {}
+        for pos, claim_id in deletes:
+            try:
+                _delete_claim(conn, claim_id)
+            except ClaimError as e:
+                errors[pos] = str(e)
+        for pos, *args in updates:
+            try:
+                _update_claim(conn, *args, today)
+            except ClaimError as e:
+                errors[pos] = str(e)
+        outcomes = [ClaimOutcome(*args[:3], status=args[3], timestamp=args[4]) for _, *args in inserts]
+        _insert_claims(conn, outcomes, today)
+        errors.update({pos: o.error for (pos, *_), o in zip(inserts, outcomes) if not o.ok})
+        return errors
+
+    return _transact(work)
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reserve claims in bulk.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    batch = sub.add_parser("batch", help="claim every row of a CSV in one transaction")
+    batch.add_argument("csv")
+    batch.add_argument("--status", default="Pending", choices=ACTIVE_STATUSES)
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.csv)
+    requests = df[["Food_ID", "Receiver_ID", "Claim_Quantity"]].itertuples(index=False, name=None)
+    outcomes = claim_batch(list(requests), status=args.status)
+    for o in outcomes:
+        if not o.ok:
+            print(f"REJECTED  food {o.food_id} receiver {o.receiver_id} x{o.quantity}: {o.error}")
+    accepted = sum(o.ok for o in outcomes)
+    print(f"{accepted} of {len(outcomes)} claims accepted.")
+    return 0 if accepted == len(outcomes) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+# column_store.py
+# Process-wide compact copy of the four base tables for the Visualize
+# Filtered Data charts. Strings are pandas Categoricals (dictionary codes),
+# IDs and quantities Int32, Expiry_Date is date32 (Int32 days since
+# 1970-01-01, as Arrow stores it) and Timestamp datetime64[s]; free-text
+# columns no chart reads (addresses, contacts, receiver names) are left out.
+# Each table is loaded once, then patched from the change feed: changed rows
+# are re-read by key and spliced into a new frame that replaces the old one
+# whole, so every Streamlit session reads the same frames, never mutated.
+#   FOOD_COLUMN_STORE=off streamlit run foods_management_app.py   charts from SQL
+#   python column_store.py status     rows and memory per table, against the frames as read
+import argparse
+import os
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import text
+
+import changefeed
+import db
+import profiler
+
+STORE_ENV = "FOOD_COLUMN_STORE"
+LOAD_CHUNK_ROWS = 100_000
+IN_CHUNK = 1000           # keys per "IN (...)" re-read of changed rows
+RELOAD_MIN_AGE = 60       # seconds between full reloads while the change feed is unavailable
+
+_EPOCH = date(1970, 1, 1)
+
+# table -> (primary key, {column: kind}); kinds: int (Int32), cat (Categorical),
+# date32 (Int32 days since 1970-01-01), ts (datetime64[s]). The key is int32 and
+# frames are kept sorted by it.
+SCHEMA = {
+    "providers": ("Provider_ID", {"Name": "cat", "Type": "cat", "City": "cat", "City_ID": "int"}),
+    "receivers": ("Receiver_ID", {"Type": "cat", "City": "cat", "City_ID": "int"}),
+    "food_listings": ("Food_ID", {
+        "Food_Name": "cat", "Quantity": "int", "Reserved": "int", "Expiry_Date": "date32", "Provider_ID": "int",
+        "Provider_Type": "cat", "Location": "cat", "City_ID": "int", "Food_Type": "cat", "Meal_Type": "cat"}),
+    "claims": ("Claim_ID", {"Food_ID": "int", "Receiver_ID": "int", "Claim_Quantity": "int", "Status": "cat",
+                            "Timestamp": "ts"}),
+}
+
+
+def enabled():
+    return os.environ.get(STORE_ENV, "").lower() != "off"
+
+
+def date32(value):
+    """Days since 1970-01-01 of a date, the unit Expiry_Date is stored in."""
+    return (value - _EPOCH).days
+
+
+def _compact(table, df):
+    key, columns = SCHEMA[table]
+    out = {key: df[key].astype("int32")}
+    for col, kind in columns.items():
+        values = df[col]
+        if kind == "int":
+            out[col] = pd.to_numeric(values, errors="coerce").astype("Int32")
+        elif kind == "cat":
+            out[col] = values.astype("category")
+        elif kind == "date32":
+            days = (pd.to_datetime(values, errors="coerce") - pd.Timestamp(_EPOCH)).dt.days
+            out[col] = days.astype("Int32")
+        else:
+            out[col] = pd.to_datetime(values, errors="coerce").astype("datetime64[s]")
+    return pd.DataFrame(out)
+
+
+def _concat(table, frames):
+    # column by column, so Categoricals are merged by union_categoricals instead of
+    # pd.concat falling back to object dtype when their categories differ
+    frames = [f for f in frames if len(f)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    key, columns = SCHEMA[table]
+    data = {}
+    for col in [key, *columns]:
+        if columns.get(col) == "cat":
+            # an all-NULL part has no categories to take a dtype from; give it the others'
+            dtype = next((f[col].cat.categories.dtype for f in frames if len(f[col].cat.categories)), None)
+            parts = [f[col] if dtype is None or len(f[col].cat.categories)
+                     else f[col].cat.set_categories(pd.Index([], dtype=dtype)) for f in frames]
+            data[col] = union_categoricals(parts, ignore_order=True)
+        else:
+            data[col] = pd.concat([f[col] for f in frames], ignore_index=True)
+    return pd.DataFrame(data)
+
+
+def _select(table):
+    key, columns = SCHEMA[table]
+    return f"SELECT {key}, {', '.join(columns)} FROM {table}"
+
+
+# ---------------------------
+# STORE
+# ---------------------------
+class ColumnStore:
+    """The compact frames, loaded on first use and patched from changefeed.FEED."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._frames = {}
+        self._stale = set(SCHEMA)
+        self._pending = {t: set() for t in SCHEMA}
+        self._loaded_at = {}
+        self._read_bytes = {}     # memory of the frames as read, before compaction
+        self._derived = {}        # name -> (frames it was built from, value)
+        self.loads = 0
+        self.patches = 0
+
+    def on_change(self, changes):
+        # Feed subscriber: remember the changed keys; they are applied on the next read
+        with self._lock:
+            if changes is None:
+                self._stale = set(SCHEMA)
+                return
+            for c in changes:
+                if c.table in self._pending and c.table not in self._stale:
+                    self._pending[c.table].add(c.row_id)
+
+    def table(self, name):
+        """The current compact frame of a base table (shared: treat it as read-only)."""
+        with self._lock:
+            if name in self._stale or name not in self._frames:
+                age = time.monotonic() - self._loaded_at.get(name, -RELOAD_MIN_AGE)
+                if name not in self._frames or changefeed.FEED.available or age >= RELOAD_MIN_AGE:
+                    self._load(name)
+            elif self._pending[name]:
+                ids, self._pending[name] = self._pending[name], set()
+                self._splice(name, ids)
+            return self._frames[name]
+
+    def derived(self, name, tables, build):
+        """build(*frames of tables), kept until one of those frames is replaced."""
+        with self._lock:
+            frames = tuple(self.table(t) for t in tables)
+            hit = self._derived.get(name)
+            if hit is not None and all(a is b for a, b in zip(hit[0], frames)):
+                return hit[1]
+            value = build(*frames)
+            self._derived[name] = (frames, value)
+            return value
+
+    def _load(self, name):
+        self._pending[name] = set()
+        self._stale.discard(name)
+        start = time.perf_counter()
+        parts, read_bytes = [], 0
+        with profiler.named(f"store/{name}"), \
+                db.engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(text(_select(name)), conn, chunksize=LOAD_CHUNK_ROWS):
+                read_bytes += int(chunk.memory_usage(deep=True).sum())
+                parts.append(_compact(name, chunk))
+            if not parts:
+                parts.append(_compact(name, pd.read_sql(text(_select(name) + " WHERE 1=0"), conn)))
+        frame = _concat(name, parts)
+        key = SCHEMA[name][0]
+        if not frame[key].is_monotonic_increasing:
+            frame = frame.sort_values(key, kind="stable").reset_index(drop=True)
+        profiler.record("query", f"store/{name}", (time.perf_counter() - start) * 1000, rows=len(frame),
+                        bytes=read_bytes, status="ok")
+        self._frames[name] = frame
+        self._read_bytes[name] = read_bytes
+        self._loaded_at[name] = time.monotonic()
+        self.loads += 1
+
+    def _splice(self, name, ids):
+        key = SCHEMA[name][0]
+        ids = sorted(ids)
+        fresh = [_compact(name, db.read_df(_select(name) + f" WHERE {key} IN ({', '.join(map(str, chunk))})",
+                                           name=f"store/{name}_changed"))
+                 for chunk in (ids[i:i + IN_CHUNK] for i in range(0, len(ids), IN_CHUNK))]
+        old = self._frames[name]
+        kept = old[~np.isin(old[key].to_numpy(), np.asarray(ids, dtype=np.int64))]
+        frame = _concat(name, [kept, *fresh])
+        if not frame[key].is_monotonic_increasing:
+            frame = frame.sort_values(key, kind="stable").reset_index(drop=True)
+        self._frames[name] = frame
+        self.patches += 1
+
+    def stats(self):
+        with self._lock:
+            held = {t: int(f.memory_usage(deep=True).sum()) for t, f in self._frames.items()}
+            return {"tables": {t: {"rows": len(f), "bytes": held[t], "read_bytes": self._read_bytes.get(t, 0)}
+                               for t, f in self._frames.items()},
+                    "bytes": sum(held.values()), "read_bytes": sum(self._read_bytes.get(t, 0) for t in held),
+                    "loads": self.loads, "patches": self.patches,
+                    "pending": sum(len(p) for p in self._pending.values())}
+
+
+STORE = ColumnStore()
+changefeed.FEED.subscribe(STORE.on_change)
+
+
+# ---------------------------
+# CHART AGGREGATES
+# ---------------------------
+def _codes(column, values):
+    # category codes of the selected values (unknown values match nothing)
+    codes = column.cat.categories.get_indexer(list(values))
+    return codes[codes >= 0]
+
+
+def _counts(column, codes, label):
+    counts = np.bincount(codes[codes >= 0], minlength=len(column.cat.categories))
+    out = pd.DataFrame({label: column.cat.categories, "Count": counts})
+    missing = int((codes < 0).sum())
+    if missing:
+        out = pd.concat([out, pd.DataFrame({label: [None], "Count": [missing]})], ignore_index=True)
+    out = out[out["Count"] > 0].sort_values(["Count", label], ascending=[False, True], kind="stable")
+    return out.reset_index(drop=True)
+
+
+def _listing_provider(listings, providers):
+    # the preview's inner join, per listing: has a provider, its City_ID, its Name code
+    provider_ids = providers["Provider_ID"].to_numpy(dtype=np.int64)
+    pid = listings["Provider_ID"].to_numpy(dtype=np.int64, na_value=-1)
+    if not len(provider_ids):
+        none = np.full(len(pid), -1, dtype=np.int64)
+        return np.zeros(len(pid), dtype=bool), none, none
+    pos = np.minimum(np.searchsorted(provider_ids, pid), len(provider_ids) - 1)
+    joined = (pid >= 0) & (provider_ids[pos] == pid)
+    city = np.where(joined, providers["City_ID"].to_numpy(dtype=np.int64, na_value=-1)[pos], -1)
+    names = np.where(joined, providers["Name"].cat.codes.to_numpy()[pos], -1)
+    return joined, city, names
+
+
+def preview_counts(selections):
+    """The two Visualize Filtered Data aggregates of sql_filters.preview_queries, from the store.
+
+    selections is the sidebar's {filter: values} (City as City_IDs); returns
+    {"food_type_count": [Food_Type, Count], "provider_count": [Provider, Count]}.
+    """
+    listings = STORE.table("food_listings")
+    providers = STORE.table("providers")
+    joined, city, name_codes = STORE.derived("listing_provider", ["food_listings", "providers"], _listing_provider)
+    mask = joined.copy()
+    if selections.get("City"):
+        mask &= np.isin(city, np.asarray(list(selections["City"]), dtype=np.int64))
+    if selections.get("Provider_Name"):
+        mask &= np.isin(name_codes, _codes(providers["Name"], selections["Provider_Name"]))
+    for name in ("Food_Type", "Meal_Type"):
+        if selections.get(name):
+            mask &= np.isin(listings[name].cat.codes.to_numpy(), _codes(listings[name], selections[name]))
+
+    return {
+        "food_type_count": _counts(listings["Food_Type"], listings["Food_Type"].cat.codes.to_numpy()[mask],
+                                   "Food_Type"),
+        "provider_count": _counts(providers["Name"], name_codes[mask], "Provider"),
+    }
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact in-memory copy of the base tables.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="load every table and report rows and memory")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        for name in SCHEMA:
+            STORE.table(name)
+        stats = STORE.stats()
+        for name, t in stats["tables"].items():
+            share = t["bytes"] / t["read_bytes"] if t["read_bytes"] else 0
+            print(f"{name:<14} {t['rows']:>10,} rows  {t['bytes'] / 1e6:8.1f} MB  "
+                  f"(as read {t['read_bytes'] / 1e6:.1f} MB, {share:.0%})")
+
+
+if __name__ == "__main__":
+    main()
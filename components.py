@@ -0,0 +1,385 @@
+# components.py
+# Reusable Streamlit widgets backed by bounded, index-friendly queries.
+import html
+import time
+
+import pandas as pd
+import streamlit as st
+
+import bulk
+import db
+import export
+import search_index
+from query_cache import make_key, tables_in
+from scheduler import QueryBatch
+
+COUNT_TTL = 30
+SESSION_MEMO_TTL = 300   # bounds staleness from writes made by other processes
+
+
+def _read(sql, params=None, ttl=0):
+    try:
+        return db.read_df(sql, params, ttl=ttl)
+    except Exception as e:
+        st.error(f"Query error: {e}")
+        return pd.DataFrame()
+
+
+# ---------------------------
+# PER-SESSION MEMO
+# ---------------------------
+def _memo_hit(memo, key, version):
+    hit = memo.get(key)
+    if hit is not None and hit[0] == version and time.monotonic() - hit[1] < SESSION_MEMO_TTL:
+        return hit
+    return None
+
+
+def session_query(sql, params=None, name=None, reader=None):
+    """Run sql once per session; re-run only after a write to one of its tables or SESSION_MEMO_TTL."""
+    memo = st.session_state.setdefault("_query_memo", {})
+    key = make_key(sql, params)
+    version = db.cache.version(tables_in(sql))
+    hit = _memo_hit(memo, key, version)
+    if hit is not None:
+        return hit[2]
+    df = (reader or db.read_df)(sql, params, name=name)
+    memo[key] = (version, time.monotonic(), df)
+    return df
+
+
+def session_prefetch(named_sqls, label="prefetch", reader=None, params=None):
+    """Load every query of {name: sql} missing from the session memo in one concurrent batch.
+
+    params is passed to every query, as session_query(sql, params) would.
+    """
+    memo = st.session_state.setdefault("_query_memo", {})
+    batch = QueryBatch(label, reader=reader)
+    pending = {}
+    for name, sql in named_sqls.items():
+        key = make_key(sql, params)
+        version = db.cache.version(tables_in(sql))
+        if _memo_hit(memo, key, version) is None:
+            pending[name] = (key, version)
+            batch.add(name, sql, params)
+    batch.run()
+    for name, (key, version) in pending.items():
+        if batch.results[name].ok:
+            memo[key] = (version, time.monotonic(), batch.results[name].df)
+    return batch
+
+
+# ---------------------------
+# KEYSET PAGINATION
+# ---------------------------
+def keyset_page_sql(base_sql, key_col, cursor, limit):
+    """Append the keyset predicate, newest-first ordering and LIMIT to a `... WHERE 1=1 ...` query."""
+    sql = base_sql.rstrip().rstrip(";")
+    if cursor is not None:
+        sql += f" AND {key_col} < :_cursor"
+    return sql + f" ORDER BY {key_col} DESC LIMIT {int(limit)}"
+
+
+def count_sql(base_sql):
+    return f"SELECT COUNT(*) AS total FROM ({base_sql.rstrip().rstrip(';')}) AS page_src"
+
+
+def _next_page(state, last_key):
+    state["cursors"].append(last_key)
+
+
+def _prev_page(state):
+    if state["cursors"]:
+        state["cursors"].pop()
+
+
+def paginated_table(view_key, base_sql, params=None, key_col="id", page_sizes=(25, 50, 100, 250)):
+    """Render one page of base_sql ordered by key_col DESC and return it as a DataFrame.
+
+    base_sql must end in a WHERE clause (``WHERE 1=1`` is fine); each rerun fetches a single
+    page using ``key_col < last seen key`` so deep pages cost the same as the first one.
+    """
+    params = dict(params or {})
+    key_name = key_col.split(".")[-1]
+    page_size = st.selectbox("Rows per page", page_sizes, key=f"{view_key}_page_size")
+
+    state = st.session_state.setdefault(f"_pager_{view_key}", {"sig": None, "cursors": []})
+    sig = make_key(base_sql, {**params, "_size": page_size})
+    if state["sig"] != sig:
+        state["sig"] = sig
+        state["cursors"] = []
+
+    cursor = state["cursors"][-1] if state["cursors"] else None
+    page_params = dict(params) if cursor is None else {**params, "_cursor": cursor}
+    df = _read(keyset_page_sql(base_sql, key_col, cursor, page_size + 1), page_params)
+    has_next = len(df) > page_size
+    df = df.head(page_size)
+
+    total_df = _read(count_sql(base_sql), params, ttl=COUNT_TTL)
+    total = int(total_df.iloc[0, 0]) if not total_df.empty else len(df)
+    pages = max(1, -(-total // page_size))
+    page_no = len(state["cursors"]) + 1
+
+    st.dataframe(df, use_container_width=True)
+    nav_prev, nav_info, nav_next = st.columns([1, 3, 1])
+    with nav_prev:
+        st.button("◀ Prev", key=f"{view_key}_prev", disabled=page_no == 1,
+                  on_click=_prev_page, args=(state,))
+    with nav_info:
+        st.caption(f"Page {page_no} of {pages} • {total} rows")
+    with nav_next:
+        last_key = int(df[key_name].iloc[-1]) if has_next else None
+        st.button("Next ▶", key=f"{view_key}_next", disabled=not has_next,
+                  on_click=_next_page, args=(state, last_key))
+    return df
+
+
+# ---------------------------
+# SORTED KEYSET PAGINATION
+# ---------------------------
+def sorted_page_sql(base_sql, sort_col, key_col, cursor, limit):
+    """Append a (sort_col, key_col) keyset predicate, ascending order and LIMIT to a `... WHERE 1=1 ...` query.
+
+    cursor is the (sort value, key) of the last row shown, or None for the first page. NULL
+    sort values come first, as MySQL and SQLite both order them.
+    """
+    sql = base_sql.rstrip().rstrip(";")
+    if cursor is not None:
+        if cursor[0] is None:
+            sql += f" AND ({sort_col} IS NOT NULL OR {key_col} > :_cursor_key)"
+        else:
+            # the leading >= gives the planner an index range to start from; a bare OR scans from the top
+            sql += (f" AND {sort_col} >= :_cursor_sort"
+                    f" AND ({sort_col} > :_cursor_sort OR {key_col} > :_cursor_key)")
+    return sql + f" ORDER BY {sort_col}, {key_col} LIMIT {int(limit)}"
+
+
+def sorted_pager(view_key, base_sql, params, sort_col, key_col, page_size, render):
+    """Fetch one page of base_sql ordered by (sort_col, key_col), call render(df), then draw Prev / Next.
+
+    Like paginated_table, every page is one keyset read, so the last page costs the same as the first.
+    """
+    params = dict(params or {})
+    state = st.session_state.setdefault(f"_pager_{view_key}", {"sig": None, "cursors": []})
+    sig = make_key(base_sql, {**params, "_size": page_size})
+    if state["sig"] != sig:
+        state["sig"] = sig
+        state["cursors"] = []
+
+    cursor = state["cursors"][-1] if state["cursors"] else None
+    page_params = dict(params)
+    if cursor is not None:
+        page_params.update({"_cursor_sort": cursor[0], "_cursor_key": cursor[1]})
+    df = _read(sorted_page_sql(base_sql, sort_col, key_col, cursor, page_size + 1), page_params)
+    has_next = len(df) > page_size
+    df = df.head(page_size)
+
+    total_df = _read(count_sql(base_sql), params, ttl=COUNT_TTL)
+    total = int(total_df.iloc[0, 0]) if not total_df.empty else len(df)
+    pages = max(1, -(-total // page_size))
+    page_no = len(state["cursors"]) + 1
+
+    render(df)
+    nav_prev, nav_info, nav_next = st.columns([1, 3, 1])
+    with nav_prev:
+        st.button("◀ Prev", key=f"{view_key}_prev", disabled=page_no == 1,
+                  on_click=_prev_page, args=(state,))
+    with nav_info:
+        st.caption(f"Page {page_no} of {pages} • {total} rows")
+    with nav_next:
+        last = None
+        if has_next:
+            sort_value = df[sort_col.split(".")[-1]].iloc[-1]
+            last = (None if pd.isna(sort_value) else sort_value, int(df[key_col.split(".")[-1]].iloc[-1]))
+        st.button("Next ▶", key=f"{view_key}_next", disabled=not has_next,
+                  on_click=_next_page, args=(state, last))
+    return df
+
+
+# ---------------------------
+# CARD GRID
+# ---------------------------
+def card_grid(df, title_col, line_formats, css_class="card"):
+    """Render df as HTML cards in a single st.markdown call: one element however many rows.
+
+    line_formats are str.format templates over the row's columns; values are HTML-escaped.
+    """
+    if df.empty:
+        return
+    rows = df.astype(object).where(df.notna(), "").astype(str).map(html.escape).to_dict("records")
+    cards = "".join(
+        f'<div class="{css_class}"><strong>{r[title_col]}</strong>'
+        + "".join(f'<div class="small-note">{fmt.format(**r)}</div>' for fmt in line_formats)
+        + "</div>"
+        for r in rows
+    )
+    st.markdown(f'<div class="card-grid">{cards}</div>', unsafe_allow_html=True)
+
+
+# ---------------------------
+# NAME SEARCH (search_index.py)
+# ---------------------------
+def search_filter(source, column, term, prefix):
+    """(" AND column IN (...)", params, hits) restricting a Read query to the indexed matches of term."""
+    hits = search_index.search(source, term)
+    if not hits:
+        return " AND 1=0", {}, hits
+    names = [f"{prefix}_{i}" for i in range(len(hits))]
+    clause = f" AND {column} IN ({', '.join(':' + n for n in names)})"
+    return clause, dict(zip(names, (key for key, _ in hits))), hits
+
+
+def ranked_table(base_sql, params, key_col, hits):
+    """Render the rows of base_sql (restricted by search_filter) closest match first, with a Match score."""
+    df = _read(base_sql, params)
+    if df.empty:
+        return df
+    key_name = key_col.split(".")[-1]
+    rank = {key: i for i, (key, _) in enumerate(hits)}
+    df.insert(0, "Match", df[key_name].map(dict(hits)))
+    df = df.iloc[df[key_name].map(rank).argsort()]
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.caption(f"{len(df)} best matches (up to {search_index.SEARCH_LIMIT}), closest first; small typos are tolerated")
+    return df
+
+
+# ---------------------------
+# ID LOOKUP (Update / Delete)
+# ---------------------------
+LOOKUP_LIMIT = 20
+
+
+def like_prefix(term):
+    """Escape LIKE wildcards (with '!' as the ESCAPE character) and append a trailing %."""
+    return term.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+
+
+def id_lookup(view_key, table, key_col, label_col=None, label="Record", limit=LOOKUP_LIMIT):
+    """Search box + selectbox returning one primary key, or None.
+
+    Digits run a primary-key point lookup, text runs an index-friendly ``label_col LIKE 'prefix%'``,
+    and an empty box lists the newest rows; every branch is capped at ``limit`` suggestions.
+    """
+    hint = f"ID or {label_col.replace('_', ' ')} prefix" if label_col else "ID"
+    term = st.text_input(f"Find {label} ({hint})", key=f"{view_key}_lookup").strip()
+    cols = key_col + (f", {label_col}" if label_col else "")
+
+    if term.isdigit():
+        sql = f"SELECT {cols} FROM {table} WHERE {key_col} = :id"
+        params = {"id": int(term)}
+    elif term and label_col:
+        sql = (f"SELECT {cols} FROM {table} WHERE {label_col} LIKE :prefix ESCAPE '!' "
+               f"ORDER BY {label_col}, {key_col} LIMIT {int(limit)}")
+        params = {"prefix": like_prefix(term)}
+    else:
+        sql = f"SELECT {cols} FROM {table} ORDER BY {key_col} DESC LIMIT {int(limit)}"
+        params = {}
+
+    matches = _read(sql, params)
+    if matches.empty:
+        st.info(f"No {label.lower()} matches '{term}'.")
+        return None
+    options = {
+        int(row[0]): f"{int(row[0])} - {row[1]}" if label_col else str(int(row[0]))
+        for row in matches.itertuples(index=False)
+    }
+    return st.selectbox(f"Select {label} ID", list(options), format_func=options.get,
+                        key=f"{view_key}_pick")
+
+
+def load_row(table, key_col, key):
+    """Fetch a single row by primary key as a Series (None if missing)."""
+    if key is None:
+        return None
+    df = _read(f"SELECT * FROM {table} WHERE {key_col} = :id", {"id": int(key)})
+    return None if df.empty else df.iloc[0]
+
+
+# ---------------------------
+# ON-DEMAND EXPORT
+# ---------------------------
+def export_button(view_key, sql, params=None, filename="export"):
+    """Offer a gzip CSV / Parquet export of sql; nothing is queried until the download is clicked.
+
+    Streamlit serves a download from memory (MediaFileManager keeps the whole file as
+    bytes), so the export is capped at export.APP_EXPORT_MAX_ROWS; larger ones go
+    through the CLI (python export.py), which streams to disk.
+    """
+    formats = list(export.EXPORTERS) if export.PARQUET_AVAILABLE else ["csv.gz"]
+    fmt_col, btn_col = st.columns([1, 1])
+    with fmt_col:
+        fmt = st.selectbox("Export format", formats, key=f"{view_key}_export_fmt")
+    exporter, mime = export.EXPORTERS[fmt]
+    capped = f"{sql} LIMIT {int(export.APP_EXPORT_MAX_ROWS)}"
+
+    def build():
+        # runs on click; the rows stream in chunks, the finished file is read once for Streamlit
+        buf, _ = exporter(capped, params)
+        with buf:
+            return buf.read()
+
+    with btn_col:
+        st.download_button(f"Download ({fmt})", build, file_name=f"{filename}.{fmt}", mime=mime,
+                           key=f"{view_key}_export_download")
+    st.caption(f"Downloads stop at {export.APP_EXPORT_MAX_ROWS:,} rows; use python export.py for larger exports.")
+
+
+# ---------------------------
+# BULK EDIT
+# ---------------------------
+def bulk_editor(view_key, table, grid_rows=(50, 200, 1000)):
+    """Insert / update / delete many rows of table from an edited grid or an uploaded CSV (bulk.py)."""
+    spec = bulk.SPECS[table]
+    source = st.radio("Source", ["Edit grid", "Upload CSV"], horizontal=True, key=f"{view_key}_source")
+    if source == "Edit grid":
+        n = st.selectbox("Newest rows", grid_rows, key=f"{view_key}_rows")
+        # re-read only after a write to table, so the editor keeps its edits across reruns
+        try:
+            before = session_query(f"SELECT {spec.key}, {', '.join(spec.columns)} FROM {table} "
+                                   f"ORDER BY {spec.key} DESC LIMIT {int(n)}", name=f"bulk/{table}_grid")
+        except Exception as e:
+            st.error(f"Query error: {e}")
+            return
+        st.caption("Add rows at the bottom, edit cells in place, or select rows and delete them.")
+        # a fresh editor after each write to table, so applied edits are not replayed
+        generation = db.cache.version([table])[0][1]
+        after = st.data_editor(before, num_rows="dynamic", disabled=[spec.key], hide_index=True,
+                               use_container_width=True, key=f"{view_key}_grid_{generation}")
+        df = bulk.changes(table, before, after)
+        if df.empty:
+            st.info("No changes yet.")
+            return
+        st.caption(f"{len(df)} pending change(s); Row in the report below counts from 1 in this list.")
+        st.dataframe(df, hide_index=True, use_container_width=True)
+    else:
+        st.download_button("Download CSV template", bulk.template(table).to_csv(index=False).encode("utf-8"),
+                           file_name=f"{table}_bulk_template.csv", mime="text/csv", key=f"{view_key}_template")
+        upload = st.file_uploader(f"CSV with {bulk.ACTION_COLUMN}, {spec.key}, {', '.join(spec.columns)}",
+                                  type="csv", key=f"{view_key}_upload")
+        if upload is None:
+            return
+        try:
+            df = pd.read_csv(upload)
+        except Exception as e:
+            st.error(f"Could not read CSV: {e}")
+            return
+        st.caption(f"{len(df)} row(s) read.")
+
+    check_col, apply_col = st.columns(2)
+    with check_col:
+        dry_run = st.button("Validate", key=f"{view_key}_validate")
+    with apply_col:
+        run = st.button("Apply", type="primary", key=f"{view_key}_apply")
+    if not (dry_run or run):
+        return
+    try:
+        with st.spinner("Validating..." if dry_run else "Applying..."):
+            result = bulk.apply(table, df, dry_run=dry_run)
+    except Exception as e:
+        st.error(f"Bulk {table} error: {e}")
+        return
+    (st.success if result.ok else st.warning)(result.summary())
+    if not result.ok:
+        st.dataframe(result.errors, hide_index=True, use_container_width=True)
+        st.download_button("Download error report", result.errors.to_csv(index=False).encode("utf-8"),
+                           file_name=f"{table}_bulk_errors.csv", mime="text/csv", key=f"{view_key}_errors")
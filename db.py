@@ -0,0 +1,82 @@
+# db.py
+# Shared engine and query helpers. Imported modules survive Streamlit reruns,
+# so the engine and the result cache below are created once per process.
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+import backend
+import profiler
+import shared_cache
+from query_cache import QueryCache, tables_in
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+DB_URI = backend.db_uri()    # FOOD_DB_URI, MySQL by default
+engine = profiler.install(backend.make_engine(DB_URI))    # pool sized by FOOD_DB_POOL_* (backend.py)
+# a worker forked after import must not reuse the parent's pooled connections
+os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+# TTLs (seconds) for the cached reads used on every rerun
+LOOKUP_TTL = 300    # sidebar DISTINCT lists
+METRIC_TTL = 60     # overview / near-expiry / contacts cards
+
+cache = QueryCache(shared=shared_cache.from_env())    # FOOD_SHARED_CACHE: one cache for all workers
+
+
+# ---------------------------
+# READ / WRITE
+# ---------------------------
+def read_df(sql, params=None, ttl=0, name=None):
+    """Run a SELECT and return a DataFrame. With ttl > 0 the result is served from the shared cache.
+
+    Every call is recorded by the profiler under name (or a fingerprint of sql).
+    """
+    name = name or profiler.query_name(sql)
+    params = backend.bind(sql, params)
+    loaded = False
+
+    def load():
+        nonlocal loaded
+        loaded = True
+        with profiler.named(name):
+            return pd.read_sql(text(sql), engine, params=params)
+
+    start = time.perf_counter()
+    try:
+        df = cache.get_or_load(sql, params, ttl, load) if ttl and ttl > 0 else load()
+    except Exception as e:
+        profiler.record("query", name, (time.perf_counter() - start) * 1000, status="error", error=str(e))
+        raise
+    # bytes approximates what came over the wire; cache hits transfer nothing
+    profiler.record("query", name, (time.perf_counter() - start) * 1000, rows=len(df),
+                    bytes=profiler.frame_bytes(df) if loaded else 0, cached=not loaded, status="ok")
+    return df
+
+
+def write(sql, params=None, name=None, keys=None):
+    """Run a write in its own transaction and drop cached reads of the tables it touched.
+
+    keys ({table: [primary keys]}) names the rows written; a single-row INSERT fills it in
+    from lastrowid. Subscribers of the cache use it to patch just those rows.
+    """
+    name = name or profiler.query_name(sql)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        with profiler.named(name), engine.begin() as conn:
+            result = conn.execute(text(sql), params or {})
+        status = "ok"
+        tables = tables_in(sql)
+        if keys is None and len(tables) == 1 and sql.lstrip().upper().startswith("INSERT") \
+                and not isinstance(params, list) and result.lastrowid:
+            keys = {tables.pop(): [result.lastrowid]}
+        return result
+    finally:
+        profiler.record("write", name, (time.perf_counter() - start) * 1000, status=status,
+                        rows=result.rowcount if status == "ok" and result.rowcount >= 0 else 0)
+        # without keys on a failed write subscribers fall back to a full reload, which is safe
+        cache.invalidate_sql(sql, keys if status == "ok" else None)
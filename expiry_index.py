@@ -0,0 +1,190 @@
+# expiry_index.py
+# In-memory priority index of food listings that can still be claimed
+# (Quantity > Reserved) and expire within HORIZON_DAYS, bucketed by expiry day
+# and secondarily by city (City_ID, see geo.py) and food type. top_k() answers
+# "most urgent items in these cities / food type Y" from memory; the database
+# is read once at start-up, then only for the rows a write names (cache
+# subscription, see QueryCache.invalidate_tables). Writes that name no rows,
+# day rollover and RESYNC_TTL (writes from other processes) trigger one full
+# reload.
+import heapq
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+import backend
+import db
+from queries import EXPIRY_INDEX_SQL
+
+HORIZON_DAYS = backend.EXPIRY_HORIZON_DAYS
+RESYNC_TTL = 300   # seconds; picks up writes made by other processes
+
+Item = namedtuple("Item", "food_id food_name city city_id food_type meal_type available expiry")
+
+_COLUMNS = ("SELECT Food_ID, Food_Name, Location, City_ID, Food_Type, Meal_Type, "
+            "Quantity - Reserved AS Available, Expiry_Date FROM food_listings")
+
+
+def _as_date(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class ExpiryIndex:
+    def __init__(self, horizon_days=HORIZON_DAYS, resync_ttl=RESYNC_TTL):
+        self.horizon_days = horizon_days
+        self.resync_ttl = resync_ttl
+        self._lock = threading.RLock()
+        self._items = {}                                    # Food_ID -> Item
+        self._days = defaultdict(dict)                      # day -> {Food_ID: Item}
+        self._by_city = defaultdict(lambda: defaultdict(dict))
+        self._by_type = defaultdict(lambda: defaultdict(dict))
+        self._today = None
+        self._loaded_at = 0.0
+        self._dirty = True
+        self.reloads = 0
+        self.patches = 0
+
+    # ---------------------------
+    # MAINTENANCE
+    # ---------------------------
+    def _add(self, item):
+        self._items[item.food_id] = item
+        self._days[item.expiry][item.food_id] = item
+        self._by_city[item.city_id][item.expiry][item.food_id] = item
+        self._by_type[item.food_type][item.expiry][item.food_id] = item
+
+    def _remove(self, food_id):
+        item = self._items.pop(food_id, None)
+        if item is None:
+            return
+        for buckets in (self._days, self._by_city[item.city_id], self._by_type[item.food_type]):
+            bucket = buckets.get(item.expiry)
+            if bucket is not None:
+                bucket.pop(food_id, None)
+                if not bucket:
+                    del buckets[item.expiry]
+
+    def _wanted(self, row, today):
+        expiry = _as_date(row.Expiry_Date)
+        available = int(row.Available or 0)
+        if expiry is None or available <= 0 or not today <= expiry <= today + timedelta(days=self.horizon_days):
+            return None
+        city_id = None if row.City_ID is None else int(row.City_ID)
+        return Item(int(row.Food_ID), row.Food_Name, row.Location, city_id, row.Food_Type, row.Meal_Type,
+                    available, expiry)
+
+    def reload(self, engine=None):
+        """Rebuild from one bounded scan of food_listings."""
+        today = date.today()
+        with (engine or db.engine).connect() as conn:
+            rows = conn.execute(text(EXPIRY_INDEX_SQL), {
+                "today": today, "horizon": today + timedelta(days=self.horizon_days)}).all()
+        with self._lock:
+            self._items.clear()
+            self._days.clear()
+            self._by_city.clear()
+            self._by_type.clear()
+            for row in rows:
+                item = self._wanted(row, today)
+                if item is not None:
+                    self._add(item)
+            self._today = today
+            self._loaded_at = time.monotonic()
+            self._dirty = False
+            self.reloads += 1
+
+    def touch(self, food_ids, engine=None):
+        """Re-read just these listings by primary key and patch them in (or out)."""
+        ids = sorted({int(i) for i in food_ids})
+        if not ids:
+            return
+        names = [f"id_{i}" for i in range(len(ids))]
+        sql = _COLUMNS + f" WHERE Food_ID IN ({', '.join(':' + n for n in names)})"
+        with (engine or db.engine).connect() as conn:
+            rows = conn.execute(text(sql), dict(zip(names, ids))).all()
+        with self._lock:
+            today = self._today or date.today()
+            for fid in ids:
+                self._remove(fid)
+            for row in rows:
+                item = self._wanted(row, today)
+                if item is not None:
+                    self._add(item)
+            self.patches += 1
+
+    def on_write(self, tables, keys):
+        # QueryCache subscriber: patch the named listings, otherwise reload on next read
+        if "food_listings" not in tables:
+            return
+        if "food_listings" in keys:
+            if self._dirty or self._today is None:
+                return
+            try:
+                self.touch(keys["food_listings"])
+            except Exception:
+                self._dirty = True
+        else:
+            self._dirty = True
+
+    def _ensure_fresh(self):
+        if (self._dirty or self._today != date.today()
+                or time.monotonic() - self._loaded_at > self.resync_ttl):
+            self.reload()
+
+    # ---------------------------
+    # QUERIES
+    # ---------------------------
+    def top_k(self, k=5, cities=None, food_types=None, within_days=None):
+        """The k most urgent claimable items: soonest expiry first, then largest quantity.
+
+        cities (City_IDs) / food_types are optional collections of allowed values; within_days caps the expiry.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            cities = set(cities) if cities else None
+            food_types = set(food_types) if food_types else None
+            if cities:
+                sources = [self._by_city[c] for c in cities if c in self._by_city]
+                match = (lambda it: it.food_type in food_types) if food_types else None
+            elif food_types:
+                sources = [self._by_type[t] for t in food_types if t in self._by_type]
+                match = None
+            else:
+                sources = [self._days]
+                match = None
+            last_day = self._today + timedelta(days=within_days if within_days is not None else self.horizon_days)
+
+            out = []
+            for day in sorted({d for s in sources for d in s}):
+                if day > last_day:
+                    break
+                bucket = [it for s in sources for it in s.get(day, {}).values() if match is None or match(it)]
+                out.extend(heapq.nsmallest(k - len(out), bucket, key=lambda it: (-it.available, it.food_id)))
+                if len(out) >= k:
+                    break
+            return out
+
+    def frame(self, items):
+        return pd.DataFrame([{
+            "Food_ID": it.food_id, "Food_Name": it.food_name, "City": it.city, "Food_Type": it.food_type,
+            "Available": it.available, "Expiry_Date": it.expiry,
+        } for it in items])
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._items), "days": len(self._days), "reloads": self.reloads,
+                    "patches": self.patches, "age_s": round(time.monotonic() - self._loaded_at, 1)}
+
+
+INDEX = ExpiryIndex()
+db.cache.subscribe(INDEX.on_write)
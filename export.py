@@ -0,0 +1,132 @@
+# export.py
+# Streams query results to gzip CSV or Parquet in fixed-size chunks, so an
+# export never holds more than one chunk of rows in memory at a time.
+import argparse
+import gzip
+import io
+import tempfile
+
+import pandas as pd
+from sqlalchemy import text
+
+import db
+
+EXPORT_CHUNK_ROWS = 20_000
+SPOOL_MAX_BYTES = 16 * 1024 * 1024   # larger exports spill to a temp file
+SCHEMA_LOOKAHEAD_ROWS = 100_000      # Parquet: rows held back to find a type for all-NULL columns
+APP_EXPORT_MAX_ROWS = 200_000        # the app's download button holds its file in memory (see components.py)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+
+def iter_chunks(sql, params=None, chunksize=EXPORT_CHUNK_ROWS):
+    """Yield DataFrames of at most chunksize rows using a server-side (unbuffered) cursor."""
+    with db.engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(text(sql), conn, params=params, chunksize=chunksize):
+            yield chunk
+
+
+def export_csv_gz(sql, params=None, chunksize=EXPORT_CHUNK_ROWS):
+    """Return (file_obj, rows) with the gzip-compressed CSV of the query, positioned at 0."""
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    rows = 0
+    with gzip.GzipFile(fileobj=out, mode="wb") as gz:
+        writer = io.TextIOWrapper(gz, encoding="utf-8", newline="")
+        for chunk in iter_chunks(sql, params, chunksize):
+            chunk.to_csv(writer, header=(rows == 0), index=False)
+            rows += len(chunk)
+        writer.flush()
+        writer.detach()
+    out.seek(0)
+    return out, rows
+
+
+def _writer_schema(tables):
+    """Schema of the chunks read so far, a column that was all NULL in one chunk taking
+    another chunk's type; None while some column is NULL in every chunk."""
+    schema = pa.unify_schemas([t.schema for t in tables], promote_options="permissive")
+    return None if any(pa.types.is_null(f.type) for f in schema) else schema
+
+
+def export_parquet(sql, params=None, chunksize=EXPORT_CHUNK_ROWS):
+    """Return (file_obj, rows) with the query written as one Parquet row group per chunk.
+
+    A Parquet file has one schema, and pandas gives an all-NULL column no type, so
+    chunks are held back until every column has had a value (at most
+    SCHEMA_LOOKAHEAD_ROWS); a column still all NULL by then is written as text.
+    """
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    writer = None
+    pending, as_text = [], set()
+    rows = 0
+
+    def open_writer(schema):
+        nonlocal writer
+        if schema is None:
+            schema = pa.unify_schemas([t.schema for t in pending], promote_options="permissive")
+            as_text.update(f.name for f in schema if pa.types.is_null(f.type))
+            schema = pa.schema([f.with_type(pa.large_string()) if f.name in as_text else f for f in schema])
+        writer = pq.ParquetWriter(out, schema, compression="snappy")
+        for table in pending:
+            writer.write_table(table.cast(schema))
+        pending.clear()
+
+    try:
+        for chunk in iter_chunks(sql, params, chunksize):
+            rows += len(chunk)
+            if writer is None:
+                pending.append(pa.Table.from_pandas(chunk, preserve_index=False))
+                schema = _writer_schema(pending)
+                if schema is not None or rows >= SCHEMA_LOOKAHEAD_ROWS:
+                    open_writer(schema)
+                continue
+            for col in as_text:
+                chunk[col] = chunk[col].astype("string")
+            writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+        if writer is None and pending:
+            open_writer(_writer_schema(pending))
+    finally:
+        if writer is not None:
+            writer.close()
+    out.seek(0)
+    return out, rows
+
+
+EXPORTERS = {
+    "csv.gz": (export_csv_gz, "application/gzip"),
+    "parquet": (export_parquet, "application/vnd.apache.parquet"),
+}
+
+
+# ---------------------------
+# CLI: python export.py claims claims.parquet
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a table without loading it into memory.")
+    parser.add_argument("table", choices=["providers", "receivers", "food_listings", "claims"])
+    parser.add_argument("output", help="target file ending in .csv.gz or .parquet")
+    parser.add_argument("--chunksize", type=int, default=EXPORT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    fmt = "parquet" if args.output.endswith(".parquet") else "csv.gz"
+    exporter, _ = EXPORTERS[fmt]
+    buf, rows = exporter(f"SELECT * FROM {args.table}", chunksize=args.chunksize)
+    with buf, open(args.output, "wb") as fh:
+        while True:
+            block = buf.read(1024 * 1024)
+            if not block:
+                break
+            fh.write(block)
+    print(f"Exported {rows} rows from {args.table} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
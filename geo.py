@@ -0,0 +1,359 @@
+# geo.py
+# Location dimension and radius lookups. cities has one row per place name
+# (Name_Key = LOWER(TRIM(name))), with Latitude / Longitude where an offline
+# gazetteer supplies them. providers.City, receivers.City and
+# food_listings.Location each carry that City_ID, filled by triggers on every
+# insert and on every update of the name, so filters and joins compare
+# integers, never strings. GridIndex keeps the located cities in memory,
+# bucketed into CELL_KM square cells; "within R km" reads the few cells that
+# overlap the circle and runs an exact haversine over their cities only.
+#   python geo.py load-gazetteer cities.csv      set coordinates (columns: city, lat, lon)
+#   python geo.py near --receiver 12 --km 25     claimable listings near a receiver
+#   python geo.py status
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import db
+from rollups import trigger_ddl
+from sql_filters import in_predicate
+
+GAZETTEER_ENV = "FOOD_GAZETTEER"   # optional CSV applied by the migration
+CELL_KM = 25.0
+KM_PER_DEGREE = 111.195            # along a meridian (mean Earth radius 6371 km)
+EARTH_RADIUS_KM = 6371.0
+RESYNC_TTL = 300                   # seconds; picks up cities added by other processes
+MISS_RELOAD_S = 5                  # an unknown City_ID reloads the index at most this often
+NEAR_LIMIT = 50
+
+CITIES_SQL = """
+CREATE TABLE IF NOT EXISTS cities (
+    City_ID INT PRIMARY KEY AUTO_INCREMENT,
+    Name_Key VARCHAR(255) NOT NULL,
+    Name VARCHAR(255),
+    Latitude DOUBLE,
+    Longitude DOUBLE,
+    UNIQUE (Name_Key)
+)
+"""
+
+# table -> (primary key, column holding the place name)
+CITY_COLUMNS = {
+    "providers": ("Provider_ID", "City"),
+    "receivers": ("Receiver_ID", "City"),
+    "food_listings": ("Food_ID", "Location"),
+}
+
+NEAR_SQL = """
+    SELECT Food_ID, Food_Name, Location, City_ID, Food_Type, Meal_Type,
+           Quantity - Reserved AS Available, Expiry_Date
+    FROM food_listings
+    WHERE {cities} AND Expiry_Date >= :today AND Quantity > Reserved
+"""
+
+
+def name_key(value):
+    """The Name_Key of a place name, as the SQL LOWER(TRIM(...)) computes it."""
+    return str(value).strip(" ").lower()
+
+
+# ---------------------------
+# SCHEMA (migration 9)
+# ---------------------------
+def _key_sql(expr):
+    return f"LOWER(TRIM({expr}))"
+
+
+def backfill(conn):
+    """Migration step: one cities row per distinct name, then every row's City_ID."""
+    names = " UNION ".join(f"SELECT DISTINCT {_key_sql(col)} AS k, TRIM({col}) AS n FROM {table}"
+                           for table, (_, col) in CITY_COLUMNS.items())
+    conn.execute(text(
+        f"INSERT INTO cities (Name_Key, Name) SELECT k, MIN(n) FROM ({names}) s "
+        "WHERE k <> '' AND k NOT IN (SELECT Name_Key FROM cities) GROUP BY k"))
+    for table, (_, col) in CITY_COLUMNS.items():
+        conn.execute(text(f"UPDATE {table} SET City_ID = "
+                          f"(SELECT c.City_ID FROM cities c WHERE c.Name_Key = {_key_sql(f'{table}.{col}')})"))
+
+
+def _triggers(dialect="mysql"):
+    """(name, timing, event, table, body) keeping City_ID current, in rollups.TRIGGERS form."""
+    out = []
+    for table, (key, col) in CITY_COLUMNS.items():
+        new_key = _key_sql(f"NEW.{col}")
+        city_id = f"(SELECT City_ID FROM cities WHERE Name_Key = {new_key})"
+        if dialect == "mysql":
+            add = (f"INSERT IGNORE INTO cities (Name_Key, Name) SELECT {new_key}, TRIM(NEW.{col}) FROM DUAL "
+                   f"WHERE TRIM(NEW.{col}) <> '';")
+            # BEFORE triggers set the new row's column directly
+            out += [
+                (f"trg_{table}_city_bi", "BEFORE", "INSERT", table, [add, f"SET NEW.City_ID = {city_id};"]),
+                (f"trg_{table}_city_bu", "BEFORE", "UPDATE", table,
+                 [f"IF NOT (NEW.{col} <=> OLD.{col}) THEN {add} SET NEW.City_ID = {city_id}; END IF;"]),
+            ]
+        else:
+            # SQLite cannot assign NEW, so the row is patched after the write; that UPDATE is
+            # also logged to change_log as a (harmless) extra 'U'. NOT EXISTS rather than
+            # OR IGNORE: an upsert's own conflict clause overrides the one in a trigger body
+            add = (f"INSERT INTO cities (Name_Key, Name) SELECT {new_key}, TRIM(NEW.{col}) "
+                   f"WHERE TRIM(NEW.{col}) <> '' AND NOT EXISTS "
+                   f"(SELECT 1 FROM cities WHERE Name_Key = {new_key});")
+            patch = f"UPDATE {table} SET City_ID = {city_id} WHERE {key} = NEW.{key};"
+            out += [
+                (f"trg_{table}_city_ai", "AFTER", "INSERT", table, [add, patch]),
+                (f"trg_{table}_city_au", "AFTER", f"UPDATE OF {col}", table, [add, patch]),
+            ]
+    return out
+
+
+def install_triggers(conn):
+    """Migration step: attach the City_ID triggers (after backfill)."""
+    for name, timing, event, table, body in _triggers(conn.dialect.name):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text(trigger_ddl(name, timing, event, table, body)))
+
+
+def read_gazetteer(path):
+    """A gazetteer CSV as (Name_Key, Latitude, Longitude) rows; the first row per name wins."""
+    df = pd.read_csv(path)
+    df.columns = [c.strip().lower() for c in df.columns]
+    name = next(c for c in ("city", "name", "place") if c in df.columns)
+    lat = next(c for c in ("lat", "latitude") if c in df.columns)
+    lon = next(c for c in ("lon", "lng", "longitude") if c in df.columns)
+    out = pd.DataFrame({"Name_Key": df[name].astype("string").str.strip().str.lower(),
+                        "Latitude": pd.to_numeric(df[lat], errors="coerce"),
+                        "Longitude": pd.to_numeric(df[lon], errors="coerce")})
+    ok = out["Name_Key"].notna() & out["Latitude"].between(-90, 90) & out["Longitude"].between(-180, 180)
+    return out[ok].drop_duplicates("Name_Key")
+
+
+def set_coordinates(conn, coords):
+    """Store coords (Name_Key, Latitude, Longitude) on the matching cities; returns rows matched."""
+    if coords.empty:
+        return 0
+    rows = coords[["Name_Key", "Latitude", "Longitude"]].astype(object).to_dict("records")
+    result = conn.execute(text("UPDATE cities SET Latitude = :Latitude, Longitude = :Longitude "
+                               "WHERE Name_Key = :Name_Key"), rows)
+    return result.rowcount
+
+
+def load_gazetteer(engine_or_conn, path):
+    """Apply a gazetteer CSV to cities; returns (matched, read)."""
+    coords = read_gazetteer(path)
+    if hasattr(engine_or_conn, "begin"):
+        with engine_or_conn.begin() as conn:
+            matched = set_coordinates(conn, coords)
+    else:
+        matched = set_coordinates(engine_or_conn, coords)
+    db.cache.invalidate_tables(["cities"])
+    return matched, len(coords)
+
+
+def apply_default_gazetteer(conn):
+    """Migration step: load the FOOD_GAZETTEER CSV when one is configured."""
+    path = os.environ.get(GAZETTEER_ENV)
+    if path and os.path.exists(path):
+        set_coordinates(conn, read_gazetteer(path))
+
+
+# ---------------------------
+# GRID INDEX
+# ---------------------------
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle km from (lat, lon) to each of lats / lons (NumPy arrays, degrees)."""
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """cities in memory: name and coordinates per City_ID, located ones bucketed by grid cell."""
+
+    def __init__(self, cell_km=CELL_KM, resync_ttl=RESYNC_TTL):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.resync_ttl = resync_ttl
+        self._lock = threading.RLock()
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._lat = self._lon = np.zeros(0)
+        self._names = []
+        self._pos = {}       # City_ID -> position
+        self._by_key = {}    # Name_Key -> City_ID
+        self._cells = {}     # (row, col) -> positions of located cities
+        self._loaded_at = 0.0
+        self._dirty = True
+        self.reloads = 0
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def reload(self, engine=None):
+        with (engine or db.engine).connect() as conn:
+            df = pd.read_sql(text("SELECT City_ID, Name_Key, Name, Latitude, Longitude FROM cities"), conn)
+        lat = pd.to_numeric(df["Latitude"]).to_numpy(dtype=float)
+        lon = pd.to_numeric(df["Longitude"]).to_numpy(dtype=float)
+        located = np.flatnonzero(~np.isnan(lat) & ~np.isnan(lon))
+        rows = np.floor(lat[located] / self.cell_deg).astype(np.int64)
+        cols = np.floor(lon[located] / self.cell_deg).astype(np.int64)
+        cells = {}
+        if len(located):
+            order = np.lexsort((cols, rows))
+            keys = np.stack([rows[order], cols[order]], axis=1)
+            starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]).any(axis=1)])
+            for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+                cells[(int(keys[start, 0]), int(keys[start, 1]))] = located[order[start:end]]
+        ids = df["City_ID"].to_numpy(dtype=np.int64)
+        with self._lock:
+            self._ids, self._lat, self._lon = ids, lat, lon
+            self._names = df["Name"].tolist()
+            self._pos = {int(i): p for p, i in enumerate(ids)}
+            self._by_key = dict(zip(df["Name_Key"], (int(i) for i in ids)))
+            self._cells = cells
+            self._loaded_at = time.monotonic()
+            self._dirty = False
+            self.reloads += 1
+
+    def on_write(self, tables, keys):
+        # QueryCache subscriber; cities added by the triggers are found on a lookup miss or RESYNC_TTL
+        if "cities" in tables:
+            self._dirty = True
+
+    def _ensure_fresh(self, city_ids=()):
+        age = time.monotonic() - self._loaded_at
+        missing = any(int(c) not in self._pos for c in city_ids)
+        if self._dirty or age > self.resync_ttl or (missing and age > MISS_RELOAD_S):
+            self.reload()
+
+    # ---------------------------
+    # QUERIES
+    # ---------------------------
+    def ids(self, names):
+        """City_IDs of the given place names (unknown names are skipped)."""
+        with self._lock:
+            self._ensure_fresh()
+            keys = [name_key(n) for n in names]
+            if any(k not in self._by_key for k in keys) and time.monotonic() - self._loaded_at > MISS_RELOAD_S:
+                self.reload()
+            return [self._by_key[k] for k in keys if k in self._by_key]
+
+    def name(self, city_id):
+        with self._lock:
+            pos = self._pos.get(int(city_id))
+            return None if pos is None else self._names[pos]
+
+    def located(self, city_id):
+        with self._lock:
+            pos = self._pos.get(int(city_id))
+            return pos is not None and not np.isnan(self._lat[pos])
+
+    def distances(self, city_ids, km):
+        """{City_ID: km to the nearest of city_ids} for every city within km of one of them.
+
+        The given cities are always included (at 0 km), located or not; cities without
+        coordinates are never found by distance.
+        """
+        city_ids = [int(c) for c in city_ids]
+        with self._lock:
+            self._ensure_fresh(city_ids)
+            out = {c: 0.0 for c in city_ids}
+            if km <= 0:
+                return out
+            reach = int(math.ceil(km / KM_PER_DEGREE / self.cell_deg))
+            for c in city_ids:
+                pos = self._pos.get(c)
+                if pos is None or np.isnan(self._lat[pos]):
+                    continue
+                lat, lon = self._lat[pos], self._lon[pos]
+                row, col = self._cell(lat, lon)
+                # a degree of longitude shrinks with latitude: widen the column span to match
+                widest = min(abs(lat) + km / KM_PER_DEGREE, 89.0)
+                col_reach = int(math.ceil(reach / max(math.cos(math.radians(widest)), 1e-3)))
+                found = [self._cells[(r, k)] for r in range(row - reach, row + reach + 1)
+                         for k in range(col - col_reach, col + col_reach + 1) if (r, k) in self._cells]
+                if not found:
+                    continue
+                cand = np.concatenate(found)
+                dist = haversine_km(lat, lon, self._lat[cand], self._lon[cand])
+                for p, d in zip(cand[dist <= km], dist[dist <= km]):
+                    cid = int(self._ids[p])
+                    if d < out.get(cid, math.inf):
+                        out[cid] = float(d)
+            return out
+
+    def within(self, city_ids, km):
+        """City_IDs within km of any of city_ids, the cities themselves included."""
+        return sorted(self.distances(city_ids, km))
+
+    def stats(self):
+        with self._lock:
+            return {"cities": len(self._ids), "located": int((~np.isnan(self._lat)).sum()),
+                    "cells": len(self._cells), "reloads": self.reloads,
+                    "age_s": round(time.monotonic() - self._loaded_at, 1)}
+
+
+INDEX = GridIndex()
+db.cache.subscribe(INDEX.on_write)
+
+
+# ---------------------------
+# LISTINGS NEAR A RECEIVER
+# ---------------------------
+def receiver_city(receiver_id):
+    df = db.read_df("SELECT City_ID FROM receivers WHERE Receiver_ID = :rid", {"rid": int(receiver_id)},
+                    name="geo/receiver_city")
+    return None if df.empty or pd.isna(df["City_ID"].iloc[0]) else int(df["City_ID"].iloc[0])
+
+
+def listings_near(city_id, km, limit=NEAR_LIMIT, today=None):
+    """Claimable, unexpired listings within km of city_id: nearest first, then soonest expiry."""
+    dist = INDEX.distances([city_id], km)
+    clause, params = in_predicate("City_ID", list(dist), "city")
+    params["today"] = today or date.today()
+    df = db.read_df(NEAR_SQL.format(cities=clause), params, name="geo/listings_near")
+    if df.empty:
+        return df.assign(Distance_km=pd.Series(dtype=float))
+    df["Distance_km"] = df["City_ID"].map(dist).round(1)
+    return df.sort_values(["Distance_km", "Expiry_Date", "Food_ID"]).head(limit).reset_index(drop=True)
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="City dimension and radius lookups.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gaz = sub.add_parser("load-gazetteer", help="set city coordinates from a CSV (city, lat, lon)")
+    gaz.add_argument("csv")
+    near = sub.add_parser("near", help="claimable listings within --km of a receiver")
+    near.add_argument("--receiver", type=int, required=True)
+    near.add_argument("--km", type=float, default=25.0)
+    near.add_argument("--limit", type=int, default=NEAR_LIMIT)
+    sub.add_parser("status", help="cities, located cities and grid cells")
+    args = parser.parse_args(argv)
+
+    if args.command == "load-gazetteer":
+        matched, read = load_gazetteer(db.engine, args.csv)
+        print(f"{read} gazetteer rows read, {matched} cities located")
+    elif args.command == "near":
+        city = receiver_city(args.receiver)
+        if city is None:
+            print(f"receiver {args.receiver} has no city")
+            return 1
+        df = listings_near(city, args.km, args.limit)
+        with pd.option_context("display.width", 200, "display.max_rows", None):
+            print(df.to_string(index=False) if not df.empty else "no claimable listings in range")
+    else:
+        INDEX.reload()
+        print(INDEX.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
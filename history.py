@@ -0,0 +1,128 @@
+# history.py
+# Daily claim counts per Status over live and archived claims (claims_daily),
+# so the claims-over-time chart reads one row per day and status instead of
+# every claim. Days before today are filled in by the refresh_claims_daily
+# maintenance job, one small transaction per day; today, and any day the job
+# has not reached yet, is counted live (see CLAIMS_DAILY_SQL in queries.py
+# and live_from). The last REFRESH_DAYS are
+# recomputed on every run to pick up status changes on recent claims; bulk.py
+# and ingest.py, which can write claims of any date, call mark_stale for the
+# days they touched, and refresh(since=day) recomputes from day by hand.
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+import db
+import partitions
+
+REFRESH_DAYS = 14
+
+CREATE_TABLES = [
+    # NULL Status is stored as '' (primary keys cannot be NULL), as in rollups.py
+    """CREATE TABLE IF NOT EXISTS claims_daily (
+        Day DATE NOT NULL,
+        Status VARCHAR(50) NOT NULL,
+        Claims INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (Day, Status)
+    )""",
+]
+
+# the Archive_Month predicate prunes claims_archive to the day's partition
+DAY_COUNTS_SQL = """
+    SELECT COALESCE(Status, '') AS Status, COUNT(*) AS Claims FROM (
+        SELECT Status FROM claims WHERE Timestamp >= :day AND Timestamp < :next_day
+        UNION ALL
+        SELECT Status FROM claims_archive
+        WHERE Archive_Month = :month AND Timestamp >= :day AND Timestamp < :next_day
+    ) u
+    GROUP BY COALESCE(Status, '')
+"""
+
+
+def install(conn):
+    """Migration step: create claims_daily (filled by the first refresh)."""
+    for ddl in CREATE_TABLES:
+        conn.execute(text(ddl))
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def first_stale_day(conn, today, refresh_days=REFRESH_DAYS):
+    """Oldest day refresh() has to (re)compute."""
+    window = today - timedelta(days=refresh_days)
+    done = _as_date(conn.execute(text("SELECT MAX(Day) FROM claims_daily")).scalar())
+    if done is not None:
+        return min(window, done + timedelta(days=1))
+    first = [_as_date(conn.execute(text(f"SELECT MIN(Timestamp) FROM {t}")).scalar())
+             for t in ("claims", "claims_archive")]
+    first = [d for d in first if d is not None]
+    return min(first) if first else today
+
+
+def live_from(covered, since, today=None):
+    """First day the chart counts live: the day after covered (claims_daily's latest
+    day, None when it is empty), kept within [since, today]."""
+    today = today or date.today()
+    start = since if covered is None else _as_date(covered) + timedelta(days=1)
+    return min(max(start, since), today)
+
+
+def refresh_day(conn, day):
+    """Recompute one day of claims_daily inside conn's transaction."""
+    params = {"day": day, "next_day": day + timedelta(days=1), "month": partitions.month_key(day)}
+    rows = conn.execute(text(DAY_COUNTS_SQL), params).all()
+    conn.execute(text("DELETE FROM claims_daily WHERE Day = :day"), {"day": day})
+    if rows:
+        conn.execute(text("INSERT INTO claims_daily (Day, Status, Claims) VALUES (:day, :status, :claims)"),
+                     [{"day": day, "status": r.Status, "claims": r.Claims} for r in rows])
+
+
+def mark_stale(conn, first, last):
+    """Inside a write's transaction: claims between first and last (dates or datetimes)
+    changed, so the claims_daily days they fall on are out of date.
+
+    A short range is recomputed on the spot; a longer one (a backfill) drops claims_daily
+    from first on, so the chart counts those days live until refresh() fills them again.
+    The caller invalidates claims_daily once the transaction has committed.
+    """
+    covered = _as_date(conn.execute(text("SELECT MAX(Day) FROM claims_daily")).scalar())
+    first, last = _as_date(first), _as_date(last)
+    if covered is None or first is None or first > covered:
+        return                                  # not aggregated yet: the chart counts them live
+    last = min(last, covered)
+    if (last - first).days >= REFRESH_DAYS:
+        conn.execute(text("DELETE FROM claims_daily WHERE Day >= :day"), {"day": first})
+    else:
+        day = first
+        while day <= last:
+            refresh_day(conn, day)
+            day += timedelta(days=1)
+
+
+def refresh(engine=None, today=None, refresh_days=REFRESH_DAYS, should_stop=None, since=None):
+    """Fill claims_daily up to yesterday, one transaction per day; returns the number of days written.
+
+    since recomputes every day from there on as well, e.g. after claims were written
+    around mark_stale.
+    """
+    engine = engine or db.engine
+    today = today or date.today()
+    with engine.connect() as conn:
+        day = first_stale_day(conn, today, refresh_days)
+    if since is not None:
+        day = min(day, _as_date(since))
+    written = 0
+    while day < today and not (should_stop and should_stop()):
+        with engine.begin() as conn:
+            refresh_day(conn, day)
+        written += 1
+        day += timedelta(days=1)
+    if written:
+        db.cache.invalidate_tables(["claims_daily"])
+    return written
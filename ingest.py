@@ -0,0 +1,304 @@
+# ingest.py
+# Bulk CSV loader for the four tables. Cleans each chunk with vectorised
+# pandas string ops, then upserts it in one transaction, so re-running on
+# overlapping files updates rows instead of duplicating them. Each chunk
+# keeps the reservation rule of claim_service.py: claims move Reserved, and a
+# chunk that would leave a listing's Quantity below Reserved is rolled back.
+#   python ingest.py data/                      (providers_data.csv, receivers_data.csv, ...)
+#   python ingest.py --claims new_claims.csv --chunksize 100000 --load-data
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+import claim_service
+import db
+import history
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# FK order: parents first
+TABLES = {
+    "providers": {
+        "file": "providers_data.csv",
+        "key": "Provider_ID",
+        "columns": ["Provider_ID", "Name", "Type", "Address", "City", "Contact"],
+    },
+    "receivers": {
+        "file": "receivers_data.csv",
+        "key": "Receiver_ID",
+        "columns": ["Receiver_ID", "Name", "Type", "City", "Contact"],
+    },
+    "food_listings": {
+        "file": "food_listings_data.csv",
+        "key": "Food_ID",
+        "columns": ["Food_ID", "Food_Name", "Quantity", "Expiry_Date", "Provider_ID",
+                    "Provider_Type", "Location", "Food_Type", "Meal_Type"],
+    },
+    "claims": {
+        "file": "claims_data.csv",
+        "key": "Claim_ID",
+        "columns": ["Claim_ID", "Food_ID", "Receiver_ID", "Status", "Timestamp"],
+        # loaded when the file has it; claims without a quantity reserve nothing
+        "optional": ["Claim_Quantity"],
+    },
+}
+
+
+class IngestError(Exception):
+    """A chunk that breaks a rule the database relies on; its transaction is rolled back."""
+
+
+# ---------------------------
+# CLEANING (vectorised versions of the notebook helpers)
+# ---------------------------
+def clean_contact_number(s):
+    """Keep only digits from the contact number."""
+    return s.astype("string").str.replace(r"\D", "", regex=True)
+
+
+def clean_text(s):
+    """Remove newlines, commas, hyphens, extra spaces, and trim."""
+    return (s.astype("string")
+             .str.replace(r"[\n\r]+", " ", regex=True)
+             .str.replace(r"[,\\-]+", " ", regex=True)
+             .str.replace(r"\s+", " ", regex=True)
+             .str.strip())
+
+
+def clean_addr_text(s):
+    return (s.astype("string")
+             .str.replace(r"[\n\r]+", " ", regex=True)
+             .str.replace(r"\s+", " ", regex=True)
+             .str.strip())
+
+
+def clean_providers(df):
+    for col in ["Name", "Type", "City"]:
+        df[col] = clean_text(df[col])
+    df["Address"] = clean_addr_text(df["Address"])
+    df["Contact"] = clean_contact_number(df["Contact"])
+    return df
+
+
+def clean_receivers(df):
+    df["Contact"] = clean_contact_number(df["Contact"])
+    for col in ["Name", "Type", "City"]:
+        df[col] = clean_text(df[col])
+    return df
+
+
+def clean_food_listings(df):
+    df["Expiry_Date"] = pd.to_datetime(df["Expiry_Date"], errors="coerce").dt.date
+    df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce")
+    df = df[df["Quantity"] > 0].copy()   # remove negatives/zeros
+    for col in ["Food_Name", "Provider_Type", "Location", "Food_Type", "Meal_Type"]:
+        df[col] = df[col].astype("string").str.strip().str.title()
+    return df
+
+
+def clean_claims(df):
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    df["Status"] = df["Status"].astype("string").str.strip().str.title()
+    if "Claim_Quantity" in df:
+        df["Claim_Quantity"] = pd.to_numeric(df["Claim_Quantity"], errors="coerce").astype("Int64")
+        df = df[df["Claim_Quantity"].isna() | (df["Claim_Quantity"] > 0)]
+    df = df[(df["Claim_ID"] > 0) & (df["Food_ID"] > 0) & (df["Receiver_ID"] > 0)]
+    return df[df["Timestamp"].notna()].copy()
+
+
+CLEANERS = {
+    "providers": clean_providers,
+    "receivers": clean_receivers,
+    "food_listings": clean_food_listings,
+    "claims": clean_claims,
+}
+
+
+def columns(table, df):
+    """The table's columns to load from df: the required ones plus the optional ones it has."""
+    spec = TABLES[table]
+    return spec["columns"] + [c for c in spec.get("optional", []) if c in df.columns]
+
+
+def clean_chunk(table, df):
+    spec = TABLES[table]
+    df = CLEANERS[table](df[columns(table, df)].copy())
+    # within a chunk the last occurrence of a key wins, like the upsert across chunks
+    return df.drop_duplicates(subset=spec["key"], keep="last")
+
+
+# ---------------------------
+# LOADING
+# ---------------------------
+def upsert_sql(dialect, table, columns, key):
+    cols = ", ".join(columns)
+    vals = ", ".join(f":{c}" for c in columns)
+    others = [c for c in columns if c != key]
+    if dialect == "mysql":
+        upd = ", ".join(f"{c} = VALUES({c})" for c in others)
+        return f"INSERT INTO {table} ({cols}) VALUES ({vals}) ON DUPLICATE KEY UPDATE {upd}"
+    upd = ", ".join(f"{c} = excluded.{c}" for c in others)
+    return f"INSERT INTO {table} ({cols}) VALUES ({vals}) ON CONFLICT ({key}) DO UPDATE SET {upd}"
+
+
+def to_records(df):
+    # NaN / NaT / pd.NA -> None so the driver sends NULL; Timestamps -> datetime for every DBAPI
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    dt_cols = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+    for rec in records:
+        for col in dt_cols:
+            if rec[col] is not None:
+                rec[col] = rec[col].to_pydatetime()
+    return records
+
+
+def _reserved_before(conn, table, df):
+    # claims: the listings these rows reserve from now, before the upsert moves them
+    if table != "claims":
+        return set()
+    ids = ", ".join(str(int(k)) for k in df["Claim_ID"]) or "NULL"
+    return {int(r.Food_ID) for r in conn.execute(text(
+        f"SELECT DISTINCT Food_ID FROM claims WHERE Claim_ID IN ({ids}) AND Food_ID IS NOT NULL"))}
+
+
+def _claim_days(conn, table, df):
+    # claims: (first, last) Timestamp these rows have before the upsert and will have after it
+    if table != "claims":
+        return None
+    ids = ", ".join(str(int(k)) for k in df["Claim_ID"]) or "NULL"
+    old = conn.execute(text(f"SELECT MIN(Timestamp), MAX(Timestamp) FROM claims WHERE Claim_ID IN ({ids})")).one()
+    stamps = [pd.Timestamp(t) for t in (*old, df["Timestamp"].min(), df["Timestamp"].max()) if pd.notna(t)]
+    return (min(stamps), max(stamps)) if stamps else None
+
+
+def _mark_days(conn, days):
+    """After the upsert, inside its transaction: the claims_daily days it touched are recomputed."""
+    if days:
+        history.mark_stale(conn, *(t.to_pydatetime() for t in days))
+
+
+def _check_reservations(conn, table, df, before):
+    """After the upsert, inside its transaction: keep Reserved in step and refuse oversold listings."""
+    if table == "claims":
+        food_ids = before | {int(k) for k in df["Food_ID"]}
+        claim_service.recount_reserved(conn, food_ids)
+    elif table == "food_listings":
+        food_ids = df["Food_ID"]
+    else:
+        return
+    short = claim_service.oversold(conn, food_ids)
+    if short:
+        listed = ", ".join(f"food {fid} ({reserved} claimed)" for fid, reserved in sorted(short.items())[:10])
+        raise IngestError(f"{table}: {len(short)} listings would have less Quantity than is claimed: {listed}")
+
+
+def load_frame(engine, table, df):
+    """Upsert a cleaned DataFrame with one executemany (multi-row INSERT on pymysql) in one transaction."""
+    spec = TABLES[table]
+    if df.empty:
+        return 0
+    cols = columns(table, df)
+    sql = upsert_sql(engine.dialect.name, table, cols, spec["key"])
+    with engine.begin() as conn:
+        before = _reserved_before(conn, table, df)
+        days = _claim_days(conn, table, df)
+        conn.execute(text(sql), to_records(df[cols]))
+        _check_reservations(conn, table, df, before)
+        _mark_days(conn, days)
+    return len(df)
+
+
+def load_frame_infile(engine, table, df):
+    """MySQL fast path: LOAD DATA LOCAL INFILE into a temp staging table, then one upsert INSERT ... SELECT."""
+    spec = TABLES[table]
+    if df.empty:
+        return 0
+    names = columns(table, df)
+    cols = ", ".join(names)
+    upd = ", ".join(f"{c} = VALUES({c})" for c in names if c != spec["key"])
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as fh:
+            df[names].to_csv(fh, index=False, header=False, na_rep="NULL", lineterminator="\n")
+        with engine.begin() as conn:
+            before = _reserved_before(conn, table, df)
+            days = _claim_days(conn, table, df)
+            conn.execute(text(f"CREATE TEMPORARY TABLE stage_{table} LIKE {table}"))
+            conn.execute(text(
+                f"LOAD DATA LOCAL INFILE :path INTO TABLE stage_{table} "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '\\n' ({cols})"
+            ), {"path": path})
+            # staging + upsert instead of REPLACE, which would delete rows and cascade to claims
+            conn.execute(text(
+                f"INSERT INTO {table} ({cols}) SELECT {cols} FROM stage_{table} "
+                f"ON DUPLICATE KEY UPDATE {upd}"
+            ))
+            conn.execute(text(f"DROP TEMPORARY TABLE stage_{table}"))
+            _check_reservations(conn, table, df, before)
+            _mark_days(conn, days)
+    finally:
+        os.remove(path)
+    return len(df)
+
+
+def ingest_csv(engine, table, path, chunksize=DEFAULT_CHUNK_ROWS, use_infile=False, report=print):
+    """Stream one CSV into table chunk by chunk; returns (rows_loaded, seconds)."""
+    loader = load_frame_infile if use_infile else load_frame
+    rows = 0
+    start = time.perf_counter()
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        rows += loader(engine, table, clean_chunk(table, chunk))
+        elapsed = time.perf_counter() - start
+        report(f"  {table}: {rows} rows, {rows / elapsed if elapsed else 0:,.0f} rows/s")
+    # loading claims moves food_listings.Reserved and the claims_daily days too
+    db.cache.invalidate_tables([table, "food_listings", "claims_daily"] if table == "claims" else [table])
+    return rows, time.perf_counter() - start
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean and upsert the food management CSVs.")
+    parser.add_argument("directory", nargs="?", help="folder holding the standard *_data.csv files")
+    for table in TABLES:
+        parser.add_argument(f"--{table.replace('_', '-')}", dest=table, help=f"CSV for {table}")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--load-data", action="store_true",
+                        help="use LOAD DATA LOCAL INFILE (MySQL with local_infile enabled)")
+    args = parser.parse_args(argv)
+
+    files = {}
+    for table, spec in TABLES.items():
+        path = getattr(args, table)
+        if path is None and args.directory:
+            candidate = os.path.join(args.directory, spec["file"])
+            path = candidate if os.path.exists(candidate) else None
+        if path:
+            files[table] = path
+    if not files:
+        parser.error("no input files; pass a directory or --<table> paths")
+
+    use_infile = args.load_data and db.engine.dialect.name == "mysql"
+    engine = create_engine(db.DB_URI, connect_args={"local_infile": True}) if use_infile else db.engine
+
+    total_rows, total_secs = 0, 0.0
+    for table, path in files.items():
+        print(f"Loading {path} -> {table}")
+        try:
+            rows, secs = ingest_csv(engine, table, path, args.chunksize, use_infile)
+        except IngestError as e:
+            parser.exit(1, f"Stopped, the failing chunk was rolled back: {e}\n")
+        total_rows += rows
+        total_secs += secs
+        print(f"  done: {rows} rows in {secs:.1f}s ({rows / secs if secs else 0:,.0f} rows/s)")
+    print(f"Total: {total_rows} rows in {total_secs:.1f}s ({total_rows / total_secs if total_secs else 0:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# maintenance.py
+# Periodic background jobs. Run them from a separate worker process:
+#   python maintenance.py worker                 loop forever, one sweep every SWEEP_INTERVAL
+#   python maintenance.py run [job ...]          run due jobs once and exit (cron)
+#   python maintenance.py status
+#   */10 * * * * cd /path/to/app && python maintenance.py run    (crontab alternative to the worker)
+# or inside the app process with FOOD_MAINTENANCE=app. None of these is the
+# default: without one, listings are never archived and the claims-over-time
+# chart has no history, and the app says so. Each job holds a lease row in
+# maintenance_jobs while it runs, so several app processes and workers never
+# run the same job at once.
+import argparse
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import archive
+import changefeed
+import db
+import history
+import profiler
+
+MAINTENANCE_ENV = "FOOD_MAINTENANCE"
+SWEEP_INTERVAL = 600    # seconds between passes of the worker loop
+LEASE_SECONDS = 900     # a crashed runner's lease expires after this
+
+JOBS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS maintenance_jobs (
+    Job VARCHAR(100) PRIMARY KEY,
+    Lease_Owner VARCHAR(255),
+    Lease_Until DATETIME,
+    Last_Started DATETIME,
+    Last_Finished DATETIME,
+    Last_Status VARCHAR(255),
+    Last_Rows INT NOT NULL DEFAULT 0
+)
+"""
+
+# name -> (callable(should_stop) returning rows processed, minimum seconds between runs)
+JOBS = {
+    "archive_expired": (lambda should_stop: archive.sweep(should_stop=should_stop), 3600),
+    "refresh_claims_daily": (lambda should_stop: history.refresh(should_stop=should_stop), 600),
+    "prune_change_log": (lambda should_stop: changefeed.prune(should_stop=should_stop), 3600),
+}
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def install(conn):
+    """Migration step: create the job lease table."""
+    conn.execute(text(JOBS_TABLE_SQL))
+
+
+# ---------------------------
+# LEASES
+# ---------------------------
+def _acquire(job, every, now):
+    """Take job's lease if nobody holds it and it last started at least every seconds ago."""
+    try:
+        with db.engine.begin() as conn:
+            if conn.execute(text("SELECT 1 FROM maintenance_jobs WHERE Job = :job"), {"job": job}).first() is None:
+                conn.execute(text("INSERT INTO maintenance_jobs (Job) VALUES (:job)"), {"job": job})
+    except IntegrityError:
+        pass   # another runner created the row first
+    with db.engine.begin() as conn:
+        taken = conn.execute(text(
+            "UPDATE maintenance_jobs SET Lease_Owner = :owner, Lease_Until = :until, Last_Started = :now "
+            "WHERE Job = :job AND (Lease_Until IS NULL OR Lease_Until < :now) "
+            "AND (Last_Started IS NULL OR Last_Started <= :due)"
+        ), {"owner": OWNER, "until": now + timedelta(seconds=LEASE_SECONDS), "now": now,
+            "due": now - timedelta(seconds=every), "job": job})
+        return taken.rowcount == 1
+
+
+def _release(job, status, rows):
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE maintenance_jobs SET Lease_Owner = NULL, Lease_Until = NULL, Last_Finished = :now, "
+            "Last_Status = :status, Last_Rows = :rows WHERE Job = :job AND Lease_Owner = :owner"
+        ), {"now": datetime.now(), "status": status[:255], "rows": rows, "job": job, "owner": OWNER})
+
+
+def run_job(name, force=False, should_stop=None):
+    """Run one job under its lease; returns rows processed, or None if it was not due or is running elsewhere."""
+    fn, every = JOBS[name]
+    if not _acquire(name, 0 if force else every, datetime.now()):
+        return None
+    start = time.perf_counter()
+    rows, status = 0, "ok"
+    try:
+        rows = fn(should_stop)
+    except Exception as e:
+        status = f"error: {e}"
+        raise
+    finally:
+        profiler.record("section", f"maintenance/{name}", (time.perf_counter() - start) * 1000,
+                        rows=rows, status="ok" if status == "ok" else "error")
+        _release(name, status, rows)
+    return rows
+
+
+def run_due(names=None, force=False, should_stop=None):
+    """Run every due job (or just names); returns {job: rows or None}."""
+    return {name: run_job(name, force, should_stop) for name in (names or JOBS)}
+
+
+def status():
+    return db.read_df("SELECT * FROM maintenance_jobs ORDER BY Job", name="maintenance/status")
+
+
+def never_run(ttl=60):
+    """Jobs that have not finished once, e.g. because no worker or cron entry is set up."""
+    done = db.read_df("SELECT Job FROM maintenance_jobs WHERE Last_Finished IS NOT NULL",
+                      ttl=ttl, name="maintenance/finished")
+    return [name for name in JOBS if name not in set(done["Job"])]
+
+
+# ---------------------------
+# IN-PROCESS RUNNER
+# ---------------------------
+_thread = None
+_stop = threading.Event()
+
+
+def _loop(interval):
+    while not _stop.is_set():
+        try:
+            run_due(should_stop=_stop.is_set)
+        except Exception:
+            pass   # recorded by the profiler and in maintenance_jobs; try again next pass
+        _stop.wait(interval)
+
+
+def enabled():
+    return os.environ.get(MAINTENANCE_ENV, "").lower() == "app"
+
+
+def start_background(interval=SWEEP_INTERVAL):
+    """Start the job loop on a daemon thread once per process."""
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _thread = threading.Thread(target=_loop, args=(interval,), name="maintenance", daemon=True)
+        _thread.start()
+    return _thread
+
+
+def stop_background():
+    _stop.set()
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background maintenance jobs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run due jobs every --interval seconds until interrupted")
+    worker.add_argument("--interval", type=int, default=SWEEP_INTERVAL)
+    once = sub.add_parser("run", help="run due jobs once")
+    once.add_argument("jobs", nargs="*", help=f"jobs to run (default: all of {', '.join(JOBS)})")
+    once.add_argument("--force", action="store_true", help="ignore the minimum time between runs")
+    sub.add_parser("status", help="show the last run of every job")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(status())
+    elif args.command == "run":
+        unknown = set(args.jobs) - set(JOBS)
+        if unknown:
+            parser.error(f"unknown job(s): {', '.join(sorted(unknown))}")
+        for name, rows in run_due(args.jobs or None, force=args.force).items():
+            print(f"{name}: {'not due or running elsewhere' if rows is None else f'{rows} rows'}")
+    else:
+        print(f"Maintenance worker {OWNER}: every {args.interval}s; Ctrl+C to stop")
+        try:
+            while True:
+                try:
+                    for name, rows in run_due().items():
+                        if rows is not None:
+                            print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  {name}: {rows} rows")
+                except Exception as e:
+                    print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  failed: {e}")
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
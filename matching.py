@@ -0,0 +1,304 @@
+# matching.py
+# Suggests receivers for open food listings (not expired, Quantity > Reserved).
+# Every listing is scored against the receivers in its own city (Location ==
+# City) on four features, each in [0, 1]:
+#   food / meal   share of the receiver's past claims with this Food_Type / Meal_Type
+#   quantity      how close the listing's available quantity is to what the receiver usually claims
+#   urgency       1 / (1 + days to expiry)
+# Receivers without history get uniform shares and the typical claim size, so
+# they are still matched on city, quantity and urgency. Scoring is vectorised
+# per city with NumPy, at most BATCH_PAIRS listing x receiver pairs at a time.
+# Writes that name their rows (cache subscription, see expiry_index.py) patch
+# just those listings / receivers; claim history, which only nudges the
+# preferences, is re-read with the full reload every RESYNC_TTL.
+#   python matching.py suggest --per-listing 2 --csv matches.csv
+#   python claim_service.py batch matches.csv     (bulk-claims the suggestions)
+import argparse
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import db
+import profiler
+from claim_service import claim_batch
+from queries import MATCH_HISTORY_SQL, MATCH_LISTINGS_SQL, MATCH_RECEIVERS_SQL
+
+MATCH_TABLES = ["food_listings", "receivers", "claims"]
+WEIGHTS = {"food": 0.3, "meal": 0.2, "quantity": 0.2, "urgency": 0.3}
+BATCH_PAIRS = 1_000_000    # listing x receiver scores materialised at once
+SUGGEST_MEMO = 8           # scored results kept per load (one per filter combination)
+PRIOR_CLAIMS = 2.0         # pseudo-claims spread evenly over types, so one claim is not 100% preference
+RESYNC_TTL = 300           # seconds; full reload, so the claim history catches up
+
+MATCH_COLUMNS = ["Food_ID", "Food_Name", "City", "Food_Type", "Meal_Type", "Available", "Expiry_Date",
+                 "Days_Left", "Receiver_ID", "Receiver_Name", "Receiver_Type", "Claim_Quantity", "Score"]
+
+
+def _codes(values, categories):
+    return pd.Categorical(values, categories=categories).codes.astype(np.int32)
+
+
+def _shares(history, column, categories, receiver_pos, n_receivers):
+    """(n_receivers, len(categories)) smoothed share of each receiver's claims per category."""
+    counts = np.zeros((n_receivers, len(categories)))
+    known = history[history[column].isin(categories)]
+    rows = receiver_pos.reindex(known["Receiver_ID"]).to_numpy()
+    ok = ~np.isnan(rows)
+    np.add.at(counts, (rows[ok].astype(np.int64), _codes(known[column], categories)[ok]),
+              known["Claims"].to_numpy()[ok])
+    prior = PRIOR_CLAIMS / max(len(categories), 1)
+    return (counts + prior) / (counts.sum(axis=1, keepdims=True) + PRIOR_CLAIMS)
+
+
+# ---------------------------
+# CANDIDATES
+# ---------------------------
+class Candidates:
+    """Open listings and receivers encoded as arrays, grouped by city for pruning."""
+
+    def __init__(self, listings, receivers, history, today):
+        self.today = today
+        self.listings = listings.reset_index(drop=True)
+        self.receivers = receivers.reset_index(drop=True)
+        self.history = history
+        cities = pd.Index(pd.unique(pd.concat([listings["Location"], receivers["City"]]).dropna()))
+        food_types = pd.Index(pd.unique(listings["Food_Type"].dropna()))
+        meal_types = pd.Index(pd.unique(listings["Meal_Type"].dropna()))
+
+        expiry = pd.to_datetime(self.listings["Expiry_Date"], errors="coerce")
+        self.days_left = np.maximum((expiry - pd.Timestamp(today)).dt.days.fillna(0).to_numpy(), 0)
+        self.available = self.listings["Available"].fillna(0).to_numpy(dtype=np.int64)
+        self.l_city = _codes(self.listings["Location"], cities)
+        self.l_food = _codes(self.listings["Food_Type"], food_types)
+        self.l_meal = _codes(self.listings["Meal_Type"], meal_types)
+        self.r_city = _codes(self.receivers["City"], cities)
+
+        n = len(self.receivers)
+        pos = pd.Series(np.arange(n), index=self.receivers["Receiver_ID"].to_numpy())
+        # a trailing uniform column stands in for listings with no Food_Type / Meal_Type (code -1)
+        self.food_pref = np.hstack([_shares(history, "Food_Type", food_types, pos, n),
+                                    np.full((n, 1), 1 / max(len(food_types), 1))])
+        self.meal_pref = np.hstack([_shares(history, "Meal_Type", meal_types, pos, n),
+                                    np.full((n, 1), 1 / max(len(meal_types), 1))])
+
+        sized = history[["Claimed_Quantity", "Sized_Claims"]].apply(pd.to_numeric, errors="coerce").fillna(0)
+        sized = sized.groupby(history["Receiver_ID"]).sum()
+        typical = (sized["Claimed_Quantity"] / sized["Sized_Claims"].replace(0, np.nan)).dropna()
+        # receivers with no sized claims are assumed to take what others typically take
+        if len(typical):
+            fallback = typical.median()
+        else:
+            fallback = np.median(self.available) if len(self.available) else 1.0
+        self.typical = np.maximum(
+            typical.reindex(self.receivers["Receiver_ID"]).fillna(fallback).to_numpy(dtype=float), 1.0)
+
+        # city index: receiver / listing positions sorted by city, sliced per city code
+        self._r_order = np.argsort(self.r_city, kind="stable")
+        self._r_bounds = np.searchsorted(self.r_city[self._r_order], np.arange(len(cities) + 1))
+        self._l_order = np.argsort(self.l_city, kind="stable")
+        self._l_bounds = np.searchsorted(self.l_city[self._l_order], np.arange(len(cities) + 1))
+        self.cities = cities
+        self._suggested = {}   # filter args -> result; a Candidates lives until the next write
+
+    @classmethod
+    def load(cls, today=None, reader=None):
+        reader = reader or db.read_df
+        today = today or date.today()
+        listings = reader(MATCH_LISTINGS_SQL, {"today": today}, name="match/listings")
+        receivers = reader(MATCH_RECEIVERS_SQL, name="match/receivers")
+        history = reader(MATCH_HISTORY_SQL, name="match/history")
+        return cls(listings, receivers, history, today)
+
+    def patched(self, food_ids=(), receiver_ids=(), reader=None):
+        """A new Candidates with just these listings / receivers re-read (or dropped, if no longer open)."""
+        reader = reader or db.read_df
+        listings, receivers = self.listings, self.receivers
+        if food_ids:
+            ids = ", ".join(str(int(i)) for i in sorted(food_ids))
+            fresh = reader(MATCH_LISTINGS_SQL + f" AND Food_ID IN ({ids})", {"today": self.today},
+                           name="match/listings_patch")
+            listings = pd.concat([listings[~listings["Food_ID"].isin(list(food_ids))], fresh], ignore_index=True)
+        if receiver_ids:
+            ids = ", ".join(str(int(i)) for i in sorted(receiver_ids))
+            fresh = reader(MATCH_RECEIVERS_SQL + f" AND Receiver_ID IN ({ids})", name="match/receivers_patch")
+            receivers = pd.concat([receivers[~receivers["Receiver_ID"].isin(list(receiver_ids))], fresh],
+                                  ignore_index=True)
+        return type(self)(listings, receivers, self.history, self.today)
+
+    def pairs_considered(self):
+        l_sizes = np.diff(self._l_bounds)
+        r_sizes = np.diff(self._r_bounds)
+        return int((l_sizes * r_sizes).sum())
+
+    def _score_block(self, li, ri):
+        """(len(li), len(ri)) scores; li / ri are listing / receiver positions in one city."""
+        score = WEIGHTS["food"] * self.food_pref[ri][:, self.l_food[li]].T
+        score += WEIGHTS["meal"] * self.meal_pref[ri][:, self.l_meal[li]].T
+        avail = self.available[li][:, None].astype(float)
+        typical = self.typical[ri][None, :]
+        score += WEIGHTS["quantity"] * (np.minimum(avail, typical) / np.maximum(avail, typical))
+        score += (WEIGHTS["urgency"] / (1.0 + self.days_left[li]))[:, None]
+        return score
+
+    def suggest(self, per_listing=1, cities=None, food_types=None, meal_types=None):
+        """Top per_listing receivers for every open listing (optionally filtered), best scores first."""
+        keep = np.ones(len(self.listings), dtype=bool)
+        for column, allowed in (("Location", cities), ("Food_Type", food_types), ("Meal_Type", meal_types)):
+            if allowed:
+                keep &= self.listings[column].isin(list(allowed)).to_numpy()
+
+        out_l, out_r, out_s = [], [], []
+        for code in range(len(self.cities)):
+            ri = self._r_order[self._r_bounds[code]:self._r_bounds[code + 1]]
+            li = self._l_order[self._l_bounds[code]:self._l_bounds[code + 1]]
+            li = li[keep[li]]
+            if not len(ri) or not len(li):
+                continue   # pruned: no receiver in this city, or nothing to give away
+            k = min(per_listing, len(ri))
+            step = max(1, BATCH_PAIRS // len(ri))
+            for start in range(0, len(li), step):
+                chunk = li[start:start + step]
+                scores = self._score_block(chunk, ri)
+                if k < len(ri):
+                    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                else:
+                    top = np.broadcast_to(np.arange(len(ri)), scores.shape)
+                out_l.append(np.repeat(chunk, k))
+                out_r.append(ri[top].ravel())
+                out_s.append(np.take_along_axis(scores, top, axis=1).ravel())
+
+        if not out_l:
+            return pd.DataFrame(columns=MATCH_COLUMNS)
+        li, ri, score = np.concatenate(out_l), np.concatenate(out_r), np.concatenate(out_s)
+        listings, receivers = self.listings.iloc[li], self.receivers.iloc[ri]
+        return pd.DataFrame({
+            "Food_ID": listings["Food_ID"].to_numpy(),
+            "Food_Name": listings["Food_Name"].to_numpy(),
+            "City": listings["Location"].to_numpy(),
+            "Food_Type": listings["Food_Type"].to_numpy(),
+            "Meal_Type": listings["Meal_Type"].to_numpy(),
+            "Available": self.available[li],
+            "Expiry_Date": listings["Expiry_Date"].to_numpy(),
+            "Days_Left": self.days_left[li],
+            "Receiver_ID": receivers["Receiver_ID"].to_numpy(),
+            "Receiver_Name": receivers["Name"].to_numpy(),
+            "Receiver_Type": receivers["Type"].to_numpy(),
+            "Claim_Quantity": np.maximum(np.minimum(self.available[li], np.rint(self.typical[ri])), 1).astype(np.int64),
+            "Score": score.round(4),
+        }).sort_values(["Score", "Days_Left", "Food_ID"], ascending=[False, True, True], ignore_index=True)
+
+
+# ---------------------------
+# PROCESS-WIDE CANDIDATES
+# ---------------------------
+_loaded = None    # (day, monotonic load time, Candidates)
+_load_lock = threading.Lock()
+_dirty = True
+_pending = {"food_listings": set(), "receivers": set()}   # rows written since the last read
+_pending_lock = threading.Lock()                           # held briefly, so writers never wait on a load
+
+
+def on_write(tables, keys):
+    # QueryCache subscriber: note the rows a write names; a write naming none reloads on next read
+    global _dirty
+    if not tables & set(MATCH_TABLES):
+        return
+    with _pending_lock:
+        if not keys:
+            _dirty = True
+            return
+        for table, pending in _pending.items():
+            if table in keys:
+                pending.update(int(k) for k in keys[table])
+            elif table in tables:
+                _dirty = True      # e.g. a provider delete cascading to its listings
+
+
+db.cache.subscribe(on_write)
+
+
+def _take_pending():
+    global _dirty
+    with _pending_lock:
+        dirty, ids = _dirty, {table: set(pending) for table, pending in _pending.items()}
+        _dirty = False
+        for pending in _pending.values():
+            pending.clear()
+    return dirty, ids
+
+
+def candidates():
+    """Candidates for today: patched with the rows written since the last call, reloaded
+    after a write that names no rows, on a new day and every RESYNC_TTL."""
+    global _loaded
+    today = date.today()
+    with _load_lock:
+        dirty, ids = _take_pending()
+        start = time.perf_counter()
+        if dirty or _loaded is None or _loaded[0] != today or time.monotonic() - _loaded[1] > RESYNC_TTL:
+            cands = Candidates.load(today=today)
+            profiler.record("section", "match/load", (time.perf_counter() - start) * 1000,
+                            rows=len(cands.listings), status="ok")
+            _loaded = (today, time.monotonic(), cands)
+        elif any(ids.values()):
+            cands = _loaded[2].patched(ids["food_listings"], ids["receivers"])
+            profiler.record("section", "match/patch", (time.perf_counter() - start) * 1000,
+                            rows=sum(map(len, ids.values())), status="ok")
+            _loaded = (today, _loaded[1], cands)
+        return _loaded[2]
+
+
+def suggest(per_listing=1, limit=None, **filters):
+    """Suggested matches as a DataFrame (MATCH_COLUMNS), best first; see Candidates.suggest."""
+    cands = candidates()
+    key = (per_listing,) + tuple((k, tuple(sorted(v or ()))) for k, v in sorted(filters.items()))
+    matches = cands._suggested.get(key)
+    if matches is None:
+        start = time.perf_counter()
+        matches = cands.suggest(per_listing=per_listing, **filters)
+        profiler.record("section", "match/score", (time.perf_counter() - start) * 1000,
+                        rows=len(matches), status="ok")
+        if len(cands._suggested) >= SUGGEST_MEMO:
+            cands._suggested.pop(next(iter(cands._suggested)))
+        cands._suggested[key] = matches
+    return matches.head(limit) if limit else matches
+
+
+def create_claims(matches, status="Pending"):
+    """Claim every (Food_ID, Receiver_ID, Claim_Quantity) row of matches in one transaction."""
+    requests = matches[["Food_ID", "Receiver_ID", "Claim_Quantity"]].itertuples(index=False, name=None)
+    return claim_batch([tuple(int(v) for v in r) for r in requests], status=status)
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suggest receivers for open food listings.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sug = sub.add_parser("suggest", help="score open listings against receivers in their city")
+    sug.add_argument("--per-listing", type=int, default=1)
+    sug.add_argument("--limit", type=int, default=20, help="rows to print (0 for all)")
+    sug.add_argument("--city", action="append", help="only listings in this city (repeatable)")
+    sug.add_argument("--csv", help="write every suggestion here (input for claim_service.py batch)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    cands = candidates()
+    loaded = time.perf_counter()
+    matches = cands.suggest(per_listing=args.per_listing, cities=args.city)
+    scored = time.perf_counter()
+    print(f"{len(cands.listings):,} open listings x {len(cands.receivers):,} receivers: "
+          f"{cands.pairs_considered():,} same-city pairs; load {loaded - start:.2f}s, score {scored - loaded:.2f}s")
+    if args.csv:
+        matches.to_csv(args.csv, index=False)
+        print(f"{len(matches):,} suggestions written to {args.csv}")
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(matches.head(args.limit) if args.limit else matches)
+
+
+if __name__ == "__main__":
+    main()
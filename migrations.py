@@ -0,0 +1,380 @@
+# migrations.py
+# Versioned schema for foodmanagement_db.
+#   python migrations.py upgrade     apply pending migrations
+#   python migrations.py status      show applied / pending versions
+#   python migrations.py check       EXPLAIN every dashboard query, exit 1 on a full table or index scan
+# The app also calls ensure_schema() once per process at startup.
+import argparse
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+import archive
+import backend
+import changefeed
+import db
+import geo
+import history
+import maintenance
+import rollups
+from queries import dashboard_queries
+from query_cache import tables_in
+
+VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    Version INT PRIMARY KEY,
+    Description VARCHAR(255),
+    Applied_At DATETIME
+)
+"""
+
+# ---------------------------
+# DDL
+# ---------------------------
+BASE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS providers (
+        Provider_ID INT PRIMARY KEY AUTO_INCREMENT,
+        Name VARCHAR(255),
+        Type VARCHAR(100),
+        Address TEXT,
+        City VARCHAR(100),
+        Contact VARCHAR(50)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS receivers (
+        Receiver_ID INT PRIMARY KEY AUTO_INCREMENT,
+        Name VARCHAR(255),
+        Type VARCHAR(100),
+        City VARCHAR(100),
+        Contact VARCHAR(50)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS food_listings (
+        Food_ID INT PRIMARY KEY AUTO_INCREMENT,
+        Food_Name VARCHAR(255),
+        Quantity INT,
+        Expiry_Date DATE,
+        Provider_ID INT,
+        Provider_Type VARCHAR(100),
+        Location VARCHAR(255),
+        Food_Type VARCHAR(100),
+        Meal_Type VARCHAR(100),
+        FOREIGN KEY (Provider_ID) REFERENCES providers(Provider_ID)
+            ON UPDATE CASCADE ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS claims (
+        Claim_ID INT PRIMARY KEY AUTO_INCREMENT,
+        Food_ID INT,
+        Receiver_ID INT,
+        Status VARCHAR(50),
+        Timestamp DATETIME,
+        FOREIGN KEY (Food_ID) REFERENCES food_listings(Food_ID)
+            ON UPDATE CASCADE ON DELETE CASCADE,
+        FOREIGN KEY (Receiver_ID) REFERENCES receivers(Receiver_ID)
+            ON UPDATE CASCADE ON DELETE SET NULL
+    )
+    """,
+]
+
+
+def create_index(name, table, columns):
+    """Migration step that creates an index unless one with that name already exists."""
+    ddl = f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"
+
+    def step(conn):
+        if name not in {ix["name"] for ix in inspect(conn).get_indexes(table)}:
+            conn.execute(text(ddl))
+    step.ddl = ddl
+    return step
+
+
+def add_column(table, column, definition):
+    """Migration step that adds a column unless the table already has it."""
+    ddl = f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+
+    def step(conn):
+        if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(ddl))
+    step.ddl = ddl
+    return step
+
+
+def outside_transaction(step):
+    """Mark a step that takes the engine and commits its own work, e.g. because it issues
+    DDL between data changes (MySQL commits implicitly on DDL); it must be safe to rerun."""
+    step.outside_transaction = True
+    return step
+
+
+# Each index is matched to the queries in queries.py / the app that filter,
+# join or group on its leading column(s); trailing columns make them covering.
+DASHBOARD_INDEXES = [
+    # near-expiry card + "Food Near Expiry" range scan
+    create_index("idx_food_expiry", "food_listings", ["Expiry_Date", "Quantity"]),
+    # provider joins with SUM/AVG(Quantity) and the per-provider donation counts
+    create_index("idx_food_provider_qty", "food_listings", ["Provider_ID", "Quantity"]),
+    # sidebar DISTINCT Food_Type / Meal_Type, GROUP BY Food_Type, preview IN (...) filters
+    create_index("idx_food_type_meal", "food_listings", ["Food_Type", "Meal_Type"]),
+    create_index("idx_food_meal", "food_listings", ["Meal_Type"]),
+    # GROUP BY Food_Name and prefix lookups on the name
+    create_index("idx_food_name", "food_listings", ["Food_Name"]),
+    # claims -> food_listings joins, pending/completed filters
+    create_index("idx_claims_food_status", "claims", ["Food_ID", "Status"]),
+    create_index("idx_claims_receiver_food", "claims", ["Receiver_ID", "Food_ID"]),
+    create_index("idx_claims_status_ts", "claims", ["Status", "Timestamp"]),
+    # City GROUP BY / filters and name lookups
+    create_index("idx_providers_city", "providers", ["City"]),
+    create_index("idx_providers_name", "providers", ["Name"]),
+    create_index("idx_providers_type", "providers", ["Type"]),
+    create_index("idx_receivers_city", "receivers", ["City"]),
+    create_index("idx_receivers_name", "receivers", ["Name"]),
+]
+
+# (version, description, steps); a step is a SQL string or a callable(conn)
+MIGRATIONS = [
+    (1, "base tables", BASE_TABLES),
+    (2, "dashboard indexes", DASHBOARD_INDEXES),
+    (3, "trend analysis rollups", [rollups.install]),
+    # Reserved: quantity held by Pending/Completed claims (see claim_service.py);
+    # claims from before this migration carry no quantity and reserve nothing
+    (4, "claim quantity reservation", [
+        add_column("food_listings", "Reserved", "INT NOT NULL DEFAULT 0"),
+        add_column("claims", "Claim_Quantity", "INT"),
+    ]),
+    # month-partitioned history for expired listings, swept by maintenance.py
+    (5, "expired listing archive", [archive.install, maintenance.install]),
+    # time-window Trend Analysis: range scans on live claims, month-pruned history,
+    # and daily claim counts for the claims-over-time chart
+    (6, "claims time windows", [
+        create_index("idx_claims_ts", "claims", ["Timestamp"]),
+        outside_transaction(archive.rekey_claims_archive),
+        create_index("idx_claims_archive_ts", "claims_archive", ["Archive_Month", "Timestamp"]),
+        create_index("idx_food_archive_food", "food_listings_archive", ["Food_ID"]),
+        history.install,
+    ]),
+    # change_log outbox filled by triggers; readers fetch the changes since a seq (changefeed.py)
+    (7, "change feed", [
+        changefeed.CHANGE_LOG_SQL,
+        create_index("idx_change_log_at", "change_log", ["Changed_At"]),
+        changefeed.install_triggers,
+    ]),
+    # Contact Directory city filter, paged in Name order (idx_providers_name serves all cities)
+    (8, "contact directory", [
+        create_index("idx_providers_city_name", "providers", ["City", "Name"]),
+    ]),
+    # city dimension: integer City_ID on every located row (kept by triggers, see geo.py)
+    # for the sidebar filter, the near-expiry card and radius lookups
+    (9, "city dimension", [
+        geo.CITIES_SQL,
+        add_column("providers", "City_ID", "INT"),
+        add_column("receivers", "City_ID", "INT"),
+        add_column("food_listings", "City_ID", "INT"),
+        geo.backfill,
+        # also serves the Contact Directory's one-city pages in Name order
+        create_index("idx_providers_city_id_name", "providers", ["City_ID", "Name"]),
+        create_index("idx_receivers_city_id", "receivers", ["City_ID"]),
+        create_index("idx_food_city_expiry", "food_listings", ["City_ID", "Expiry_Date"]),
+        create_index("idx_cities_name", "cities", ["Name"]),
+        geo.install_triggers,
+        geo.apply_default_gazetteer,
+    ]),
+    # SQLite city triggers that also survive upserts (ingest.py re-runs)
+    (10, "city triggers for upserts", [geo.install_triggers]),
+    # per-month archive totals were never read back; windowed Trend queries read the archive itself
+    (11, "drop archive summary", ["DROP TABLE IF EXISTS archive_summary"]),
+    # listing update trigger skips the claims re-attribution when only Reserved changed
+    (12, "rollup trigger guard", [rollups.install_triggers]),
+]
+
+
+# ---------------------------
+# APPLY
+# ---------------------------
+def current_version(conn):
+    conn.execute(text(VERSION_TABLE_SQL))
+    return conn.execute(text("SELECT COALESCE(MAX(Version), 0) FROM schema_migrations")).scalar()
+
+
+def _apply(conn, steps):
+    for step in steps:
+        if callable(step):
+            step(conn)
+        else:
+            conn.execute(text(backend.ddl(step, conn.dialect.name)))
+
+
+def upgrade(engine=None, target=None):
+    """Apply pending migrations in order and return the applied versions.
+
+    Each migration is one transaction, except that steps marked outside_transaction
+    run (and commit) on their own, splitting the ones around them into separate transactions.
+    """
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        version = current_version(conn)
+    applied = []
+    for ver, desc, steps in MIGRATIONS:
+        if ver <= version or (target is not None and ver > target):
+            continue
+        batch = []
+        for step in steps:
+            if getattr(step, "outside_transaction", False):
+                if batch:
+                    with engine.begin() as conn:
+                        _apply(conn, batch)
+                    batch = []
+                step(engine)
+            else:
+                batch.append(step)
+        with engine.begin() as conn:
+            _apply(conn, batch)
+            conn.execute(
+                text("INSERT INTO schema_migrations (Version, Description, Applied_At) VALUES (:v, :d, :ts)"),
+                {"v": ver, "d": desc, "ts": datetime.now()},
+            )
+        applied.append(ver)
+    if applied:
+        db.cache.clear()
+    return applied
+
+
+_ensured = False
+
+
+def ensure_schema(engine=None):
+    """Run upgrade() once per process; later calls are free."""
+    global _ensured
+    if not _ensured:
+        upgrade(engine)
+        _ensured = True
+
+
+# ---------------------------
+# EXPLAIN CHECK
+# ---------------------------
+_BOUNDED_RE = re.compile(r"\bLIMIT\s+\d+\s*$", re.IGNORECASE)
+
+
+def _is_bounded(stmt):
+    # a plain "... LIMIT n" with no sort/grouping stops after n rows, so its scan is cheap
+    upper = stmt.upper()
+    return bool(_BOUNDED_RE.search(stmt)) and "ORDER BY" not in upper and "GROUP BY" not in upper
+
+
+# dialects whose plans full_scans() can read; `check` skips the others
+EXPLAIN_DIALECTS = ("mysql", "sqlite")
+
+# Reads that cover every row on purpose, so a whole-table or whole-index scan is
+# their plan rather than a missing index:
+#   - aggregates (GROUP BY / COUNT / SUM ...) walking a covering index, which
+#     is already the cheapest way to read every row;
+#   - reads of the rollup tables, which hold one row per group already;
+#   - the reads named here, with the reason.
+_AGGREGATE_RE = re.compile(r"\bGROUP\s+BY\b|\b(COUNT|SUM|AVG|MIN|MAX)\s*\(", re.IGNORECASE)
+WHOLE_TABLE_READS = {
+    # the sidebar lists every city that has a provider, in Name order from idx_cities_name
+    "lookup:cities",
+}
+
+
+def _whole_table_read(name, stmt, kind):
+    if name in WHOLE_TABLE_READS or tables_in(stmt) & set(rollups.ROLLUP_TABLES):
+        return True
+    return kind == "index" and bool(_AGGREGATE_RE.search(stmt))
+
+
+def _sqlite_scan(detail, derived):
+    """(table, kind) when an EXPLAIN QUERY PLAN line reads a whole table or index, else None."""
+    words = detail.split()
+    if words[0] in ("MATERIALIZE", "CO-ROUTINE") and len(words) > 1:
+        derived.add(words[1])
+        return None
+    if words[0] != "SCAN" or len(words) < 2:
+        return None
+    table = words[1]
+    # constant rows and subquery / CTE results are temporary, not stored tables
+    if table in ("CONSTANT", "SUBQUERY") or table.startswith("(") or table in derived:
+        return None
+    # SEARCH lines use an index range or lookup; SCAN ... USING [COVERING] INDEX still reads every entry
+    return table, "index" if "INDEX" in detail else "table"
+
+
+def full_scans(engine=None, queries=None):
+    """Return [(query_name, table, kind)] for every dashboard query whose plan reads a whole
+    table (kind "table") or a whole index (kind "index") rather than a range or lookup,
+    leaving out the deliberate whole-table reads (see _whole_table_read).
+    Dialects outside EXPLAIN_DIALECTS are not checked and return []."""
+    engine = engine or db.engine
+    queries = queries or dashboard_queries(rollups.trend_queries(engine))
+    dialect = engine.dialect.name
+    found = []
+    if dialect not in EXPLAIN_DIALECTS:
+        return found
+    with engine.connect() as conn:
+        for name, sql in queries.items():
+            stmt = sql.strip().rstrip(";")
+            if _is_bounded(stmt):
+                continue
+            params = backend.bind(stmt) or {}
+            scans = []
+            if dialect == "mysql":
+                for row in conn.execute(text("EXPLAIN " + stmt), params).mappings():
+                    table = row.get("table") or ""
+                    # <derivedN>/<subqueryN> are temporary results, not stored tables;
+                    # type "index" walks a whole index, "ALL" the whole table
+                    if row.get("type") in ("ALL", "index") and not table.startswith("<"):
+                        scans.append((table, "table" if row["type"] == "ALL" else "index"))
+            else:
+                derived = set()
+                for row in conn.execute(text("EXPLAIN QUERY PLAN " + stmt), params):
+                    scan = _sqlite_scan(row[-1], derived)
+                    if scan:
+                        scans.append(scan)
+            found.extend((name, table, kind) for table, kind in scans
+                         if not _whole_table_read(name, stmt, kind))
+    return found
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schema migrations for the food management DB.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upgrade", help="apply pending migrations")
+    up.add_argument("--target", type=int, default=None)
+    sub.add_parser("status", help="show applied and pending versions")
+    sub.add_parser("check", help="fail if any dashboard query scans a whole table or index")
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        applied = upgrade(target=args.target)
+        print(f"Applied: {applied}" if applied else "Schema is up to date.")
+    elif args.command == "status":
+        with db.engine.begin() as conn:
+            version = current_version(conn)
+        for ver, desc, _ in MIGRATIONS:
+            print(f"{'applied' if ver <= version else 'pending'}  {ver:>3}  {desc}")
+    elif args.command == "check":
+        if db.engine.dialect.name not in EXPLAIN_DIALECTS:
+            print(f"EXPLAIN check skipped: plans are only read for {', '.join(EXPLAIN_DIALECTS)}, "
+                  f"not {db.engine.dialect.name}.")
+            return 0
+        scans = full_scans()
+        for name, table, kind in scans:
+            print(f"FULL {kind.upper():<5}  {table:<15} {name}")
+        if scans:
+            return 1
+        print("No full table or index scans in dashboard queries.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
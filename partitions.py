@@ -0,0 +1,82 @@
+# partitions.py
+# Month range partitions for history tables keyed by an INT YYYYMM column.
+# On MySQL a table is split with PARTITION BY RANGE into one partition per
+# month plus a catch-all pmax; ensure_months() carves new months out of pmax
+# before rows for them are written, so pmax stays empty and the split is a
+# metadata-only change. Other backends keep the month as the leading key column,
+# which gives the same month pruning through the primary key index.
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+MAX_PARTITION = "pmax"
+_PARTITION_RE = re.compile(r"^p(\d{6})$")
+
+
+def month_key(d):
+    """YYYYMM int for a date, datetime or ISO string."""
+    if isinstance(d, str):
+        d = date.fromisoformat(d[:10])
+    return d.year * 100 + d.month
+
+
+def next_month(key):
+    year, month = divmod(key, 100)
+    return key + 1 if month < 12 else (year + 1) * 100 + 1
+
+
+def month_range(first, last):
+    """Every YYYYMM key from first to last inclusive."""
+    out, key = [], first
+    while key <= last:
+        out.append(key)
+        key = next_month(key)
+    return out
+
+
+def partition_by_month(table, column="Archive_Month"):
+    """Migration step: range-partition table on column (MySQL only; a no-op elsewhere)."""
+    ddl = (f"ALTER TABLE {table} PARTITION BY RANGE ({column}) "
+           f"(PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)")
+
+    def step(conn):
+        if conn.dialect.name == "mysql" and not partitioned_months(conn, table):
+            conn.execute(text(ddl))
+    step.ddl = ddl
+    return step
+
+
+def partitioned_months(conn, table):
+    """YYYYMM keys with their own partition ([0] if only pmax exists), [] if table is not partitioned."""
+    if conn.dialect.name != "mysql":
+        return []
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t AND PARTITION_NAME IS NOT NULL"
+    ), {"t": table}).scalars()
+    names = list(rows)
+    if not names:
+        return []
+    return sorted(int(m.group(1)) for m in map(_PARTITION_RE.match, names) if m) or [0]
+
+
+def ensure_months(conn, table, months):
+    """Give every YYYYMM in months its own partition of table (MySQL; no-op elsewhere).
+
+    DDL commits implicitly on MySQL, so call this on its own connection, outside
+    the transaction that writes the rows.
+    """
+    existing = partitioned_months(conn, table)
+    if not existing:
+        return []
+    # only months past the newest partition can come out of pmax; an older month
+    # without its own partition lands in the next partition up, which is still correct
+    missing = sorted(m for m in set(months) if m > max(existing))
+    if not missing:
+        return []
+    parts = ", ".join(f"PARTITION p{m} VALUES LESS THAN ({next_month(m)})" for m in missing)
+    conn.execute(text(
+        f"ALTER TABLE {table} REORGANIZE PARTITION {MAX_PARTITION} INTO "
+        f"({parts}, PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)"))
+    return missing
@@ -0,0 +1,172 @@
+# profiler.py
+# In-process instrumentation. SQLAlchemy cursor hooks time every statement,
+# db.read_df / db.write add rows and bytes per named query, and the app marks
+# section boundaries. Events land in a bounded ring buffer (oldest dropped
+# first), summarised as p50/p95 in the admin panel or exported as JSON lines.
+#   FOOD_APP_ADMIN=1 streamlit run foods_management_app.py   shows the panel
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import event
+
+from query_cache import tables_in
+
+RING_SIZE = 5000
+ADMIN_ENV = "FOOD_APP_ADMIN"
+STATEMENT_CHARS = 200     # statement text kept per "sql" event
+
+_events = deque(maxlen=RING_SIZE)   # append/iterate are thread-safe on a deque
+_local = threading.local()
+_names = {}                         # normalised SQL -> registered query name
+
+
+def admin_enabled():
+    return os.environ.get(ADMIN_ENV, "") not in ("", "0")
+
+
+# ---------------------------
+# RECORDING
+# ---------------------------
+def record(kind, name, ms, **fields):
+    _events.append({"ts": round(time.time(), 3), "kind": kind, "name": name,
+                    "ms": round(ms, 3), "thread": threading.current_thread().name, **fields})
+
+
+def events(kind=None):
+    return [e for e in list(_events) if kind is None or e["kind"] == kind]
+
+
+def reset():
+    _events.clear()
+
+
+def register_names(named_sqls):
+    """Label known statements ({name: sql}) so unnamed reads of them report under that name."""
+    for name, sql in named_sqls.items():
+        _names[" ".join(sql.split())] = name
+
+
+def query_name(sql):
+    """Registered name for sql, else '<VERB> <tables> #<hash>' so repeated statements group together."""
+    norm = " ".join(sql.split())
+    if norm in _names:
+        return _names[norm]
+    verb = norm.split(" ", 1)[0].upper() if norm else "SQL"
+    digest = hashlib.sha1(norm.encode("utf-8")).hexdigest()[:6]
+    return f"{verb} {','.join(sorted(tables_in(sql)))} #{digest}"
+
+
+@contextmanager
+def named(name):
+    # statements executed inside the block are attributed to name (per thread)
+    stack = _local.__dict__.setdefault("names", [])
+    stack.append(name)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def current_name():
+    stack = getattr(_local, "names", None)
+    return stack[-1] if stack else None
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=False, deep=True).sum()) if len(df.columns) else 0
+
+
+# ---------------------------
+# SQLALCHEMY HOOKS
+# ---------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_profile_t0", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    ms = (time.perf_counter() - conn.info["_profile_t0"].pop()) * 1000
+    # DBAPI rowcount: affected rows for writes, -1 or a driver-specific count for SELECTs
+    rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    record("sql", current_name() or query_name(statement), ms, rows=rows,
+           executemany=executemany, statement=" ".join(statement.split())[:STATEMENT_CHARS])
+
+
+def _handle_error(ctx):
+    starts = ctx.connection.info.get("_profile_t0") if ctx.connection is not None else None
+    if starts:
+        ms = (time.perf_counter() - starts.pop()) * 1000
+        statement = ctx.statement or ""
+        record("sql", current_name() or query_name(statement), ms, status="error",
+               error=str(ctx.original_exception)[:STATEMENT_CHARS],
+               statement=" ".join(statement.split())[:STATEMENT_CHARS])
+
+
+def install(engine):
+    """Attach the cursor hooks to engine (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+# ---------------------------
+# SECTIONS
+# ---------------------------
+class SectionTimer:
+    """Times consecutive page sections: start("Charts") closes the previous section."""
+
+    def __init__(self):
+        self.current = None
+        self._t0 = 0.0
+
+    def start(self, name):
+        self.stop()
+        self.current = name
+        self._t0 = time.perf_counter()
+
+    def stop(self):
+        if self.current is not None:
+            record("section", self.current, (time.perf_counter() - self._t0) * 1000)
+            self.current = None
+
+
+# ---------------------------
+# REPORTING
+# ---------------------------
+def summary(kind="query"):
+    """Per-name count, p50/p95/max latency (ms), mean rows and bytes for one event kind."""
+    df = pd.DataFrame(events(kind))
+    if df.empty:
+        return df
+    for col, default in (("rows", 0), ("bytes", 0), ("status", "ok"), ("cached", False)):
+        df[col] = df[col].fillna(default) if col in df else default
+    grouped = df.groupby("name")
+    out = pd.DataFrame({
+        "count": grouped.size(),
+        "p50_ms": grouped["ms"].quantile(0.5),
+        "p95_ms": grouped["ms"].quantile(0.95),
+        "max_ms": grouped["ms"].max(),
+        "avg_rows": grouped["rows"].mean(),
+        "avg_bytes": grouped["bytes"].mean(),
+        "cache_hit": grouped["cached"].mean(),
+        "errors": grouped["status"].apply(lambda s: int((s != "ok").sum())),
+    })
+    if kind == "section":
+        out = out[["count", "p50_ms", "p95_ms", "max_ms"]]
+    return out.sort_values("p95_ms", ascending=False).round(1).reset_index()
+
+
+def to_jsonl(kind=None):
+    return "".join(json.dumps(e, default=str) + "\n" for e in events(kind))
+
+
+def dump_jsonl(path, kind=None):
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(to_jsonl(kind))
@@ -0,0 +1,338 @@
+# queries.py
+# SQL shown on the dashboard, kept in one place so the app, the migration
+# EXPLAIN check and offline tools all run exactly the same statements.
+# Statements are dialect-neutral (MySQL, SQLite, DuckDB): COALESCE rather
+# than IFNULL, and :today / :near_expiry_until are filled in by backend.bind.
+
+# ---------------------------
+# SIDEBAR LOOKUPS & OVERVIEW CARDS
+# ---------------------------
+LOOKUP_SQL = {
+    # cities that have a provider (the preview filters on p.City_ID); geo.py keeps the IDs
+    "cities": "SELECT c.City_ID, c.Name AS City FROM cities c "
+              "WHERE EXISTS (SELECT 1 FROM providers p WHERE p.City_ID = c.City_ID) ORDER BY c.Name;",
+    "providers": "SELECT DISTINCT Name FROM providers WHERE Name IS NOT NULL;",
+    "food_types": "SELECT DISTINCT Food_Type FROM food_listings WHERE Food_Type IS NOT NULL;",
+    "meal_types": "SELECT DISTINCT Meal_Type FROM food_listings WHERE Meal_Type IS NOT NULL;",
+}
+
+OVERVIEW_TOTALS_SQL = """
+    SELECT 
+      (SELECT COALESCE(COUNT(*),0) FROM providers) AS providers_count,
+      (SELECT COALESCE(COUNT(*),0) FROM receivers) AS receivers_count,
+      (SELECT COALESCE(SUM(Quantity),0) FROM food_listings) AS total_quantity
+"""
+
+# Wastage Risk card: loads the in-memory expiry index (expiry_index.py), which
+# then answers "most urgent" lookups without another read
+EXPIRY_INDEX_SQL = """
+    SELECT Food_ID, Food_Name, Location, City_ID, Food_Type, Meal_Type,
+           Quantity - Reserved AS Available, Expiry_Date
+    FROM food_listings
+    WHERE Expiry_Date BETWEEN :today AND :horizon AND Quantity > Reserved
+"""
+
+CONTACTS_CARD_SQL = "SELECT Name, City, Contact FROM providers LIMIT 5;"
+
+# Contact Directory: paged by (Name, Provider_ID) with components.sorted_pager; " AND City_ID = :city_id" narrows it
+DIRECTORY_SQL = "SELECT Provider_ID, Name, City, Contact, Address FROM providers WHERE 1=1"
+
+# ---------------------------
+# MATCHING (matching.py, loaded on demand rather than on every rerun)
+# ---------------------------
+MATCH_LISTINGS_SQL = """
+    SELECT Food_ID, Food_Name, Location, Food_Type, Meal_Type,
+           Quantity - Reserved AS Available, Expiry_Date
+    FROM food_listings
+    WHERE Expiry_Date >= :today AND Quantity > Reserved
+"""
+
+MATCH_RECEIVERS_SQL = "SELECT Receiver_ID, Name, Type, City FROM receivers WHERE City IS NOT NULL"
+
+# each receiver's claim history by food / meal type: the "compatibility" the scores use
+MATCH_HISTORY_SQL = """
+    SELECT c.Receiver_ID, f.Food_Type, f.Meal_Type, COUNT(*) AS Claims,
+           SUM(c.Claim_Quantity) AS Claimed_Quantity, COUNT(c.Claim_Quantity) AS Sized_Claims
+    FROM claims c
+    JOIN food_listings f ON c.Food_ID = f.Food_ID
+    WHERE c.Status IN ('Pending', 'Completed')
+    GROUP BY c.Receiver_ID, f.Food_Type, f.Meal_Type
+"""
+
+# "Latest Records" grid: newest rows by primary key
+LATEST_SQL = {
+    "Providers": "SELECT * FROM providers ORDER BY Provider_ID DESC LIMIT 10;",
+    "Receivers": "SELECT * FROM receivers ORDER BY Receiver_ID DESC LIMIT 10;",
+    "Food Listings": "SELECT * FROM food_listings ORDER BY Food_ID DESC LIMIT 10;",
+    "Claims": "SELECT * FROM claims ORDER BY Claim_ID DESC LIMIT 10;",
+}
+
+# CRUD "Read" views: filters are appended as " AND ..." and the pager adds keyset + LIMIT
+READ_SQL = {
+    "providers": "SELECT * FROM providers WHERE 1=1",
+    "receivers": "SELECT * FROM receivers WHERE 1=1",
+    "food_listings": """
+            SELECT f.Food_ID, f.Food_Name, f.Food_Type, f.Meal_Type, f.Quantity,
+               f.Quantity - f.Reserved AS Available,
+               f.Expiry_Date, f.Provider_ID, p.Name AS Provider_Name, f.Location
+            FROM food_listings f
+            LEFT JOIN providers p ON f.Provider_ID = p.Provider_ID
+            WHERE 1=1
+            """,
+    "claims": """
+            SELECT c.Claim_ID, f.Food_Name, r.Name AS Receiver_Name, c.Claim_Quantity, c.Status, c.Timestamp
+            FROM claims c
+            LEFT JOIN food_listings f ON c.Food_ID = f.Food_ID
+            LEFT JOIN receivers r ON c.Receiver_ID = r.Receiver_ID
+            WHERE 1=1
+        """,
+}
+
+# ---------------------------
+# TREND ANALYSIS (Tabs)
+# ---------------------------
+queries_grouped = {
+    "Provider & Receiver Insights": {
+        "Providers by City": "SELECT City, COUNT(*) AS Total_Providers FROM providers GROUP BY City ORDER BY Total_Providers DESC;",
+        "Receivers by City": "SELECT City, COUNT(*) AS Total_Receivers FROM receivers GROUP BY City ORDER BY Total_Receivers DESC;",
+        "Most Active Food Providers": """
+            SELECT p.Name AS Provider_Name, COUNT(f.Food_ID) AS Total_Donations
+            FROM food_listings f
+            JOIN providers p ON f.Provider_ID = p.Provider_ID
+            GROUP BY p.Provider_ID, p.Name
+            ORDER BY Total_Donations DESC
+            LIMIT 10;
+        """,
+        "Total Food Quantity Donated per Provider": """
+            SELECT p.Name AS Provider_Name, SUM(f.Quantity) AS Total_Quantity
+            FROM food_listings f
+            JOIN providers p ON f.Provider_ID = p.Provider_ID
+            GROUP BY p.Provider_ID, p.Name
+            ORDER BY Total_Quantity DESC;
+        """
+    },
+    "Donation & Claim Trends": {
+        "Top Provider Types by Donation Volume": """
+            SELECT p.Type AS Provider_Type, SUM(f.Quantity) AS Total_Quantity_Donated
+            FROM food_listings f
+            JOIN providers p ON f.Provider_ID = p.Provider_ID
+            GROUP BY p.Type
+            ORDER BY Total_Quantity_Donated DESC;
+        """,
+        "Top Food Items by Number of Claims": """
+            SELECT f.Food_Name, COUNT(c.Claim_ID) AS Claim_Count
+            FROM claims c
+            JOIN food_listings f ON c.Food_ID = f.Food_ID
+            GROUP BY f.Food_Name
+            ORDER BY Claim_Count DESC
+            LIMIT 10;
+        """,
+        "Average Quantity Donated per Provider Type": """
+            SELECT p.Type AS Provider_Type, ROUND(AVG(f.Quantity), 2) AS Avg_Quantity
+            FROM food_listings f
+            JOIN providers p ON f.Provider_ID = p.Provider_ID
+            GROUP BY p.Type;
+        """,
+        "Average Quantity Claimed per Receiver": """
+            SELECT r.Name AS Receiver_Name, ROUND(AVG(f.Quantity), 2) AS Avg_Quantity_Claimed
+            FROM claims c
+            JOIN food_listings f ON c.Food_ID = f.Food_ID
+            JOIN receivers r ON c.Receiver_ID = r.Receiver_ID
+            GROUP BY r.Receiver_ID, r.Name
+            ORDER BY Avg_Quantity_Claimed DESC;
+        """
+    },
+    "Wastage & Efficiency": {
+        "Most Common Donated Food Types": """
+            SELECT f.Food_Type, COUNT(f.Food_ID) AS Total_Listings
+            FROM food_listings f
+            GROUP BY f.Food_Type
+            ORDER BY Total_Listings DESC;
+        """,
+        "Most Claimed Meal Types": """
+            SELECT f.Meal_Type, COUNT(c.Claim_ID) AS Total_Claims
+            FROM claims c
+            JOIN food_listings f ON c.Food_ID = f.Food_ID
+            GROUP BY f.Meal_Type
+            ORDER BY Total_Claims DESC;
+        """,
+        "Food Near Expiry (Wastage Risk)": """
+            SELECT Food_ID, Food_Name, Expiry_Date, Quantity
+            FROM food_listings
+            WHERE Expiry_Date BETWEEN :today AND :near_expiry_until
+            ORDER BY Expiry_Date ASC;
+        """,
+        "Donation vs Claim Comparison": """
+            SELECT 
+                (SELECT COALESCE(SUM(Quantity),0) FROM food_listings) AS Total_Donated,
+                (SELECT COALESCE(SUM(f.Quantity),0) FROM claims c JOIN food_listings f ON c.Food_ID = f.Food_ID) AS Total_Claimed;
+        """
+    }
+}
+
+
+# Same tabs and titles, read from the trigger-maintained tables in rollups.py.
+# NULL group keys are stored as '' there, hence the NULLIFs.
+rollup_queries_grouped = {
+    "Provider & Receiver Insights": {
+        "Providers by City": """
+            SELECT NULLIF(City, '') AS City, Providers AS Total_Providers
+            FROM rollup_city WHERE Providers > 0
+            ORDER BY Total_Providers DESC;
+        """,
+        "Receivers by City": """
+            SELECT NULLIF(City, '') AS City, Receivers AS Total_Receivers
+            FROM rollup_city WHERE Receivers > 0
+            ORDER BY Total_Receivers DESC;
+        """,
+        "Most Active Food Providers": """
+            SELECT p.Name AS Provider_Name, a.Listings AS Total_Donations
+            FROM rollup_provider a
+            JOIN providers p ON a.Provider_ID = p.Provider_ID
+            WHERE a.Listings > 0
+            ORDER BY Total_Donations DESC
+            LIMIT 10;
+        """,
+        "Total Food Quantity Donated per Provider": """
+            SELECT p.Name AS Provider_Name, a.Quantity AS Total_Quantity
+            FROM rollup_provider a
+            JOIN providers p ON a.Provider_ID = p.Provider_ID
+            WHERE a.Listings > 0
+            ORDER BY Total_Quantity DESC;
+        """
+    },
+    "Donation & Claim Trends": {
+        "Top Provider Types by Donation Volume": """
+            SELECT p.Type AS Provider_Type, SUM(a.Quantity) AS Total_Quantity_Donated
+            FROM rollup_provider a
+            JOIN providers p ON a.Provider_ID = p.Provider_ID
+            WHERE a.Listings > 0
+            GROUP BY p.Type
+            ORDER BY Total_Quantity_Donated DESC;
+        """,
+        "Top Food Items by Number of Claims": """
+            SELECT NULLIF(Food_Name, '') AS Food_Name, Claims AS Claim_Count
+            FROM rollup_food_name WHERE Claims > 0
+            ORDER BY Claim_Count DESC
+            LIMIT 10;
+        """,
+        "Average Quantity Donated per Provider Type": """
+            SELECT p.Type AS Provider_Type, ROUND(SUM(a.Quantity) / SUM(a.Listings), 2) AS Avg_Quantity
+            FROM rollup_provider a
+            JOIN providers p ON a.Provider_ID = p.Provider_ID
+            WHERE a.Listings > 0
+            GROUP BY p.Type;
+        """,
+        "Average Quantity Claimed per Receiver": """
+            SELECT r.Name AS Receiver_Name, ROUND(a.Claimed_Quantity / a.Claims, 2) AS Avg_Quantity_Claimed
+            FROM rollup_receiver a
+            JOIN receivers r ON a.Receiver_ID = r.Receiver_ID
+            WHERE a.Claims > 0
+            ORDER BY Avg_Quantity_Claimed DESC;
+        """
+    },
+    "Wastage & Efficiency": {
+        "Most Common Donated Food Types": """
+            SELECT NULLIF(Food_Type, '') AS Food_Type, Listings AS Total_Listings
+            FROM rollup_food_type WHERE Listings > 0
+            ORDER BY Total_Listings DESC;
+        """,
+        "Most Claimed Meal Types": """
+            SELECT NULLIF(Meal_Type, '') AS Meal_Type, Claims AS Total_Claims
+            FROM rollup_meal_claims WHERE Claims > 0
+            ORDER BY Total_Claims DESC;
+        """,
+        # already an indexed range scan, nothing to roll up
+        "Food Near Expiry (Wastage Risk)": queries_grouped["Wastage & Efficiency"]["Food Near Expiry (Wastage Risk)"],
+        "Donation vs Claim Comparison": """
+            SELECT Donated AS Total_Donated, Claimed AS Total_Claimed
+            FROM rollup_totals WHERE Id = 1;
+        """
+    }
+}
+
+
+# ---------------------------
+# TIME WINDOWS (Trend Analysis "Time window" selector)
+# ---------------------------
+# Claims in the window, live and archived; the Archive_Month bound prunes
+# claims_archive partitions, the Timestamp bound uses idx_claims_ts on claims.
+CLAIMS_SINCE = """(
+        SELECT Claim_ID, Food_ID, Receiver_ID, Status, Timestamp FROM claims WHERE Timestamp >= :since
+        UNION ALL
+        SELECT Claim_ID, Food_ID, Receiver_ID, Status, Timestamp FROM claims_archive
+        WHERE Archive_Month >= :since_month AND Timestamp >= :since
+    )"""
+
+# an archived claim's listing is in food_listings_archive
+_CLAIM_LISTING_JOIN = """
+            LEFT JOIN food_listings f ON c.Food_ID = f.Food_ID
+            LEFT JOIN food_listings_archive fa ON c.Food_ID = fa.Food_ID"""
+
+# the claim-based Trend Analysis queries restricted to :since; listing and
+# provider queries have no time of their own and are shown unwindowed
+windowed_queries_grouped = {
+    "Donation & Claim Trends": {
+        "Top Food Items by Number of Claims": f"""
+            SELECT COALESCE(f.Food_Name, fa.Food_Name) AS Food_Name, COUNT(c.Claim_ID) AS Claim_Count
+            FROM {CLAIMS_SINCE} c{_CLAIM_LISTING_JOIN}
+            WHERE COALESCE(f.Food_ID, fa.Food_ID) IS NOT NULL
+            GROUP BY COALESCE(f.Food_Name, fa.Food_Name)
+            ORDER BY Claim_Count DESC
+            LIMIT 10;
+        """,
+        "Average Quantity Claimed per Receiver": f"""
+            SELECT r.Name AS Receiver_Name, ROUND(AVG(COALESCE(f.Quantity, fa.Quantity)), 2) AS Avg_Quantity_Claimed
+            FROM {CLAIMS_SINCE} c{_CLAIM_LISTING_JOIN}
+            JOIN receivers r ON c.Receiver_ID = r.Receiver_ID
+            WHERE COALESCE(f.Food_ID, fa.Food_ID) IS NOT NULL
+            GROUP BY r.Receiver_ID, r.Name
+            ORDER BY Avg_Quantity_Claimed DESC;
+        """
+    },
+    "Wastage & Efficiency": {
+        "Most Claimed Meal Types": f"""
+            SELECT COALESCE(f.Meal_Type, fa.Meal_Type) AS Meal_Type, COUNT(c.Claim_ID) AS Total_Claims
+            FROM {CLAIMS_SINCE} c{_CLAIM_LISTING_JOIN}
+            WHERE COALESCE(f.Food_ID, fa.Food_ID) IS NOT NULL
+            GROUP BY COALESCE(f.Meal_Type, fa.Meal_Type)
+            ORDER BY Total_Claims DESC;
+        """
+    }
+}
+
+# listings the unwindowed tabs leave out (moved to the archive by archive.py)
+ARCHIVED_COUNT_SQL = "SELECT COUNT(*) AS Archived FROM food_listings_archive"
+
+# claims-over-time chart: pre-aggregated days (history.py) before :live_from, counted
+# live from claims and claims_archive after it (today, plus any days the
+# refresh_claims_daily job has not reached; see history.live_from)
+DAILY_COVERED_SQL = "SELECT MAX(Day) AS Day FROM claims_daily"
+
+CLAIMS_DAILY_SQL = """
+    SELECT Day, Status, Claims FROM claims_daily WHERE Day >= :since AND Day < :live_from
+    UNION ALL
+    SELECT DATE(Timestamp) AS Day, COALESCE(Status, '') AS Status, COUNT(*) AS Claims
+    FROM claims WHERE Timestamp >= :live_from
+    GROUP BY DATE(Timestamp), COALESCE(Status, '')
+    UNION ALL
+    SELECT DATE(Timestamp) AS Day, COALESCE(Status, '') AS Status, COUNT(*) AS Claims
+    FROM claims_archive WHERE Archive_Month >= :live_month AND Timestamp >= :live_from
+    GROUP BY DATE(Timestamp), COALESCE(Status, '')
+    ORDER BY Day
+"""
+
+
+def dashboard_queries(trend=None):
+    """Every named read the dashboard issues on a plain rerun: {name: sql}.
+
+    trend is the Trend Analysis set the app runs on this backend
+    (rollups.trend_queries(engine)); the live GROUP BY joins by default.
+    """
+    named = {f"lookup:{k}": v for k, v in LOOKUP_SQL.items()}
+    named["card:overview_totals"] = OVERVIEW_TOTALS_SQL
+    named["card:expiry_index"] = EXPIRY_INDEX_SQL
+    named["card:contacts"] = CONTACTS_CARD_SQL
+    for qdict in (trend or queries_grouped).values():
+        named.update(qdict)
+    return named
@@ -0,0 +1,168 @@
+# query_cache.py
+# Process-wide result cache for read queries. Entries expire after a per-query
+# TTL and are dropped as soon as a write touches one of the tables they read.
+# An optional shared tier (shared_cache.py) sits behind it, so worker
+# processes serve each other's loads.
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------------------
+# SQL HELPERS
+# ---------------------------
+_TABLE_RE = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+`?(\w+)`?", re.IGNORECASE)
+
+# writes on the left also change rows of the tables on the right (FK cascades)
+CASCADES = {
+    "providers": {"food_listings"},
+    "food_listings": {"claims"},
+    "receivers": {"claims"},
+}
+
+
+def tables_in(sql):
+    """Return the lower-cased table names a statement reads or writes."""
+    return {t.lower() for t in _TABLE_RE.findall(sql)}
+
+
+def with_cascades(tables):
+    out = set(tables)
+    pending = list(tables)
+    while pending:
+        for dep in CASCADES.get(pending.pop(), ()):
+            if dep not in out:
+                out.add(dep)
+                pending.append(dep)
+    return out
+
+
+def make_key(sql, params=None):
+    norm = " ".join(sql.split())
+    items = sorted((params or {}).items())
+    return hashlib.sha1(f"{norm}|{items!r}".encode("utf-8")).hexdigest()
+
+
+# ---------------------------
+# CACHE
+# ---------------------------
+class QueryCache:
+    def __init__(self, max_entries=256, shared=None):
+        self.max_entries = max_entries
+        self.shared = shared            # shared_cache backend, or None
+        self._entries = OrderedDict()   # key -> (expires_at, tables, value)
+        self._generation = {}           # table -> bumped on every write
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.invalidations = 0
+        self._listeners = []
+
+    def get_or_load(self, sql, params, ttl, loader):
+        """Return the cached result for (sql, params) or call loader() and keep it for ttl seconds.
+
+        Cached values are shared between sessions, so callers must not mutate them in place.
+        """
+        key = make_key(sql, params)
+        tables = tables_in(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[2]
+            seen = {t: self._generation.get(t, 0) for t in tables}
+
+        shared_seen = None
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key, tables)
+                shared_seen = self.shared.generations(tables) if value is None else None
+            except Exception:       # an unreachable shared tier degrades to this process's cache
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._keep(key, tables, seen, ttl, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        value = loader()
+
+        if shared_seen is not None:
+            try:
+                # stored with the generations from before the load, so a write during it makes a miss
+                self.shared.put(key, shared_seen, value, ttl)
+            except Exception:
+                pass
+        with self._lock:
+            self._keep(key, tables, seen, ttl, value)
+        return value
+
+    def _keep(self, key, tables, seen, ttl, value):
+        # caller holds the lock; a write landed while we were loading: serve the value but do not keep it
+        if any(self._generation.get(t, 0) != g for t, g in seen.items()):
+            return
+        self._entries[key] = (time.monotonic() + ttl, tables, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_tables(self, tables, keys=None):
+        """Drop cached reads of tables (plus FK cascades) and tell subscribers.
+
+        keys optionally names the rows a write touched, {table: [primary keys]}, so in-memory
+        structures (see expiry_index.py) can patch those rows instead of reloading the table.
+        """
+        tables = with_cascades({t.lower() for t in tables})
+        if not tables:
+            return 0
+        with self._lock:
+            for t in tables:
+                self._generation[t] = self._generation.get(t, 0) + 1
+            stale = [k for k, (_, deps, _) in self._entries.items() if deps & tables]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+            listeners = list(self._listeners)
+        if self.shared is not None:
+            try:
+                self.shared.bump(tables)
+            except Exception:
+                pass
+        for fn in listeners:
+            fn(tables, keys or {})
+        return len(stale)
+
+    def subscribe(self, fn):
+        """Call fn(tables, keys) after every invalidation (i.e. every write in this process)."""
+        with self._lock:
+            if fn not in self._listeners:
+                self._listeners.append(fn)
+
+    def version(self, tables):
+        """Write generation of the given tables; changes whenever one of them is invalidated."""
+        with self._lock:
+            return tuple(sorted((t, self._generation.get(t, 0)) for t in tables))
+
+    def invalidate_sql(self, sql, keys=None):
+        return self.invalidate_tables(tables_in(sql), keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_hits": self.shared_hits,
+                "hit_ratio": round((self.hits + self.shared_hits) / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+            }
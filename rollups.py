@@ -0,0 +1,267 @@
+# rollups.py
+# Summary tables behind the Trend Analysis tabs. Each write to the base tables
+# (from execute_query, the ingestion CLI or anyone else) adjusts the affected
+# rollup rows by +/- deltas via MySQL triggers, so reading a tab is O(groups).
+#   python rollups.py rebuild     recompute every rollup from the base tables
+import argparse
+
+from sqlalchemy import inspect, text
+
+import db
+import query_cache
+from queries import queries_grouped, rollup_queries_grouped
+
+ROLLUP_TABLES = [
+    "rollup_provider", "rollup_city", "rollup_food_type", "rollup_listing_claims",
+    "rollup_food_name", "rollup_meal_claims", "rollup_receiver", "rollup_totals",
+]
+
+# writes to a base table change these rollups (used for cache invalidation)
+ROLLUP_SOURCES = {
+    "providers": {"rollup_city", "rollup_provider"},
+    "receivers": {"rollup_city", "rollup_receiver"},
+    "food_listings": {"rollup_provider", "rollup_food_type", "rollup_listing_claims",
+                      "rollup_food_name", "rollup_meal_claims", "rollup_receiver", "rollup_totals"},
+    "claims": {"rollup_listing_claims", "rollup_food_name", "rollup_meal_claims",
+               "rollup_receiver", "rollup_totals"},
+}
+for _src, _deps in ROLLUP_SOURCES.items():
+    query_cache.CASCADES.setdefault(_src, set()).update(_deps)
+
+# NULL group keys are stored as '' (primary keys cannot be NULL) and mapped back on read
+CREATE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS rollup_provider (
+        Provider_ID INT PRIMARY KEY,
+        Listings INT NOT NULL DEFAULT 0,
+        Quantity BIGINT NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollup_city (
+        City VARCHAR(100) PRIMARY KEY,
+        Providers INT NOT NULL DEFAULT 0,
+        Receivers INT NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollup_food_type (
+        Food_Type VARCHAR(100) PRIMARY KEY,
+        Listings INT NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollup_listing_claims (
+        Food_ID INT PRIMARY KEY,
+        Claims INT NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollup_food_name (
+        Food_Name VARCHAR(255) PRIMARY KEY,
+        Claims INT NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollup_meal_claims (
+        Meal_Type VARCHAR(100) PRIMARY KEY,
+        Claims INT NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollup_receiver (
+        Receiver_ID INT PRIMARY KEY,
+        Claims INT NOT NULL DEFAULT 0,
+        Claimed_Quantity BIGINT NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollup_totals (
+        Id INT PRIMARY KEY,
+        Donated BIGINT NOT NULL DEFAULT 0,
+        Claimed BIGINT NOT NULL DEFAULT 0
+    )""",
+]
+
+# ---------------------------
+# FULL REBUILD
+# ---------------------------
+REBUILD_SQL = [
+    """INSERT INTO rollup_provider (Provider_ID, Listings, Quantity)
+       SELECT Provider_ID, COUNT(*), COALESCE(SUM(Quantity), 0)
+       FROM food_listings WHERE Provider_ID IS NOT NULL GROUP BY Provider_ID""",
+    """INSERT INTO rollup_city (City, Providers, Receivers)
+       SELECT City, SUM(P), SUM(R) FROM (
+           SELECT COALESCE(City, '') AS City, 1 AS P, 0 AS R FROM providers
+           UNION ALL
+           SELECT COALESCE(City, '') AS City, 0 AS P, 1 AS R FROM receivers
+       ) u GROUP BY City""",
+    """INSERT INTO rollup_food_type (Food_Type, Listings)
+       SELECT COALESCE(Food_Type, ''), COUNT(*) FROM food_listings GROUP BY COALESCE(Food_Type, '')""",
+    """INSERT INTO rollup_listing_claims (Food_ID, Claims)
+       SELECT c.Food_ID, COUNT(*) FROM claims c JOIN food_listings f ON c.Food_ID = f.Food_ID
+       GROUP BY c.Food_ID""",
+    """INSERT INTO rollup_food_name (Food_Name, Claims)
+       SELECT COALESCE(f.Food_Name, ''), COUNT(*) FROM claims c JOIN food_listings f ON c.Food_ID = f.Food_ID
+       GROUP BY COALESCE(f.Food_Name, '')""",
+    """INSERT INTO rollup_meal_claims (Meal_Type, Claims)
+       SELECT COALESCE(f.Meal_Type, ''), COUNT(*) FROM claims c JOIN food_listings f ON c.Food_ID = f.Food_ID
+       GROUP BY COALESCE(f.Meal_Type, '')""",
+    """INSERT INTO rollup_receiver (Receiver_ID, Claims, Claimed_Quantity)
+       SELECT c.Receiver_ID, COUNT(*), COALESCE(SUM(f.Quantity), 0)
+       FROM claims c JOIN food_listings f ON c.Food_ID = f.Food_ID
+       WHERE c.Receiver_ID IS NOT NULL GROUP BY c.Receiver_ID""",
+    """INSERT INTO rollup_totals (Id, Donated, Claimed) VALUES (1,
+       (SELECT COALESCE(SUM(Quantity), 0) FROM food_listings),
+       (SELECT COALESCE(SUM(f.Quantity), 0) FROM claims c JOIN food_listings f ON c.Food_ID = f.Food_ID))""",
+]
+
+
+def rebuild(conn):
+    """Recompute every rollup inside the caller's transaction."""
+    for table in ROLLUP_TABLES:
+        conn.execute(text(f"DELETE FROM {table}"))
+    for sql in REBUILD_SQL:
+        conn.execute(text(sql))
+
+
+# ---------------------------
+# TRIGGERS (MySQL)
+# ---------------------------
+def _upsert(table, key_col, key_expr, deltas):
+    cols = ", ".join([key_col, *deltas])
+    vals = ", ".join([key_expr, *deltas.values()])
+    upd = ", ".join(f"{c} = {c} + VALUES({c})" for c in deltas)
+    return f"INSERT INTO {table} ({cols}) VALUES ({vals}) ON DUPLICATE KEY UPDATE {upd};"
+
+
+def _listing_delta(r, s):
+    # the listing's own contribution: per provider, per food type, total donated
+    return [
+        f"IF {r}.Provider_ID IS NOT NULL THEN",
+        _upsert("rollup_provider", "Provider_ID", f"{r}.Provider_ID",
+                {"Listings": f"{s}1", "Quantity": f"{s}COALESCE({r}.Quantity, 0)"}),
+        "END IF;",
+        _upsert("rollup_food_type", "Food_Type", f"COALESCE({r}.Food_Type, '')", {"Listings": f"{s}1"}),
+        f"UPDATE rollup_totals SET Donated = Donated {s} COALESCE({r}.Quantity, 0) WHERE Id = 1;",
+    ]
+
+
+def _listing_claims_delta(r, s):
+    # the claims already made on this listing, re-attributed when its name/meal/quantity changes
+    return [
+        f"SET n = COALESCE((SELECT Claims FROM rollup_listing_claims WHERE Food_ID = {r}.Food_ID), 0);",
+        "IF n <> 0 THEN",
+        _upsert("rollup_food_name", "Food_Name", f"COALESCE({r}.Food_Name, '')", {"Claims": f"{s}n"}),
+        _upsert("rollup_meal_claims", "Meal_Type", f"COALESCE({r}.Meal_Type, '')", {"Claims": f"{s}n"}),
+        f"UPDATE rollup_totals SET Claimed = Claimed {s} n * COALESCE({r}.Quantity, 0) WHERE Id = 1;",
+        f"""UPDATE rollup_receiver a
+            JOIN (SELECT Receiver_ID, COUNT(*) AS k FROM claims
+                  WHERE Food_ID = {r}.Food_ID AND Receiver_ID IS NOT NULL GROUP BY Receiver_ID) c
+              ON a.Receiver_ID = c.Receiver_ID
+            SET a.Claims = a.Claims {s} c.k,
+                a.Claimed_Quantity = a.Claimed_Quantity {s} c.k * COALESCE({r}.Quantity, 0);""",
+        "END IF;",
+    ]
+
+
+def _claim_delta(r, s):
+    return [
+        f"IF {r}.Food_ID IS NOT NULL AND EXISTS (SELECT 1 FROM food_listings WHERE Food_ID = {r}.Food_ID) THEN",
+        f"""SELECT COALESCE(Food_Name, ''), COALESCE(Meal_Type, ''), COALESCE(Quantity, 0)
+            INTO fname, meal, qty FROM food_listings WHERE Food_ID = {r}.Food_ID;""",
+        _upsert("rollup_listing_claims", "Food_ID", f"{r}.Food_ID", {"Claims": f"{s}1"}),
+        _upsert("rollup_food_name", "Food_Name", "fname", {"Claims": f"{s}1"}),
+        _upsert("rollup_meal_claims", "Meal_Type", "meal", {"Claims": f"{s}1"}),
+        f"UPDATE rollup_totals SET Claimed = Claimed {s} qty WHERE Id = 1;",
+        f"IF {r}.Receiver_ID IS NOT NULL THEN",
+        _upsert("rollup_receiver", "Receiver_ID", f"{r}.Receiver_ID",
+                {"Claims": f"{s}1", "Claimed_Quantity": f"{s}qty"}),
+        "END IF;",
+        "END IF;",
+    ]
+
+
+def _city_delta(r, s, counter):
+    return [_upsert("rollup_city", "City", f"COALESCE({r}.City, '')", {counter: f"{s}1"})]
+
+
+def _if_changed(columns, body):
+    # <=> is NULL-safe equality; a write to other columns (e.g. Reserved on every claim) skips body
+    same = " AND ".join(f"NEW.{c} <=> OLD.{c}" for c in columns)
+    return [f"IF NOT ({same}) THEN", *body, "END IF;"]
+
+
+_LISTING_VARS = ["DECLARE n INT DEFAULT 0;"]
+# what _listing_claims_delta reads from the listing row
+_LISTING_CLAIM_COLUMNS = ["Food_ID", "Food_Name", "Meal_Type", "Quantity"]
+_CLAIM_VARS = ["DECLARE fname VARCHAR(255);", "DECLARE meal VARCHAR(100);", "DECLARE qty INT DEFAULT 0;"]
+
+# (trigger name, timing, event, table, body statements)
+TRIGGERS = [
+    ("trg_food_listings_ai", "AFTER", "INSERT", "food_listings", _listing_delta("NEW", "+")),
+    ("trg_food_listings_au", "AFTER", "UPDATE", "food_listings",
+     _LISTING_VARS + _listing_delta("OLD", "-") + _listing_delta("NEW", "+")
+     + _if_changed(_LISTING_CLAIM_COLUMNS,
+                   _listing_claims_delta("OLD", "-") + _listing_claims_delta("NEW", "+"))),
+    # BEFORE DELETE: the claims that ON DELETE CASCADE removes do not fire claims triggers
+    ("trg_food_listings_bd", "BEFORE", "DELETE", "food_listings",
+     _LISTING_VARS + _listing_delta("OLD", "-") + _listing_claims_delta("OLD", "-")
+     + ["DELETE FROM rollup_listing_claims WHERE Food_ID = OLD.Food_ID;"]),
+    ("trg_claims_ai", "AFTER", "INSERT", "claims", _CLAIM_VARS + _claim_delta("NEW", "+")),
+    ("trg_claims_au", "AFTER", "UPDATE", "claims",
+     _CLAIM_VARS + _claim_delta("OLD", "-") + _claim_delta("NEW", "+")),
+    ("trg_claims_ad", "AFTER", "DELETE", "claims", _CLAIM_VARS + _claim_delta("OLD", "-")),
+    ("trg_providers_ai", "AFTER", "INSERT", "providers", _city_delta("NEW", "+", "Providers")),
+    ("trg_providers_au", "AFTER", "UPDATE", "providers",
+     _city_delta("OLD", "-", "Providers") + _city_delta("NEW", "+", "Providers")),
+    ("trg_providers_ad", "AFTER", "DELETE", "providers",
+     _city_delta("OLD", "-", "Providers") + ["DELETE FROM rollup_provider WHERE Provider_ID = OLD.Provider_ID;"]),
+    ("trg_receivers_ai", "AFTER", "INSERT", "receivers", _city_delta("NEW", "+", "Receivers")),
+    ("trg_receivers_au", "AFTER", "UPDATE", "receivers",
+     _city_delta("OLD", "-", "Receivers") + _city_delta("NEW", "+", "Receivers")),
+    ("trg_receivers_ad", "AFTER", "DELETE", "receivers",
+     _city_delta("OLD", "-", "Receivers") + ["DELETE FROM rollup_receiver WHERE Receiver_ID = OLD.Receiver_ID;"]),
+]
+
+
+def trigger_ddl(name, timing, event, table, body):
+    stmts = "\n    ".join(body)
+    return f"CREATE TRIGGER {name} {timing} {event} ON {table} FOR EACH ROW\nBEGIN\n    {stmts}\nEND"
+
+
+def install_triggers(conn):
+    if conn.dialect.name != "mysql":
+        return
+    for name, timing, event, table, body in TRIGGERS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text(trigger_ddl(name, timing, event, table, body)))
+
+
+def install(conn):
+    """Migration step: create the rollup tables, fill them, then attach the triggers."""
+    for ddl in CREATE_TABLES:
+        conn.execute(text(ddl))
+    rebuild(conn)
+    install_triggers(conn)
+
+
+# ---------------------------
+# READ PATH
+# ---------------------------
+_installed = {}
+
+
+def installed(engine=None):
+    """True once the rollup tables and their triggers exist (checked once per process)."""
+    engine = engine or db.engine
+    if engine.url not in _installed:
+        try:
+            ok = engine.dialect.name == "mysql" and "rollup_totals" in inspect(engine).get_table_names()
+        except Exception:
+            ok = False
+        _installed[engine.url] = ok
+    return _installed[engine.url]
+
+
+def trend_queries(engine=None):
+    """The Trend Analysis query set: rollup-backed when installed, the live GROUP BY joins otherwise."""
+    return rollup_queries_grouped if installed(engine) else queries_grouped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the Trend Analysis rollup tables.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    with db.engine.begin() as conn:
+        rebuild(conn)
+    print("Rollups rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
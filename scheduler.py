@@ -0,0 +1,136 @@
+# scheduler.py
+# Runs independent read queries concurrently on a bounded thread pool sized to
+# the SQLAlchemy connection pool, so a page waits for the slowest query rather
+# than the sum of all of them. Worker threads only touch the database; all
+# Streamlit calls stay in the script thread.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pandas as pd
+
+import db
+from query_cache import tables_in
+
+DEFAULT_TIMEOUT = 15.0    # seconds per query, measured from batch start
+FALLBACK_WORKERS = 4      # pools without a fixed size (NullPool, SingletonThreadPool)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pool_capacity(engine):
+    """Connections the engine can hand out at once (pool_size + max_overflow)."""
+    pool = engine.pool
+    try:
+        return max(1, pool.size() + max(getattr(pool, "_max_overflow", 0), 0))
+    except (AttributeError, TypeError):     # no size(), or size is a plain attribute
+        return FALLBACK_WORKERS
+
+
+def get_executor(engine=None):
+    # one process-wide pool; more threads than connections would only queue on the pool
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = pool_capacity(engine or db.engine)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dashboard-query")
+        return _executor
+
+
+class QueryResult:
+    __slots__ = ("name", "df", "error", "start", "seconds", "version")
+
+    def __init__(self, name, version=None):
+        self.name = name
+        self.version = version
+        self.df = pd.DataFrame()
+        self.error = None
+        self.start = 0.0
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class QueryBatch:
+    """Collect named reads with add(), execute them together with run(), then read results by name.
+
+    reader defaults to db.read_df; analytics.read_df runs the batch on the DuckDB snapshot instead.
+    """
+
+    def __init__(self, label="batch", timeout=DEFAULT_TIMEOUT, reader=None):
+        self.label = label
+        self.timeout = timeout
+        self.reader = reader or db.read_df
+        self.wall = 0.0
+        self._jobs = {}
+        self.results = {}
+
+    def add(self, name, sql, params=None, ttl=0, timeout=None):
+        self._jobs[name] = (sql, params, ttl, timeout or self.timeout)
+        return self
+
+    def run(self):
+        executor = get_executor()
+        t0 = time.perf_counter()
+
+        def timed(name, sql, params, ttl):
+            start = time.perf_counter()
+            df = self.reader(sql, params, ttl=ttl, name=f"{self.label}/{name}")
+            return df, start - t0, time.perf_counter() - start
+
+        # table write-generations as of submission, see df()
+        versions = {name: db.cache.version(tables_in(sql)) for name, (sql, *_rest) in self._jobs.items()}
+        futures = {name: executor.submit(timed, name, sql, params, ttl)
+                   for name, (sql, params, ttl, _) in self._jobs.items()}
+        for name, future in futures.items():
+            res = QueryResult(name, versions[name])
+            timeout = self._jobs[name][3]
+            try:
+                res.df, res.start, res.seconds = future.result(
+                    timeout=max(0.0, t0 + timeout - time.perf_counter()))
+            except FutureTimeout:
+                # the worker cannot be interrupted; it finishes in the background and is discarded
+                res.error = f"timed out after {timeout:g}s"
+                res.start, res.seconds = 0.0, timeout
+            except Exception as e:
+                res.error = str(e)
+            self.results[name] = res
+        self.wall = time.perf_counter() - t0
+        return self
+
+    def df(self, name):
+        """Result for name; re-read synchronously if a write in this process touched its tables since run()."""
+        res = self.results[name]
+        sql, params, ttl, _ = self._jobs[name]
+        version = db.cache.version(tables_in(sql))
+        if res.ok and res.version != version:
+            try:
+                res.df = self.reader(sql, params, ttl=ttl, name=f"{self.label}/{name}")
+            except Exception as e:
+                res.error = str(e)
+                res.df = pd.DataFrame()
+            res.version = version
+        return res.df
+
+    def error(self, name):
+        return self.results[name].error
+
+    def timings(self):
+        """Per-query wall-clock breakdown (ms from batch start, duration, status)."""
+        rows = [{
+            "batch": self.label,
+            "query": r.name,
+            "start_ms": round(r.start * 1000, 1),
+            "duration_ms": round(r.seconds * 1000, 1),
+            "rows": len(r.df),
+            "status": "ok" if r.ok else r.error,
+        } for r in self.results.values()]
+        return pd.DataFrame(rows)
+
+    def summary(self):
+        serial = sum(r.seconds for r in self.results.values())
+        return {"label": self.label, "queries": len(self.results),
+                "wall_ms": round(self.wall * 1000, 1), "serial_ms": round(serial * 1000, 1)}
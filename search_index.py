@@ -0,0 +1,298 @@
+# search_index.py
+# In-process trigram index for the CRUD name searches, replacing
+# LIKE '%term%' (which no B-tree index can serve). Each source is indexed by
+# the trigrams of its words, pg_trgm style; a query scores every document
+# by the share of its own trigrams the document contains, so a typo still
+# matches most of them ("bred" -> "bread"), and ties go to the closer
+# (Jaccard) match. Postings are NumPy arrays, so scoring is one bincount.
+# Kept in sync like expiry_index.py: writes that name their rows are
+# re-read by primary key; any other write or RESYNC_TTL rebuilds the index on
+# a background thread while searches keep reading the previous one.
+import re
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+
+import numpy as np
+from sqlalchemy import text
+
+import db
+
+MIN_SCORE = 0.45     # share of the query's trigrams a match must contain
+SEARCH_LIMIT = 100
+RESYNC_TTL = 300     # seconds; picks up writes made by other processes
+DELTA_LIMIT = 5000   # documents added since the last merge before postings are re-packed
+
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+# key is the primary key column; distinct indexes the value itself (shared by many rows) instead of the row
+Source = namedtuple("Source", "table key sql distinct", defaults=(False,))
+SOURCES = {
+    "providers": Source("providers", "Provider_ID", "SELECT Provider_ID, Name, Address FROM providers"),
+    "receivers": Source("receivers", "Receiver_ID", "SELECT Receiver_ID, Name FROM receivers"),
+    # listings share a handful of names, so the distinct names are indexed and filtered with IN (...)
+    "food_names": Source("food_listings", "Food_ID",
+                         "SELECT Food_ID, Food_Name FROM food_listings WHERE Food_Name IS NOT NULL", True),
+}
+
+
+def _word_trigrams(word):
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def trigrams(value):
+    """Set of padded word trigrams of value: 'Bread' -> {'  b', ' br', 'bre', 'rea', 'ead', 'ad '}."""
+    out = set()
+    for word in _WORD_RE.findall(str(value).lower()):
+        out.update(_word_trigrams(word))
+    return out
+
+
+class TrigramIndex:
+    """Documents (key -> text) with trigram postings; removal is a tombstone until the next rebuild."""
+
+    def __init__(self):
+        self._tri_ids = {}                 # trigram -> int
+        self._postings = {}                # trigram id -> np.ndarray of document positions
+        self._delta = defaultdict(list)    # trigram id -> positions added since the last pack
+        self._keys = []                    # position -> key
+        self._pos = {}                     # key -> live position
+        self._sizes = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._delta_docs = 0
+
+    def __len__(self):
+        return len(self._pos)
+
+    def _grow(self, n):
+        if n > len(self._alive):
+            cap = max(n, 2 * len(self._alive), 1024)
+            self._sizes = np.resize(self._sizes, cap)
+            self._alive = np.concatenate([self._alive, np.zeros(cap - len(self._alive), dtype=bool)])
+
+    def _tri_id(self, tri):
+        tid = self._tri_ids.get(tri)
+        if tid is None:
+            tid = self._tri_ids[tri] = len(self._tri_ids)
+        return tid
+
+    @classmethod
+    def build(cls, docs):
+        """Bulk-load [(key, text)] and pack the postings in one pass."""
+        index = cls()
+        tri_col, sizes = [], []
+        word_ids = {}   # names and addresses repeat words, so each word is split once
+        for pos, (key, value) in enumerate(docs):
+            tids = set()
+            for word in _WORD_RE.findall(str(value).lower()):
+                ids = word_ids.get(word)
+                if ids is None:
+                    ids = word_ids[word] = [index._tri_id(t) for t in _word_trigrams(word)]
+                tids.update(ids)
+            tri_col.extend(tids)
+            sizes.append(len(tids))
+            index._keys.append(key)
+            index._pos[key] = pos
+        index._grow(len(sizes))
+        index._sizes[:len(sizes)] = sizes
+        index._alive[:len(sizes)] = True
+        if tri_col:
+            tri_arr = np.asarray(tri_col, dtype=np.int32)
+            pos_arr = np.repeat(np.arange(len(sizes), dtype=np.int32), sizes)
+            order = np.argsort(tri_arr, kind="stable")
+            tri_arr, pos_arr = tri_arr[order], pos_arr[order]
+            bounds = np.flatnonzero(np.diff(tri_arr)) + 1
+            for tid, chunk in zip(tri_arr[np.r_[0, bounds]], np.split(pos_arr, bounds)):
+                index._postings[int(tid)] = chunk
+        return index
+
+    def add(self, key, value):
+        self.remove(key)
+        pos = len(self._keys)
+        tris = [self._tri_id(t) for t in trigrams(value)]
+        self._grow(pos + 1)
+        self._keys.append(key)
+        self._pos[key] = pos
+        self._sizes[pos] = len(tris)
+        self._alive[pos] = True
+        for tid in tris:
+            self._delta[tid].append(pos)
+        self._delta_docs += 1
+        if self._delta_docs >= DELTA_LIMIT:
+            self._pack()
+
+    def remove(self, key):
+        pos = self._pos.pop(key, None)
+        if pos is not None:
+            self._alive[pos] = False
+
+    def _pack(self):
+        for tid, extra in self._delta.items():
+            old = self._postings.get(tid)
+            extra = np.asarray(extra, dtype=np.int32)
+            self._postings[tid] = extra if old is None else np.concatenate([old, extra])
+        self._delta.clear()
+        self._delta_docs = 0
+
+    def search(self, query, limit=SEARCH_LIMIT, min_score=MIN_SCORE):
+        """[(key, score)] best first; score is the share of the query's trigrams the document contains."""
+        query_tris = trigrams(query)
+        n_query = len(query_tris)
+        tids = [self._tri_ids[t] for t in query_tris if t in self._tri_ids]
+        if not tids or not n_query:
+            return []
+        parts = [self._postings[t] for t in tids if t in self._postings]
+        parts += [np.asarray(self._delta[t], dtype=np.int32) for t in tids if t in self._delta]
+        n = len(self._keys)
+        hits = np.bincount(np.concatenate(parts), minlength=n)[:n]
+        hits[~self._alive[:n]] = 0
+        score = hits / n_query
+        found = np.flatnonzero(score >= min_score)
+        if not len(found):
+            return []
+        jaccard = hits[found] / (n_query + self._sizes[found] - hits[found])
+        if len(found) > limit:
+            # containment steps are >= 1/n_query, so the scaled Jaccard only breaks ties
+            top = np.argpartition(-(score[found] + jaccard * 1e-3), limit - 1)[:limit]
+            found, jaccard = found[top], jaccard[top]
+        # best containment first, then the closest overall match, then the newest document
+        order = np.lexsort((-found, -jaccard, -score[found]))
+        return [(self._keys[p], round(float(s), 3)) for p, s in zip(found[order], score[found][order])]
+
+
+# ---------------------------
+# SOURCES (kept in sync with writes)
+# ---------------------------
+def _text(row):
+    return " ".join(str(v) for v in row if v is not None)
+
+
+class SourceIndex:
+    """One source's TrigramIndex. A stale index keeps serving while a replacement is built on a
+    background thread and swapped in; only the first search of a process waits for a build."""
+
+    def __init__(self, name):
+        self.name = name
+        self.source = SOURCES[name]
+        self._lock = threading.RLock()
+        self._index = None
+        self._values = {}           # distinct sources: key -> indexed value
+        self._uses = Counter()      # distinct sources: value -> rows holding it
+        self._loaded_at = 0.0
+        self._dirty = True
+        self._writes = 0            # on_write calls, so a rebuild can tell it missed one
+        self._rebuilding = None     # background rebuild thread, while one runs
+        self.reloads = 0
+        self.patches = 0
+
+    def reload(self):
+        """Build a fresh index from the database and swap it in."""
+        with self._lock:
+            writes = self._writes
+        with db.engine.connect() as conn:
+            rows = conn.execute(text(self.source.sql)).all()
+        values = {}
+        if self.source.distinct:
+            values = {key: value for key, value in rows}
+            uses = Counter(values.values())
+            docs = [(value, value) for value in uses]
+        else:
+            uses = Counter()
+            docs = [(row[0], _text(row[1:])) for row in rows]
+        index = TrigramIndex.build(docs)
+        with self._lock:
+            self._index = index
+            self._values, self._uses = values, uses
+            self._loaded_at = time.monotonic()
+            # a write during the build may be missing from rows and was patched into the old index only
+            self._dirty = self._writes != writes
+            self.reloads += 1
+
+    def _rebuild(self):
+        try:
+            self.reload()
+        except Exception:
+            pass    # still stale, so the next search starts another rebuild
+        finally:
+            with self._lock:
+                self._rebuilding = None
+
+    def _stale(self):
+        return self._dirty or time.monotonic() - self._loaded_at > RESYNC_TTL
+
+    def touch(self, keys):
+        """Re-read the rows with these primary keys and patch them in (or out)."""
+        keys = sorted({int(k) for k in keys})
+        if not keys or self._index is None:
+            return
+        src = self.source
+        where = "AND" if " WHERE " in src.sql else "WHERE"
+        sql = f"{src.sql} {where} {src.key} IN ({', '.join(str(k) for k in keys)})"
+        with db.engine.connect() as conn:
+            rows = conn.execute(text(sql)).all()
+        with self._lock:
+            if src.distinct:
+                # only a row whose value changed moves the counts; a value drops out with its last row
+                current = dict(rows)
+                for k in keys:
+                    old, new = self._values.get(k), current.get(k)
+                    if old == new:
+                        continue
+                    if old is not None:
+                        self._uses[old] -= 1
+                        if self._uses[old] <= 0:
+                            del self._uses[old]
+                            self._index.remove(old)
+                        del self._values[k]
+                    if new is not None:
+                        self._values[k] = new
+                        self._uses[new] += 1
+                        if new not in self._index._pos:
+                            self._index.add(new, new)
+            else:
+                for k in keys:
+                    self._index.remove(k)
+                for row in rows:
+                    self._index.add(row[0], _text(row[1:]))
+            self.patches += 1
+
+    def on_write(self, tables, keys):
+        if self.source.table not in tables:
+            return
+        with self._lock:
+            self._writes += 1
+        if self.source.table in keys and not self._dirty:
+            try:
+                self.touch(keys[self.source.table])
+            except Exception:
+                self._dirty = True
+        else:
+            self._dirty = True
+
+    def search(self, query, limit=SEARCH_LIMIT, min_score=MIN_SCORE):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self.reload()
+        with self._lock:
+            if self._stale() and self._rebuilding is None:
+                self._rebuilding = threading.Thread(target=self._rebuild, name=f"search-{self.name}",
+                                                    daemon=True)
+                self._rebuilding.start()
+            return self._index.search(query, limit, min_score)
+
+    def stats(self):
+        with self._lock:
+            return {"documents": len(self._index) if self._index is not None else 0,
+                    "reloads": self.reloads, "patches": self.patches}
+
+
+INDEXES = {name: SourceIndex(name) for name in SOURCES}
+for _index in INDEXES.values():
+    db.cache.subscribe(_index.on_write)
+
+
+def search(source, query, limit=SEARCH_LIMIT, min_score=MIN_SCORE):
+    """Ranked, typo-tolerant matches of query in source: [(key, score)], best first."""
+    return INDEXES[source].search(query, limit, min_score)
@@ -0,0 +1,227 @@
+# shared_cache.py
+# Optional second tier behind QueryCache that every worker process shares, so
+# a read one worker loaded is served to the others instead of being loaded
+# once per process. Picked with FOOD_SHARED_CACHE:
+#   (unset)                    per-process cache only
+#   file:/var/cache/food       pickled results in a directory on this host, with the
+#                              per-table write generations in a memory-mapped file
+#   redis://localhost:6379/0   a Redis server (needs the redis package)
+# Entries carry the write generation of every table they read; a write in any
+# worker bumps those generations (QueryCache.invalidate_tables), and an entry
+# whose generations moved is a miss. TTLs still bound how long anything lives.
+#   python shared_cache.py status     what the configured backend holds
+#   python shared_cache.py clear
+import argparse
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:     # Windows: generation bumps are unlocked (a lost bump still changes the value)
+    fcntl = None
+
+SHARED_ENV = "FOOD_SHARED_CACHE"
+MAX_BYTES = 256 * 1024 * 1024   # file backend: results kept on disk before the oldest are pruned
+PRUNE_EVERY = 64                # file backend: puts between size checks
+SLOTS = 1024                    # file backend: generation counters; tables hash onto one each
+KEY_PREFIX = "food:"            # redis backend
+
+
+def _slot(table):
+    # stable across processes, unlike hash()
+    return zlib.crc32(table.encode("utf-8")) % SLOTS
+
+
+# ---------------------------
+# FILE BACKEND
+# ---------------------------
+class FileCache:
+    """Results as one pickle file per key; generations as int64 counters in a shared mmap."""
+
+    def __init__(self, path, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+        gen_path = os.path.join(path, "generations.bin")
+        with open(gen_path, "a+b") as f:
+            if os.fstat(f.fileno()).st_size < SLOTS * 8:
+                f.truncate(SLOTS * 8)
+        self._gen_file = open(gen_path, "r+b")
+        self._gens = mmap.mmap(self._gen_file.fileno(), SLOTS * 8)
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    def describe(self):
+        return f"file:{self.path}"
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".pkl")
+
+    def generations(self, tables):
+        return {t: struct.unpack_from("<q", self._gens, _slot(t) * 8)[0] for t in tables}
+
+    def bump(self, tables):
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._gen_file, fcntl.LOCK_EX)
+            try:
+                for slot in {_slot(t) for t in tables}:
+                    struct.pack_into("<q", self._gens, slot * 8,
+                                     struct.unpack_from("<q", self._gens, slot * 8)[0] + 1)
+            finally:
+                if fcntl:
+                    fcntl.flock(self._gen_file, fcntl.LOCK_UN)
+
+    def get(self, key, tables):
+        try:
+            with open(self._file(key), "rb") as f:
+                expires_at, gens, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at < time.time() or gens != self.generations(tables):
+            return None
+        return value
+
+    def put(self, key, gens, value, ttl):
+        # write then rename, so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((time.time() + ttl, gens, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._file(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        with self._lock:
+            self._puts += 1
+            due = self._puts % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def _entries(self):
+        out = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                out.append((stat.st_mtime, stat.st_size, entry.path))
+        return out
+
+    def prune(self):
+        """Drop the least recently written results until the directory is under max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        entries = self._entries()
+        return {"backend": self.describe(), "entries": len(entries), "bytes": sum(s for _, s, _ in entries)}
+
+
+# ---------------------------
+# REDIS BACKEND
+# ---------------------------
+class RedisCache:
+    """Results as pickled string values with a TTL; generations as counters, one key per table."""
+
+    def __init__(self, url):
+        import redis    # optional dependency, only for this backend
+        self.url = url
+        self._redis = redis.Redis.from_url(url)
+
+    def describe(self):
+        return self.url
+
+    def generations(self, tables):
+        tables = sorted(tables)
+        values = self._redis.mget([f"{KEY_PREFIX}gen:{t}" for t in tables]) if tables else []
+        return {t: int(v or 0) for t, v in zip(tables, values)}
+
+    def bump(self, tables):
+        pipe = self._redis.pipeline(transaction=False)
+        for t in tables:
+            pipe.incr(f"{KEY_PREFIX}gen:{t}")
+        pipe.execute()
+
+    def get(self, key, tables):
+        # the entry and the current generations in one round trip
+        tables = sorted(tables)
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.get(f"{KEY_PREFIX}q:{key}")
+        pipe.mget([f"{KEY_PREFIX}gen:{t}" for t in tables] or [f"{KEY_PREFIX}gen:"])
+        raw, values = pipe.execute()
+        if raw is None:
+            return None
+        gens, value = pickle.loads(raw)
+        if gens != {t: int(v or 0) for t, v in zip(tables, values)}:
+            return None
+        return value
+
+    def put(self, key, gens, value, ttl):
+        self._redis.set(f"{KEY_PREFIX}q:{key}", pickle.dumps((gens, value), protocol=pickle.HIGHEST_PROTOCOL),
+                        ex=max(1, int(ttl)))
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(f"{KEY_PREFIX}q:*"))
+        for i in range(0, len(keys), 1000):
+            self._redis.delete(*keys[i:i + 1000])
+
+    def stats(self):
+        return {"backend": self.describe(), "entries": sum(1 for _ in self._redis.scan_iter(f"{KEY_PREFIX}q:*")),
+                "bytes": int(self._redis.info("memory").get("used_memory", 0))}
+
+
+def from_env():
+    """The backend FOOD_SHARED_CACHE names, or None."""
+    spec = os.environ.get(SHARED_ENV, "").strip()
+    if not spec:
+        return None
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(spec)
+    return FileCache(spec[len("file:"):] if spec.startswith("file:") else spec)
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared query cache of the worker processes.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="entries and size held by the configured backend")
+    sub.add_parser("clear", help="drop every cached result (generations are kept)")
+    args = parser.parse_args(argv)
+
+    backend = from_env()
+    if backend is None:
+        parser.error(f"{SHARED_ENV} is not set")
+    if args.command == "clear":
+        backend.clear()
+    stats = backend.stats()
+    print(f"{stats['backend']}: {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
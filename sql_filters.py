@@ -0,0 +1,73 @@
+# sql_filters.py
+# Turns sidebar multiselect values into parameterised SQL predicates so that
+# filtering, limiting and aggregation happen in the database.
+
+# sidebar filter name -> column in the food_listings f JOIN providers p query
+# (City takes City_IDs from geo.py, so a radius filter is the same IN list)
+PREVIEW_FILTER_COLUMNS = {
+    "City": "p.City_ID",
+    "Provider_Name": "p.Name",
+    "Food_Type": "f.Food_Type",
+    "Meal_Type": "f.Meal_Type",
+}
+
+
+def in_predicate(column, values, prefix):
+    """Return ("col IN (:p_0, :p_1, ...)", params) for a non-empty list of values."""
+    names = [f"{prefix}_{i}" for i in range(len(values))]
+    placeholders = ", ".join(f":{n}" for n in names)
+    return f"{column} IN ({placeholders})", dict(zip(names, values))
+
+
+def build_where(selections, columns=PREVIEW_FILTER_COLUMNS):
+    """Build a WHERE clause from {filter_name: [values]}; empty selections are ignored."""
+    clauses, params = [], {}
+    for name, values in selections.items():
+        if not values:
+            continue
+        clause, p = in_predicate(columns[name], list(values), name.lower())
+        clauses.append(clause)
+        params.update(p)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+
+def limit_clause(limit, offset=0):
+    limit = int(limit)
+    offset = int(offset)
+    return f"LIMIT {limit} OFFSET {offset}" if offset else f"LIMIT {limit}"
+
+
+# ---------------------------
+# FILTERED PREVIEW + CHARTS
+# ---------------------------
+PREVIEW_ROWS = 6
+PREVIEW_FROM = """
+    FROM food_listings f
+    JOIN providers p ON f.Provider_ID = p.Provider_ID
+"""
+
+
+def preview_queries(selections, rows=PREVIEW_ROWS):
+    """Return ({name: sql}, params) for the filtered preview and the two chart aggregates."""
+    where, params = build_where(selections)
+    sqls = {
+        "preview": f"""
+            SELECT f.Food_Name, f.Food_Type, f.Quantity, f.Expiry_Date, f.Meal_Type, p.Name AS Provider_Name, p.City, p.Contact, p.Address
+            {PREVIEW_FROM} {where}
+            {limit_clause(rows)}
+        """,
+        "food_type_count": f"""
+            SELECT f.Food_Type, COUNT(*) AS Count
+            {PREVIEW_FROM} {where}
+            GROUP BY f.Food_Type
+            ORDER BY Count DESC
+        """,
+        "provider_count": f"""
+            SELECT p.Name AS Provider, COUNT(*) AS Count
+            {PREVIEW_FROM} {where}
+            GROUP BY p.Name
+            ORDER BY Count DESC
+        """,
+    }
+    return sqls, params
@@ -0,0 +1,24 @@
+# tests/conftest.py
+# Every test runs against a throwaway SQLite file built by the app's own
+# migrations, so triggers, indexes and constraints match a real deployment.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend  # noqa: E402
+import db  # noqa: E402
+import migrations  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """A migrated SQLite database swapped in as db.engine for the test."""
+    engine = backend.make_engine(f"sqlite:///{tmp_path / 'food.db'}")
+    migrations.upgrade(engine)
+    monkeypatch.setattr(db, "engine", engine)
+    db.cache.clear()
+    yield engine
+    engine.dispose()
@@ -0,0 +1,34 @@
+# tests/test_changefeed.py
+# changefeed.Feed moving its cursor over Seqs that never commit.
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+import changefeed
+
+
+def _log(engine, *seqs):
+    with engine.begin() as conn:
+        for seq in seqs:
+            conn.execute(text("INSERT INTO change_log (Seq, Table_Name, Row_ID, Op) "
+                              "VALUES (:s, 'providers', :s, 'I')"), {"s": seq})
+
+
+def test_rolled_back_seq_skipped_without_waiting(engine):
+    _log(engine, 1)
+    feed = changefeed.Feed()
+    feed.poll(force=True)                           # first poll: cursor set, subscribers reload
+    _log(engine, 3)                                 # Seq 2 rolled back
+    assert feed.poll(force=True) == 1
+    assert feed.cursor == 3                         # one writer at a time on SQLite: 2 is gone
+
+
+def test_mysql_hole_lost_once_older_transactions_finished():
+    feed = changefeed.Feed()
+    noticed = datetime(2026, 3, 10, 9, 0, 0)
+    feed._holes = {5: (0.0, noticed), 6: (0.0, None)}
+    lost = feed._lost_rule("mysql", (True, None))                   # nothing else open
+    assert lost(5) and not lost(6)                                  # 6 noticed by this very poll
+    assert not feed._lost_rule("mysql", (True, noticed))(5)         # its writer may still be open
+    assert feed._lost_rule("mysql", (True, noticed + timedelta(seconds=1)))(5)
+    assert not feed._lost_rule("mysql", (False, None))(5)           # INNODB_TRX unreadable: GAP_TIMEOUT
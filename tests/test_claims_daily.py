@@ -0,0 +1,79 @@
+# tests/test_claims_daily.py
+# The claims-over-time chart: claims_daily pre-aggregates where the
+# refresh_claims_daily job has run, live counts for every day it has not.
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+import bulk
+import db
+import history
+import ingest
+import partitions
+from queries import CLAIMS_DAILY_SQL, DAILY_COVERED_SQL
+
+TODAY = date(2026, 3, 10)
+SINCE = date(1970, 1, 1)
+
+
+def _chart(today=TODAY):
+    covered = db.read_df(DAILY_COVERED_SQL)["Day"].iloc[0]
+    live_from = history.live_from(covered, SINCE, today)
+    df = db.read_df(CLAIMS_DAILY_SQL, {"since": SINCE, "live_from": live_from,
+                                       "live_month": partitions.month_key(live_from)})
+    return {(str(r.Day)[:10], r.Status): int(r.Claims) for r in df.itertuples()}
+
+
+def test_chart_counts_live_until_the_job_has_run(engine):
+    with engine.begin() as conn:
+        for days_ago, status in [(3, "Completed"), (3, "Pending"), (1, "Completed"), (0, "Pending")]:
+            conn.execute(text("INSERT INTO claims (Status, Timestamp) VALUES (:s, :ts)"),
+                         {"s": status, "ts": datetime.combine(TODAY - timedelta(days=days_ago),
+                                                              datetime.min.time()) + timedelta(hours=9)})
+    expected = {("2026-03-07", "Completed"): 1, ("2026-03-07", "Pending"): 1,
+                ("2026-03-09", "Completed"): 1, ("2026-03-10", "Pending"): 1}
+    assert _chart() == expected                     # claims_daily empty: every day live
+
+    history.refresh(today=TODAY - timedelta(days=2))
+    db.cache.clear()
+    assert _chart() == expected                     # filled up to 03-07, the rest live
+
+    history.refresh(today=TODAY)
+    db.cache.clear()
+    assert _chart() == expected
+
+
+def test_live_from_clamps_to_the_window():
+    assert history.live_from(None, date(2026, 3, 1), TODAY) == date(2026, 3, 1)
+    assert history.live_from(date(2026, 3, 5), date(2026, 3, 1), TODAY) == date(2026, 3, 6)
+    assert history.live_from(date(2026, 2, 1), date(2026, 3, 1), TODAY) == date(2026, 3, 1)
+    assert history.live_from("2026-03-12", date(2026, 3, 1), TODAY) == TODAY
+
+
+def _daily():
+    df = db.read_df("SELECT Day, Status, Claims FROM claims_daily")
+    return {(str(r.Day)[:10], r.Status): int(r.Claims) for r in df.itertuples()}
+
+
+def test_backdated_claims_recompute_their_days(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO receivers (Name) VALUES ('Shelter')"))
+        conn.execute(text("INSERT INTO food_listings (Food_Name, Quantity, Expiry_Date) "
+                          "VALUES ('Bread', 10, :d)"), {"d": date.today() + timedelta(days=30)})
+        conn.execute(text("INSERT INTO claims (Status, Timestamp) VALUES ('Pending', :ts)"),
+                     {"ts": datetime.now() - timedelta(days=1)})
+    history.refresh()                               # claims_daily filled up to yesterday
+    day = date.today() - timedelta(days=40)
+    yesterday = (str(date.today() - timedelta(days=1)), "Pending")
+
+    result = bulk.apply("claims", pd.DataFrame({
+        "Food_ID": [1], "Receiver_ID": [1], "Claim_Quantity": [2], "Status": ["Completed"],
+        "Timestamp": [f"{day} 09:00"]}))
+    assert result.ok
+    assert _daily() == {(str(day), "Completed"): 1, yesterday: 1}
+
+    ingest.load_frame(engine, "claims", ingest.clean_chunk("claims", pd.DataFrame({
+        "Claim_ID": [2], "Food_ID": [1], "Receiver_ID": [1], "Status": ["Completed"],
+        "Timestamp": [f"{day - timedelta(days=1)} 09:00"]})))
+    assert _daily() == {(str(day - timedelta(days=1)), "Completed"): 1, yesterday: 1}   # moved a day back
@@ -0,0 +1,36 @@
+# tests/test_export.py
+# Chunked exports (export.py) produce one consistent file whatever the chunk size.
+import pytest
+from sqlalchemy import text
+
+import export
+
+pq = pytest.importorskip("pyarrow.parquet")   # Parquet export is optional
+
+
+@pytest.fixture
+def providers(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO providers (Name, Type, City) VALUES "
+                          "('A', NULL, NULL), ('B', 'Restaurant', NULL), ('C', NULL, NULL)"))
+
+
+def test_parquet_column_null_in_first_chunk(providers):
+    buf, rows = export.export_parquet("SELECT Provider_ID, Name, Type FROM providers ORDER BY Provider_ID",
+                                      chunksize=1)
+    with buf:
+        table = pq.read_table(buf)
+    assert rows == 3
+    assert table.column("Type").to_pylist() == [None, "Restaurant", None]
+    assert str(table.schema.field("Type").type) in ("string", "large_string")
+
+
+def test_parquet_column_null_throughout(providers, monkeypatch):
+    monkeypatch.setattr(export, "SCHEMA_LOOKAHEAD_ROWS", 2)
+    buf, rows = export.export_parquet("SELECT Provider_ID, City FROM providers ORDER BY Provider_ID",
+                                      chunksize=1)
+    with buf:
+        table = pq.read_table(buf)
+    assert rows == 3
+    assert table.column("City").to_pylist() == [None, None, None]
+    assert table.column("Provider_ID").to_pylist() == [1, 2, 3]
@@ -0,0 +1,51 @@
+# tests/test_matching.py
+# matching.candidates() patching the listings and receivers a write names
+# instead of reloading every open listing, receiver and claim.
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import db
+import matching
+
+
+@pytest.fixture
+def loads(engine, monkeypatch):
+    """Full loads of matching.Candidates during the test."""
+    monkeypatch.setattr(matching, "_loaded", None)
+    count = []
+    load = matching.Candidates.load.__func__
+
+    def counted(cls, *args, **kwargs):
+        count.append(1)
+        return load(cls, *args, **kwargs)
+
+    monkeypatch.setattr(matching.Candidates, "load", classmethod(counted))
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO receivers (Name, City) VALUES ('Shelter', 'Pune')"))
+        conn.execute(text("INSERT INTO food_listings (Food_Name, Quantity, Expiry_Date, Location) "
+                          "VALUES ('Bread', 5, :d, 'Pune')"), {"d": date.today() + timedelta(days=3)})
+    matching.candidates()
+    return count
+
+
+def test_keyed_writes_patch_rows(loads):
+    db.write("UPDATE food_listings SET Quantity = 9 WHERE Food_ID = 1", keys={"food_listings": [1]})
+    db.write("INSERT INTO food_listings (Food_Name, Quantity, Expiry_Date, Location) "
+             "VALUES ('Rice', 4, :d, 'Pune')", {"d": date.today() + timedelta(days=2)})
+    db.write("INSERT INTO receivers (Name, City) VALUES ('Kitchen', 'Pune')")
+    cands = matching.candidates()
+    assert sorted(zip(cands.listings["Food_Name"], cands.available)) == [("Bread", 9), ("Rice", 4)]
+    assert sorted(cands.receivers["Name"]) == ["Kitchen", "Shelter"]
+    assert len(matching.suggest(per_listing=2)) == 4
+
+    db.write("UPDATE food_listings SET Reserved = Quantity WHERE Food_ID = 1", keys={"food_listings": [1]})
+    assert list(matching.candidates().listings["Food_Name"]) == ["Rice"]   # no longer open
+    assert len(loads) == 1
+
+
+def test_unkeyed_write_reloads(loads):
+    db.write("UPDATE food_listings SET Quantity = 9")
+    assert list(matching.candidates().available) == [9]
+    assert len(loads) == 2
@@ -0,0 +1,25 @@
+# tests/test_migrations.py
+# The EXPLAIN check of migrations.py: what counts as a full scan.
+import migrations
+
+
+def test_full_scans_flags_table_and_index_scans(engine):
+    found = migrations.full_scans(engine, {
+        "table": "SELECT Contact FROM providers",
+        "covering index": "SELECT City FROM providers ORDER BY City",
+        "aggregate": "SELECT City, COUNT(*) FROM providers GROUP BY City",
+        "range": "SELECT Food_ID FROM food_listings WHERE Expiry_Date >= :today",
+        "constant": "SELECT (SELECT 1) AS one",
+        "derived": "SELECT n FROM (SELECT Food_ID AS n FROM food_listings WHERE Food_ID = 1 "
+                   "UNION ALL SELECT 2) u ORDER BY n",
+    })
+    assert found == [("table", "providers", "table"), ("covering index", "providers", "index")]
+
+
+def test_dashboard_queries_pass_on_a_fresh_schema(engine):
+    assert migrations.full_scans(engine) == []
+
+
+def test_full_scans_skips_other_dialects(engine, monkeypatch):
+    monkeypatch.setattr(engine.dialect, "name", "postgresql")
+    assert migrations.full_scans(engine, {"table": "SELECT Contact FROM providers"}) == []
@@ -0,0 +1,84 @@
+# tests/test_reservations.py
+# The reservation rule of claim_service.py: no listing ever has more claimed
+# (Reserved) than its Quantity, and nothing is claimed after it expires,
+# whichever path writes the claim or the listing.
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+import bulk
+import claim_service
+import db
+import ingest
+from benchmarks import contention
+
+
+def _listings(engine):
+    with engine.connect() as conn:
+        return {r.Food_ID: (r.Quantity, r.Reserved) for r in conn.execute(text(
+            "SELECT Food_ID, Quantity, Reserved FROM food_listings"))}
+
+
+def test_concurrent_claims_never_oversell(engine):
+    food_ids, expired_id, receiver_ids = contention.setup(listings=3, quantity=40)
+    accepted, stats = contention.hammer(food_ids, expired_id, receiver_ids, threads=8, requests=60,
+                                        batch_size=3, seed=7)
+    assert stats["accepted"] > 0
+    assert contention.verify(food_ids, expired_id, 40, accepted) == []
+
+
+@pytest.fixture
+def claimed(engine):
+    """One live listing of 5 with 3 claimed, one expired listing, and a cancelled claim on it."""
+    food_ids, expired_id, receiver_ids = contention.setup(listings=1, quantity=5)
+    claim_service.claim(food_ids[0], receiver_ids[0], 3)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO claims (Food_ID, Receiver_ID, Claim_Quantity, Status, Timestamp) "
+                          "VALUES (:f, :r, 1, 'Cancelled', :ts)"),
+                     {"f": expired_id, "r": receiver_ids[0], "ts": date.today()})
+        cancelled = conn.execute(text("SELECT MAX(Claim_ID) FROM claims")).scalar()
+        live_claim = conn.execute(text("SELECT MIN(Claim_ID) FROM claims")).scalar()
+    return food_ids[0], expired_id, receiver_ids[0], live_claim, cancelled
+
+
+def test_listing_update_cannot_drop_below_claimed(engine, claimed):
+    food_id = claimed[0]
+    with pytest.raises(claim_service.ClaimError):
+        claim_service.update_listing(food_id, {"Quantity": 2})
+    claim_service.update_listing(food_id, {"Quantity": 3})
+    assert _listings(engine)[food_id] == (3, 3)
+
+
+def test_claim_update_cannot_reach_expired_listing(engine, claimed):
+    food_id, expired_id, receiver_id, live_claim, cancelled = claimed
+    with pytest.raises(claim_service.ClaimError, match="expired"):
+        claim_service.update(live_claim, expired_id, receiver_id, "Pending", date.today())
+    with pytest.raises(claim_service.ClaimError, match="expired"):
+        claim_service.update(cancelled, expired_id, receiver_id, "Pending", date.today())
+    assert _listings(engine)[expired_id][1] == 0
+    assert _listings(engine)[food_id][1] == 3
+
+
+def test_bulk_update_cannot_drop_below_claimed(engine, claimed):
+    food_id = claimed[0]
+    result = bulk.apply("food_listings", pd.DataFrame({"Action": ["update"], "Food_ID": [food_id],
+                                                       "Quantity": [1]}))
+    assert not result.ok
+    assert _listings(engine)[food_id] == (5, 3)
+
+
+def test_ingest_keeps_reservations(engine, claimed):
+    food_id, _, receiver_id, live_claim, _ = claimed
+    listing = db.read_df("SELECT * FROM food_listings WHERE Food_ID = :f", {"f": food_id})
+    with pytest.raises(ingest.IngestError):
+        ingest.load_frame(engine, "food_listings",
+                          ingest.clean_chunk("food_listings", listing.assign(Quantity=2)))
+    claims = pd.DataFrame({"Claim_ID": [live_claim + 100], "Food_ID": [food_id], "Receiver_ID": [receiver_id],
+                           "Claim_Quantity": [3], "Status": ["Pending"],
+                           "Timestamp": [pd.Timestamp(date.today() - timedelta(days=1))]})
+    with pytest.raises(ingest.IngestError):
+        ingest.load_frame(engine, "claims", ingest.clean_chunk("claims", claims))
+    ingest.load_frame(engine, "claims", ingest.clean_chunk("claims", claims.assign(Claim_Quantity=2)))
+    assert _listings(engine)[food_id] == (5, 5)
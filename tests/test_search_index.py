@@ -0,0 +1,88 @@
+# tests/test_search_index.py
+# search_index.SourceIndex staying in sync with writes: patched rows,
+# names no listing uses any more, and stale indexes rebuilt off the request.
+import threading
+
+from sqlalchemy import event, text
+
+import db
+import search_index
+
+
+def _add_listings(engine, *names):
+    with engine.begin() as conn:
+        for name in names:
+            conn.execute(text("INSERT INTO food_listings (Food_Name, Quantity) VALUES (:n, 1)"), {"n": name})
+
+
+def _names(index, query):
+    return [key for key, _ in index.search(query)]
+
+
+def test_food_name_dropped_once_unused(engine):
+    _add_listings(engine, "Bread", "Bread", "Rice")
+    index = search_index.SourceIndex("food_names")
+    assert _names(index, "bread") == ["Bread"]
+
+    db.write("UPDATE food_listings SET Food_Name = 'Pasta' WHERE Food_ID = 1")
+    index.on_write({"food_listings"}, {"food_listings": [1]})
+    assert _names(index, "bread") == ["Bread"]      # listing 2 is still Bread
+    assert _names(index, "pasta") == ["Pasta"]
+
+    db.write("DELETE FROM food_listings WHERE Food_ID = 2")
+    index.on_write({"food_listings"}, {"food_listings": [2]})
+    assert _names(index, "bread") == []
+    assert index.reloads == 1
+
+
+def test_listing_write_reads_only_its_rows(engine):
+    _add_listings(engine, "Bread", "Rice")
+    index = search_index.SourceIndex("food_names")
+    index.search("bread")
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    db.write("UPDATE food_listings SET Reserved = 1 WHERE Food_ID = 2")    # a claim: the name stays
+    statements.clear()
+    index.on_write({"food_listings"}, {"food_listings": [2]})
+    assert len(statements) == 1 and "Food_ID IN (2)" in statements[0]
+    assert _names(index, "rice") == ["Rice"]
+    assert index.reloads == 1
+
+
+def test_provider_rename_patched_by_key(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO providers (Name, Address) VALUES ('Green Grocer', 'Main St')"))
+    index = search_index.SourceIndex("providers")
+    assert _names(index, "grocer") == [1]
+    db.write("UPDATE providers SET Name = 'Corner Bakery' WHERE Provider_ID = 1")
+    index.on_write({"providers"}, {"providers": [1]})
+    assert _names(index, "grocer") == []
+    assert _names(index, "bakery") == [1]
+    assert index.reloads == 1
+
+
+def test_stale_index_served_while_rebuilding(engine, monkeypatch):
+    _add_listings(engine, "Bread")
+    index = search_index.SourceIndex("food_names")
+    index.search("bread")
+
+    building, release = threading.Event(), threading.Event()
+    build = search_index.TrigramIndex.build
+
+    def slow_build(docs):
+        building.set()
+        release.wait(5)
+        return build(docs)
+
+    monkeypatch.setattr(search_index.TrigramIndex, "build", slow_build)
+    _add_listings(engine, "Soup")
+    index.on_write({"food_listings"}, {})           # unkeyed write: the index is stale
+    assert _names(index, "bread") == ["Bread"]      # answered from the old index
+    assert building.wait(5)
+    assert _names(index, "soup") == []              # rebuild still running, nothing waits on it
+    rebuild = index._rebuilding
+    release.set()
+    rebuild.join(5)
+    assert _names(index, "soup") == ["Soup"]
+    assert index.reloads == 2